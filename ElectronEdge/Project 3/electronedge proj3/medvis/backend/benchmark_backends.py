@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark: inference backends on the CPU
+
+Exports SkinDiseaseClassifier (trained weights from ml/model.pth if present,
+otherwise untrained) to TorchScript and ONNX in a temp directory, then times
+predict_batch for every backend at several batch sizes. Prints p50/p99
+latency per batch and images/sec, and checks that each export gives the same
+probabilities as eager PyTorch. The Keras backend is included when
+INFERENCE_MODEL_PATH points at a Keras model and TensorFlow is installed.
+
+Usage: python benchmark_backends.py [iterations] [batch_sizes, e.g. 1,8,32]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from ml.backends import BACKENDS
+from ml.export_model import export_all, load_classifier
+
+WEIGHTS_PATH = "ml/model.pth"
+
+def time_batches(backend, batch, iterations):
+    backend.predict_batch(batch)  # warm-up: lazy init, allocator, thread pools
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        backend.predict_batch(batch)
+        timings.append((time.perf_counter() - start) * 1000.0)
+    timings.sort()
+    return {
+        "p50_ms": timings[len(timings) // 2],
+        "p99_ms": timings[min(len(timings) - 1, int(len(timings) * 0.99))],
+        "images_per_sec": len(batch) * len(timings) / (sum(timings) / 1000.0)
+    }
+
+def load_backends(export_dir):
+    weights = WEIGHTS_PATH if os.path.exists(WEIGHTS_PATH) else None
+    model = load_classifier(weights)
+    reference_path = os.path.join(export_dir, "weights.pth")
+    torch.save(model.state_dict(), reference_path)
+    paths = export_all(model, export_dir)
+
+    backends = {
+        "torch": BACKENDS["torch"](model_path=reference_path),
+        "torchscript": BACKENDS["torchscript"](model_path=paths["torchscript"]),
+        "onnx": BACKENDS["onnx"](model_path=paths["onnx"]),
+        "features": BACKENDS["features"]()
+    }
+    keras_path = os.getenv("INFERENCE_MODEL_PATH")
+    if keras_path and keras_path.endswith((".h5", ".keras")):
+        try:
+            backends["keras"] = BACKENDS["keras"](model_path=keras_path)
+        except Exception as e:
+            print(f"⚠️ Skipping keras backend: {e}")
+    return weights, backends
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    batch_sizes = [int(size) for size in sys.argv[2].split(",")] if len(sys.argv) > 2 else [1, 8, 32]
+
+    print("🧠 Inference Backend Benchmark")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as export_dir:
+        weights, backends = load_backends(export_dir)
+        print(f"Model: {weights or 'untrained SkinDiseaseClassifier'}, {torch.get_num_threads()} torch threads, "
+              f"{iterations} iterations per batch size")
+
+        # Exports must agree with eager PyTorch before their timings mean anything
+        check = np.random.RandomState(0).rand(4, 224, 224, 3).astype(np.float32)
+        reference = backends["torch"].predict_batch(check)
+        for name in ("torchscript", "onnx"):
+            difference = np.abs(backends[name].predict_batch(check) - reference).max()
+            print(f"{'✅' if difference < 1e-4 else '⚠️'} {name} max |Δp| vs torch: {difference:.2e}")
+
+        rng = np.random.RandomState(1)
+        for batch_size in batch_sizes:
+            print(f"\nBatch size {batch_size}:")
+            results = {}
+            for name, backend in backends.items():
+                batch = rng.rand(batch_size, *backend.input_size, 3).astype(np.float32)
+                results[name] = time_batches(backend, batch, iterations)
+                result = results[name]
+                print(f"  {name:>12}: p50 {result['p50_ms']:8.2f} ms | p99 {result['p99_ms']:8.2f} ms | "
+                      f"{result['images_per_sec']:8.1f} images/s")
+
+            fastest = max((name for name in results if name != "features"),
+                          key=lambda name: results[name]["images_per_sec"])
+            speedup = results[fastest]["images_per_sec"] / results["torch"]["images_per_sec"]
+            print(f"  🚀 Fastest model backend: {fastest} ({speedup:.2f}x eager torch)")
+
+if __name__ == "__main__":
+    main()
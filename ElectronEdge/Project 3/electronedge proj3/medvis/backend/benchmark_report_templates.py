@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark: template-cached report rendering vs per-call style and layout setup
+
+Compares the previous generate_pdf_report path (getSampleStyleSheet and new
+ParagraphStyles on every call, static sections re-parsed and re-laid out,
+the full-resolution upload embedded with Image(image_path)) against the
+template engine in services/report_templates.py. Reports CPU time per
+report and output size.
+
+Usage: python benchmark_report_templates.py [iterations] [image_size]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer
+
+from services.llm_notes import format_explanation_for_report
+from services.pdf_report import generate_pdf_report
+from services.report_templates import _thumbnail_jpeg
+
+PREDICTION = {
+    "disease": "Eczema",
+    "confidence": 0.78,
+    "probabilities": {"Eczema": 0.78, "Melanocytic Nevi": 0.14, "Melanoma": 0.08}
+}
+
+EXPLANATION = {
+    "name": "Eczema (Atopic Dermatitis)",
+    "description": "Eczema is a chronic inflammatory skin condition that causes red, itchy, and inflamed patches of skin.",
+    "symptoms": ["Red, inflamed patches of skin", "Intense itching, especially at night", "Dry, scaly, or cracked skin"],
+    "causes": ["Genetic predisposition and family history", "Environmental allergens"],
+    "treatment": ["Moisturizing creams and ointments", "Topical corticosteroids", "Antihistamines"],
+    "urgency": "moderate",
+    "next_steps": "Schedule an appointment with a dermatologist for proper diagnosis and a personalized treatment plan.",
+    "disclaimer": "This information is for educational purposes only and should not replace professional medical advice."
+}
+
+def make_upload(path, image_size):
+    """Write a synthetic skin-like JPEG the size of a phone photo"""
+    rng = np.random.RandomState(0)
+    image = np.full((image_size, image_size, 3), (100, 120, 200), dtype=np.uint8)
+    image = cv2.add(image, rng.randint(0, 40, size=image.shape, dtype=np.uint8))
+    cv2.circle(image, (image_size // 2, image_size // 2), image_size // 4, (60, 50, 90), -1)
+    cv2.imwrite(path, image, [cv2.IMWRITE_JPEG_QUALITY, 92])
+
+def legacy_report(prediction_result, explanation, image_path, filepath):
+    """The previous per-call rendering path"""
+    doc = SimpleDocTemplate(filepath, pagesize=letter)
+    styles = getSampleStyleSheet()
+    story = []
+    title_style = ParagraphStyle('CustomTitle', parent=styles['Heading1'], fontSize=18, spaceAfter=30,
+                                 textColor=colors.darkblue)
+    heading_style = ParagraphStyle('CustomHeading', parent=styles['Heading2'], fontSize=14, spaceAfter=12,
+                                   textColor=colors.darkblue)
+
+    story.append(Paragraph("MEDICAL IMAGE ANALYSIS REPORT", title_style))
+    story.append(Spacer(1, 20))
+    story.append(Paragraph(f"""
+    <b>Report Generated:</b> {datetime.now().strftime("%B %d, %Y at %I:%M %p")}<br/>
+    <b>Analysis Method:</b> AI-Powered Image Classification<br/>
+    <b>Confidence Level:</b> {prediction_result['confidence']:.1%}<br/>
+    """, styles['Normal']))
+    story.append(Spacer(1, 20))
+
+    story.append(Paragraph("ANALYZED IMAGE:", heading_style))
+    story.append(Image(image_path, width=3*inch, height=3*inch))
+    story.append(Spacer(1, 20))
+
+    story.append(Paragraph("DIAGNOSIS RESULTS:", heading_style))
+    probabilities_html = "".join(f"• {name}: {p:.1%}<br/>" for name, p in prediction_result['probabilities'].items())
+    story.append(Paragraph(f"""
+    <b>Detected Condition:</b> {prediction_result['disease']}<br/>
+    <b>Confidence Score:</b> {prediction_result['confidence']:.1%}<br/>
+    <b>Classification Probabilities:</b><br/>
+    {probabilities_html}
+    """, styles['Normal']))
+    story.append(Spacer(1, 20))
+
+    story.append(Paragraph("MEDICAL INFORMATION:", heading_style))
+    story.append(Paragraph(format_explanation_for_report(explanation).replace('\n', '<br/>'), styles['Normal']))
+    story.append(Spacer(1, 20))
+
+    story.append(Paragraph("IMPORTANT DISCLAIMER:", heading_style))
+    story.append(Paragraph("""
+    <b>This report is generated by an AI system and is intended for informational purposes only.
+    It should not be used as a substitute for professional medical advice, diagnosis, or treatment.
+    Always seek the advice of qualified healthcare providers with any questions regarding medical conditions.
+    Never disregard professional medical advice or delay seeking it because of information from this report.</b>
+    """, styles['Normal']))
+    doc.build(story)
+    return filepath
+
+def template_report(upload_path, filepath):
+    # Every real report embeds a different upload, so don't let the thumbnail cache hide its cost
+    _thumbnail_jpeg.cache_clear()
+    return generate_pdf_report(PREDICTION, EXPLANATION, [], upload_path, filepath=filepath)
+
+def measure(render, iterations):
+    """CPU ms per report (process time, so disk and scheduling noise are excluded) and last output size"""
+    timings = []
+    for _ in range(iterations):
+        start = time.process_time()
+        path = render()
+        timings.append((time.process_time() - start) * 1000.0)
+    timings.sort()
+    return {
+        "mean_ms": sum(timings) / len(timings),
+        "p50_ms": timings[len(timings) // 2],
+        "size_kb": os.path.getsize(path) / 1024.0
+    }
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    image_size = int(sys.argv[2]) if len(sys.argv) > 2 else 2048
+
+    print("🖨️ Report Template Benchmark")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        upload_path = os.path.join(work_dir, "upload.jpg")
+        make_upload(upload_path, image_size)
+        print(f"Upload: {image_size}x{image_size} JPEG, {os.path.getsize(upload_path) / 1024:.0f} KB")
+
+        legacy_path = os.path.join(work_dir, "legacy.pdf")
+        template_path = os.path.join(work_dir, "template.pdf")
+        results = {
+            "legacy": measure(lambda: legacy_report(PREDICTION, EXPLANATION, upload_path, legacy_path), iterations),
+            "template": measure(lambda: template_report(upload_path, template_path), iterations)
+        }
+
+    for name, stats in results.items():
+        print(f"{name:>8}: mean {stats['mean_ms']:7.1f} ms  p50 {stats['p50_ms']:7.1f} ms  size {stats['size_kb']:8.1f} KB")
+    legacy, template = results["legacy"], results["template"]
+    print(f"Speedup: {legacy['mean_ms'] / template['mean_ms']:.1f}x CPU, "
+          f"{legacy['size_kb'] / template['size_kb']:.1f}x smaller")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark: PDF report throughput of the report worker pool
+
+Renders the /predict report with 1, 2, ... N worker processes (the same
+render_report_job the background job queue uses) and prints reports/sec
+and reports/sec/core for each pool size.
+
+Usage: python benchmark_reports.py [reports_per_run] [max_workers]
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from services.pdf_report import render_report_job
+
+def make_payload(index):
+    """A representative report payload; the index makes every report unique"""
+    return {
+        "prediction": {
+            "disease": "Eczema",
+            "confidence": 0.78,
+            "probabilities": {"Eczema": 0.78, "Melanocytic Nevi": 0.14, "Melanoma": 0.08},
+            "model_type": "feature_analysis",
+            "request": index
+        },
+        "explanation": {
+            "name": "Eczema (Atopic Dermatitis)",
+            "description": "Eczema is a chronic inflammatory skin condition that causes red, itchy, and inflamed patches of skin. " * 3,
+            "next_steps": "Schedule an appointment with a dermatologist for proper diagnosis and a personalized treatment plan.",
+            "disclaimer": "This information is for educational purposes only and should not replace professional medical advice."
+        },
+        "specialists": [],
+        "image_path": None
+    }
+
+def run(workers, reports, output_dir):
+    """Render ``reports`` unique PDFs with a pool of ``workers`` processes; returns reports/sec"""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        # Warm up the workers (interpreter start-up and ReportLab imports are not report cost)
+        list(pool.map(render_report_job, ["simple"] * workers,
+                      [make_payload(-1 - i) for i in range(workers)],
+                      [os.path.join(output_dir, f"warmup_{workers}_{i}.pdf") for i in range(workers)]))
+
+        paths = [os.path.join(output_dir, f"report_{workers}_{i}.pdf") for i in range(reports)]
+        start = time.perf_counter()
+        list(pool.map(render_report_job, ["simple"] * reports,
+                      [make_payload(i) for i in range(reports)], paths, chunksize=4))
+        elapsed = time.perf_counter() - start
+    return reports / elapsed
+
+def main():
+    reports = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+
+    print("🖨️ PDF Report Throughput Benchmark")
+    print("=" * 50)
+    print(f"Reports per run: {reports}, CPU cores: {os.cpu_count()}")
+
+    worker_counts = sorted({1, *[n for n in (2, 4, 8, 16) if n <= max_workers], max_workers})
+    with tempfile.TemporaryDirectory() as output_dir:
+        for workers in worker_counts:
+            throughput = run(workers, reports, output_dir)
+            cores = min(workers, os.cpu_count() or 1)
+            print(f"{workers:>2} workers: {throughput:7.1f} reports/sec  {throughput / cores:6.1f} reports/sec/core")
+
+if __name__ == "__main__":
+    main()
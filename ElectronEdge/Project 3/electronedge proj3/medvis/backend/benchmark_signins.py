@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark: concurrent sign-ins, pooled WAL database vs connect-per-call
+
+Simulates many clients signing in at once. The legacy path opens a new
+SQLite connection (rollback journal, synchronous=FULL) for every call and
+runs it on the default thread pool; the pooled path goes through
+AsyncUserDatabase (per-thread WAL connections on the database threads,
+bcrypt on the PasswordHasher pool).
+Prints sign-ins/sec and p50/p99 latency for each concurrency level.
+
+Password hashes use a low bcrypt cost so the numbers show database and
+scheduling overhead rather than hashing time.
+
+Usage: python benchmark_signins.py [signins_per_level] [users]
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import bcrypt
+
+from database import AsyncUserDatabase, PasswordHasher, UserDatabase, verify_password
+
+PASSWORD = "benchmark-password"
+BENCHMARK_ROUNDS = 4
+
+def create_users(db_path, count):
+    """Fill a fresh database with ``count`` users sharing one low-cost hash"""
+    hashed = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt(rounds=BENCHMARK_ROUNDS)).decode("utf-8")
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            full_name TEXT NOT NULL,
+            city TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            hashed_password TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP
+        )
+    ''')
+    conn.executemany(
+        "INSERT INTO users (full_name, city, email, hashed_password) VALUES (?, ?, ?, ?)",
+        [(f"User {i}", "Karachi", f"user{i}@example.com", hashed) for i in range(count)]
+    )
+    conn.commit()
+    conn.close()
+
+def legacy_verify_user(db_path, email, password):
+    """The previous verify_user: a new connection per call, closed afterwards"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT hashed_password FROM users WHERE email = ?", (email,))
+        result = cursor.fetchone()
+        if not result or not verify_password(password, result[0]):
+            return False, "Invalid email or password"
+        cursor.execute("UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE email = ?", (email,))
+        conn.commit()
+        return True, "Login successful"
+    finally:
+        conn.close()
+
+async def run_level(signin, concurrency, total, users):
+    """``total`` sign-ins from ``concurrency`` clients; returns (sign-ins/sec, latencies in ms)"""
+    latencies = []
+    counter = iter(range(total))
+
+    async def client():
+        for i in counter:
+            start = time.perf_counter()
+            success, message = await signin(f"user{i % users}@example.com", PASSWORD)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            if not success:
+                raise RuntimeError(message)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return total / elapsed, latencies
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+async def benchmark(total, users, work_dir):
+    legacy_path = os.path.join(work_dir, "legacy.db")
+    pooled_path = os.path.join(work_dir, "pooled.db")
+    create_users(legacy_path, users)
+    create_users(pooled_path, users)
+
+    loop = asyncio.get_running_loop()
+    pooled = AsyncUserDatabase(UserDatabase(pooled_path), max_workers=int(os.getenv("DB_POOL_SIZE", "4")),
+                               hasher=PasswordHasher(rounds=BENCHMARK_ROUNDS, max_queue=64, max_wait_seconds=30))
+
+    async def legacy_signin(email, password):
+        return await loop.run_in_executor(None, legacy_verify_user, legacy_path, email, password)
+
+    paths = {"legacy": legacy_signin, "pooled": pooled.verify_user}
+    try:
+        for concurrency in (1, 8, 32):
+            for name, signin in paths.items():
+                throughput, latencies = await run_level(signin, concurrency, total, users)
+                print(f"{name:>6} x{concurrency:<3}: {throughput:8.1f} sign-ins/sec  "
+                      f"p50 {percentile(latencies, 0.50):6.2f} ms  p99 {percentile(latencies, 0.99):6.2f} ms")
+    finally:
+        pooled.shutdown()
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    print("🔐 Concurrent Sign-in Benchmark")
+    print("=" * 50)
+    print(f"Sign-ins per level: {total}, users: {users}")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        asyncio.run(benchmark(total, users, work_dir))
+
+if __name__ == "__main__":
+    main()
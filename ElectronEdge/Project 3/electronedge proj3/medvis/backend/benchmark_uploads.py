@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark: disk round-trip vs in-memory decoding of uploaded images
+
+Compares the old /predict path (write upload to static/uploads, then
+cv2.imread it back) with the in-memory path (cv2.imdecode on a memoryview
+of the uploaded bytes).
+
+Usage: python benchmark_uploads.py [iterations] [image_size]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+def make_upload(image_size):
+    """Encode a synthetic skin-like JPEG, as a browser would upload it"""
+    rng = np.random.RandomState(0)
+    image = np.full((image_size, image_size, 3), (100, 120, 200), dtype=np.uint8)
+    noise = rng.randint(0, 40, size=image.shape, dtype=np.uint8)
+    image = cv2.add(image, noise)
+    cv2.circle(image, (image_size // 2, image_size // 2), image_size // 4, (60, 50, 90), -1)
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    if not ok:
+        raise RuntimeError("Could not encode benchmark image")
+    return encoded.tobytes()
+
+def disk_path(content, upload_dir):
+    """Old path: write the upload to disk, then read it back for analysis"""
+    upload_path = os.path.join(upload_dir, "upload.jpg")
+    with open(upload_path, "wb") as buffer:
+        buffer.write(content)
+    return cv2.imread(upload_path)
+
+def memory_path(content):
+    """New path: decode straight from the uploaded bytes"""
+    return cv2.imdecode(np.frombuffer(memoryview(content), dtype=np.uint8), cv2.IMREAD_COLOR)
+
+def time_it(fn, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000.0)
+    timings.sort()
+    return {
+        "mean_ms": sum(timings) / len(timings),
+        "p50_ms": timings[len(timings) // 2],
+        "p99_ms": timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    }
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    image_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1024
+
+    content = make_upload(image_size)
+    print("📦 Upload Path Benchmark")
+    print("=" * 50)
+    print(f"Image: {image_size}x{image_size} JPEG, {len(content) / 1024:.1f} KB, {iterations} iterations")
+
+    with tempfile.TemporaryDirectory() as upload_dir:
+        # Sanity check: both paths must decode identical pixels
+        assert np.array_equal(disk_path(content, upload_dir), memory_path(content))
+
+        disk = time_it(lambda: disk_path(content, upload_dir), iterations)
+        memory = time_it(lambda: memory_path(content), iterations)
+
+    for name, result in (("disk write + imread", disk), ("in-memory imdecode", memory)):
+        print(f"{name:>22}: mean {result['mean_ms']:.2f} ms | "
+              f"p50 {result['p50_ms']:.2f} ms | p99 {result['p99_ms']:.2f} ms")
+
+    print(f"\n🚀 In-memory path is {disk['mean_ms'] / memory['mean_ms']:.2f}x faster on average")
+
+if __name__ == "__main__":
+    main()
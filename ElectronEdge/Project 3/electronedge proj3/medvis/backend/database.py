@@ -1,8 +1,19 @@
 import sqlite3
 import os
+import json
+import base64
+import math
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import bcrypt
 
+# bcrypt cost factor for new hashes; existing hashes are upgraded on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
 def safe_password_truncate(password: str) -> str:
     """Safely truncate password to 72 characters for bcrypt compatibility"""
     if len(password) > 72:
@@ -11,12 +22,12 @@ def safe_password_truncate(password: str) -> str:
         return truncated
     return password
 
-def hash_password(password: str) -> str:
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
     """Hash password using bcrypt"""
     password_safe = safe_password_truncate(password)
     # Convert to bytes and hash
     password_bytes = password_safe.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=rounds)
     hashed = bcrypt.hashpw(password_bytes, salt)
     return hashed.decode('utf-8')
 
@@ -27,14 +38,178 @@ def verify_password(password: str, hashed: str) -> bool:
     hashed_bytes = hashed.encode('utf-8')
     return bcrypt.checkpw(password_bytes, hashed_bytes)
 
+def hash_rounds(hashed: str):
+    """Cost factor of a bcrypt hash ("$2b$12$..." -> 12), or None if it can't be parsed"""
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+def encode_cursor(after) -> str:
+    """Opaque pagination cursor for a (created_at, id) position"""
+    return base64.urlsafe_b64encode(json.dumps(list(after)).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str):
+    """(created_at, id) from a cursor made by encode_cursor; raises ValueError if malformed"""
+    try:
+        created_at, user_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(created_at), int(user_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+class HashingOverloaded(Exception):
+    """Raised when password hashing is saturated and a request is shed"""
+    
+    def __init__(self, retry_after: int):
+        super().__init__(f"Password hashing is overloaded, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+class PasswordHasher:
+    """bcrypt on a dedicated bounded thread pool with admission control
+    
+    Each hash costs ~100 ms of CPU at the default cost. bcrypt releases the
+    GIL, so a small pool keeps it off the event loop, and capping the pool
+    below the core count leaves CPU for predictions during a login storm.
+    At most ``max_workers + max_queue`` hashes are admitted at once; extra
+    requests wait up to ``max_wait_seconds`` for a slot and are then shed
+    with HashingOverloaded (HTTP 429).
+    """
+    
+    def __init__(self, rounds=BCRYPT_ROUNDS, max_workers=None, max_queue=32, max_wait_seconds=2.0):
+        self.rounds = rounds
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) // 2)
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="medvis-bcrypt")
+        self._slots = None
+        
+        # Counters
+        self.in_flight = 0
+        self.completed = 0
+        self.delayed = 0
+        self.shed = 0
+        self.rehashed = 0
+        self.hash_seconds = 0.0
+    
+    def _retry_after(self) -> int:
+        avg = self.hash_seconds / self.completed if self.completed else 0.1
+        return max(1, math.ceil(self.in_flight * avg / self.max_workers))
+    
+    async def _admit(self):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers + self.max_queue)
+        if not self._slots.locked():
+            await self._slots.acquire()
+            return
+        self.delayed += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            self.shed += 1
+            raise HashingOverloaded(self._retry_after())
+    
+    async def _run(self, fn, *args):
+        await self._admit()
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+        finally:
+            self.hash_seconds += time.perf_counter() - start
+            self.completed += 1
+            self.in_flight -= 1
+            self._slots.release()
+    
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password, self.rounds)
+    
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(verify_password, password, hashed)
+    
+    def needs_rehash(self, hashed: str) -> bool:
+        return hash_rounds(hashed) != self.rounds
+    
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+    
+    def get_stats(self):
+        return {
+            "rounds": self.rounds,
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "delayed": self.delayed,
+            "shed": self.shed,
+            "rehashed": self.rehashed,
+            "avg_hash_ms": (self.hash_seconds / self.completed * 1000) if self.completed else 0.0
+        }
+
+class ConnectionPool:
+    """Per-thread SQLite connections in WAL mode
+    
+    Each worker thread keeps one long-lived connection instead of opening a
+    new one per query, so the statement cache (prepared statements) survives
+    between calls. WAL lets readers proceed while a writer commits;
+    synchronous=NORMAL is durable in WAL mode except on power loss, and the
+    busy timeout makes concurrent writers wait instead of failing.
+    """
+    
+    def __init__(self, db_path, busy_timeout_ms=5000, cached_statements=128):
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        
+        # journal_mode is persistent in the database file, so set it once
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.close()
+    
+    def connection(self):
+        """This thread's connection, opened on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=self.busy_timeout_ms / 1000,
+                cached_statements=self.cached_statements,
+                check_same_thread=False  # only close_all() touches it from another thread
+            )
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+    
+    def close_all(self):
+        """Close every pooled connection (call on shutdown)"""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+    
+    def get_stats(self):
+        return {
+            "connections": len(self._connections),
+            "journal_mode": "wal",
+            "busy_timeout_ms": self.busy_timeout_ms,
+            "cached_statements": self.cached_statements
+        }
+
 class UserDatabase:
-    def __init__(self, db_path="users.db"):
+    def __init__(self, db_path="users.db", busy_timeout_ms=5000):
         self.db_path = db_path
+        self.pool = ConnectionPool(db_path, busy_timeout_ms=busy_timeout_ms)
         self.init_database()
     
     def init_database(self):
         """Initialize the database and create users table if it doesn't exist"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connection()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -49,84 +224,86 @@ class UserDatabase:
             )
         ''')
         
+        # Keyset pagination walks these newest first; the city index serves filtered listings
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_created ON users (created_at, id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_city_created ON users (city, created_at, id)")
+        
         conn.commit()
-        conn.close()
-        print(f"✅ Database initialized: {self.db_path}")
+        print(f"✅ Database initialized: {self.db_path} (WAL mode)")
     
     def create_user(self, full_name: str, city: str, email: str, password: str):
         """Create a new user account"""
-        conn = sqlite3.connect(self.db_path)
+        try:
+            if self.get_password_hash(email) is not None:
+                return False, "Email already registered"
+        except Exception as e:
+            return False, f"Database error: {str(e)}"
+        return self.insert_user(full_name, city, email, hash_password(password))
+    
+    def insert_user(self, full_name: str, city: str, email: str, hashed_password: str):
+        """Store a new user whose password has already been hashed"""
+        conn = self.pool.connection()
         cursor = conn.cursor()
         
         try:
-            # Check if user already exists
-            cursor.execute("SELECT email FROM users WHERE email = ?", (email,))
-            if cursor.fetchone():
-                conn.close()
-                return False, "Email already registered"
-            
-            # Truncate password to 72 characters for bcrypt compatibility
-            password_safe = safe_password_truncate(password)
-            
-            # Hash password and create user
-            hashed_password = hash_password(password)
             cursor.execute('''
                 INSERT INTO users (full_name, city, email, hashed_password)
                 VALUES (?, ?, ?, ?)
             ''', (full_name, city, email, hashed_password))
             
             conn.commit()
-            conn.close()
             print(f"✅ User created: {email}")
             return True, "User created successfully"
             
         except sqlite3.IntegrityError:
-            conn.close()
+            conn.rollback()
             return False, "Email already registered"
         except Exception as e:
-            conn.close()
+            conn.rollback()
             return False, f"Database error: {str(e)}"
     
     def verify_user(self, email: str, password: str):
         """Verify user credentials for login"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute("SELECT hashed_password FROM users WHERE email = ?", (email,))
-            result = cursor.fetchone()
-            
-            if not result:
-                conn.close()
+            hashed_password = self.get_password_hash(email)
+            if hashed_password is None or not verify_password(password, hashed_password):
                 return False, "Invalid email or password"
             
-            hashed_password = result[0]
-            
-            # Truncate password to 72 characters for bcrypt compatibility
-            password_safe = safe_password_truncate(password)
-            
-            # Verify password
-            if verify_password(password, hashed_password):
-                # Update last login time
-                cursor.execute(
-                    "UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE email = ?",
-                    (email,)
-                )
-                conn.commit()
-                conn.close()
-                print(f"✅ User logged in: {email}")
-                return True, "Login successful"
-            else:
-                conn.close()
-                return False, "Invalid email or password"
-                
+            # Upgrade hashes made with a different cost factor while we have the password
+            new_hash = hash_password(password) if hash_rounds(hashed_password) != BCRYPT_ROUNDS else None
+            self.record_login(email, new_hash)
+            return True, "Login successful"
+        
         except Exception as e:
-            conn.close()
             return False, f"Database error: {str(e)}"
     
+    def get_password_hash(self, email: str):
+        """Stored bcrypt hash for a user, or None if the email is unknown"""
+        cursor = self.pool.connection().cursor()
+        cursor.execute("SELECT hashed_password FROM users WHERE email = ?", (email,))
+        result = cursor.fetchone()
+        return result[0] if result else None
+    
+    def record_login(self, email: str, new_hash: str = None):
+        """Update last login time, replacing the password hash if it was upgraded"""
+        conn = self.pool.connection()
+        try:
+            if new_hash:
+                conn.execute(
+                    "UPDATE users SET last_login = CURRENT_TIMESTAMP, hashed_password = ? WHERE email = ?",
+                    (new_hash, email)
+                )
+            else:
+                conn.execute("UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE email = ?", (email,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"✅ User logged in: {email}")
+    
     def get_user(self, email: str):
         """Get user information by email"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connection()
         cursor = conn.cursor()
         
         try:
@@ -136,7 +313,6 @@ class UserDatabase:
             ''', (email,))
             
             result = cursor.fetchone()
-            conn.close()
             
             if result:
                 return {
@@ -150,52 +326,68 @@ class UserDatabase:
             return None
             
         except Exception as e:
-            conn.close()
+            conn.rollback()
             print(f"❌ Database error: {e}")
             return None
     
-    def get_all_users(self):
-        """Get all users (for admin purposes)"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def list_users(self, limit: int = 100, after=None, city: str = None,
+                   created_from: str = None, created_to: str = None):
+        """One page of users, newest first (for admin purposes)
         
-        try:
-            cursor.execute('''
-                SELECT id, full_name, city, email, created_at, last_login
-                FROM users ORDER BY created_at DESC
-            ''')
-            
-            results = cursor.fetchall()
-            conn.close()
-            
-            users = []
-            for result in results:
-                users.append({
-                    "id": result[0],
-                    "full_name": result[1],
-                    "city": result[2],
-                    "email": result[3],
-                    "created_at": result[4],
-                    "last_login": result[5]
-                })
-            
-            return users
-            
-        except Exception as e:
-            conn.close()
-            print(f"❌ Database error: {e}")
-            return []
+        Keyset pagination: ``after`` is the (created_at, id) of the last user
+        on the previous page, so every page is an index range scan no matter
+        how deep it is. Returns (users, cursor of the last row or None when
+        there are no more pages).
+        """
+        conditions = []
+        params = []
+        if city:
+            conditions.append("city = ?")
+            params.append(city)
+        if created_from:
+            conditions.append("created_at >= ?")
+            params.append(created_from)
+        if created_to:
+            conditions.append("created_at < ?")
+            params.append(created_to)
+        if after:
+            conditions.append("(created_at, id) < (?, ?)")
+            params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        cursor = self.pool.connection().cursor()
+        cursor.execute(f'''
+            SELECT id, full_name, city, email, created_at, last_login
+            FROM users {where}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        ''', (*params, limit + 1))
+        results = cursor.fetchall()
+        
+        users = [{
+            "id": result[0],
+            "full_name": result[1],
+            "city": result[2],
+            "email": result[3],
+            "created_at": result[4],
+            "last_login": result[5]
+        } for result in results[:limit]]
+        
+        next_after = None
+        if len(results) > limit:
+            last = users[-1]
+            next_after = (last["created_at"], last["id"])
+        return users, next_after
     
     def delete_user(self, email: str):
         """Delete a user account"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connection()
         cursor = conn.cursor()
         
         try:
             cursor.execute("DELETE FROM users WHERE email = ?", (email,))
             deleted_rows = cursor.rowcount
             conn.commit()
-            conn.close()
             
             if deleted_rows > 0:
                 print(f"✅ User deleted: {email}")
@@ -204,8 +396,148 @@ class UserDatabase:
                 return False, "User not found"
                 
         except Exception as e:
-            conn.close()
+            conn.rollback()
+            return False, f"Database error: {str(e)}"
+
+class AsyncUserDatabase:
+    """Async facade over UserDatabase for the FastAPI handlers
+    
+    Queries run on a small dedicated thread pool, so the event loop never
+    waits on SQLite and the number of pooled connections is bounded by the
+    number of database threads. Password hashing runs on the PasswordHasher
+    pool instead, so a burst of logins can't tie up database threads.
+    
+    ``get_user`` results are kept in an LRU. Every write through this facade
+    invalidates the user it touched, and a lookup that raced with a write is
+    not cached.
+    """
+    
+    def __init__(self, db: UserDatabase, max_workers=4, hasher: PasswordHasher = None, user_cache_size=1024):
+        self.db = db
+        self.max_workers = max_workers
+        self.hasher = hasher or PasswordHasher()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="medvis-db")
+        
+        self.user_cache_size = user_cache_size
+        self._users = OrderedDict()
+        self._writes = 0
+        self.user_cache_hits = 0
+        self.user_cache_misses = 0
+    
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+    
+    async def _write(self, email: str, fn, *args):
+        try:
+            return await self._run(fn, *args)
+        finally:
+            self._writes += 1
+            self._users.pop(email, None)
+    
+    async def create_user(self, full_name: str, city: str, email: str, password: str):
+        """Create a user account; raises HashingOverloaded when hashing is saturated"""
+        try:
+            if await self._run(self.db.get_password_hash, email) is not None:
+                return False, "Email already registered"
+        except Exception as e:
+            return False, f"Database error: {str(e)}"
+        
+        hashed_password = await self.hasher.hash(password)
+        return await self._write(email, self.db.insert_user, full_name, city, email, hashed_password)
+    
+    async def verify_user(self, email: str, password: str):
+        """Verify login credentials; raises HashingOverloaded when hashing is saturated
+        
+        A hash made with a different cost factor is replaced on a successful
+        login, so changing BCRYPT_ROUNDS migrates users as they sign in.
+        """
+        try:
+            hashed_password = await self._run(self.db.get_password_hash, email)
+        except Exception as e:
+            return False, f"Database error: {str(e)}"
+        
+        if hashed_password is None or not await self.hasher.verify(password, hashed_password):
+            return False, "Invalid email or password"
+        
+        new_hash = None
+        if self.hasher.needs_rehash(hashed_password):
+            try:
+                new_hash = await self.hasher.hash(password)
+                self.hasher.rehashed += 1
+            except HashingOverloaded:
+                pass  # the login still succeeds; the hash is upgraded next time
+        
+        try:
+            await self._write(email, self.db.record_login, email, new_hash)
+        except Exception as e:
             return False, f"Database error: {str(e)}"
+        return True, "Login successful"
+    
+    async def get_user(self, email: str):
+        user = self._users.get(email)
+        if user is not None:
+            self._users.move_to_end(email)
+            self.user_cache_hits += 1
+            return dict(user)
+        
+        self.user_cache_misses += 1
+        writes = self._writes
+        user = await self._run(self.db.get_user, email)
+        if user is not None and writes == self._writes and self.user_cache_size > 0:
+            self._users[email] = user
+            while len(self._users) > self.user_cache_size:
+                self._users.popitem(last=False)
+            user = dict(user)
+        return user
+    
+    async def list_users(self, limit: int = 100, after=None, city: str = None,
+                         created_from: str = None, created_to: str = None):
+        return await self._run(self.db.list_users, limit, after, city, created_from, created_to)
+    
+    async def iter_users(self, page_size: int = 500, **filters):
+        """Every matching user, newest first, fetched one keyset page at a time"""
+        after = None
+        while True:
+            users, after = await self.list_users(page_size, after, **filters)
+            for user in users:
+                yield user
+            if after is None:
+                return
+    
+    async def delete_user(self, email: str):
+        return await self._write(email, self.db.delete_user, email)
+    
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+        self.hasher.shutdown()
+        self.db.pool.close_all()
+    
+    def get_stats(self):
+        return {
+            "threads": self.max_workers,
+            **self.db.pool.get_stats(),
+            "user_cache": {
+                "size": len(self._users),
+                "max_entries": self.user_cache_size,
+                "hits": self.user_cache_hits,
+                "misses": self.user_cache_misses
+            },
+            "hashing": self.hasher.get_stats()
+        }
 
-# Global database instance
-user_db = UserDatabase()
\ No newline at end of file
+# Global database instances
+user_db = UserDatabase(
+    db_path=os.getenv("USERS_DB", "users.db"),
+    busy_timeout_ms=int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+)
+async_user_db = AsyncUserDatabase(
+    user_db,
+    max_workers=int(os.getenv("DB_POOL_SIZE", "4")),
+    user_cache_size=int(os.getenv("USER_CACHE_SIZE", "1024")),
+    hasher=PasswordHasher(
+        rounds=BCRYPT_ROUNDS,
+        max_workers=int(os.getenv("BCRYPT_WORKERS", "0")) or None,
+        max_queue=int(os.getenv("BCRYPT_MAX_QUEUE", "32")),
+        max_wait_seconds=float(os.getenv("BCRYPT_MAX_WAIT_SECONDS", "2"))
+    )
+)
\ No newline at end of file
@@ -0,0 +1,233 @@
+"""Inference backends behind one batch API
+
+Every backend takes a float32 (N, H, W, 3) RGB batch in [0, 1], as built by
+prepare_batch(), and returns an (N, num_classes) float32 array of class
+probabilities. Backend-specific input handling (ImageNet normalisation and
+NCHW layout for the torch models) happens inside predict_batch. The one
+per-backend preprocessing choice is the resize filter, ``resample``:
+bicubic for Keras, bilinear for the torch models, as in training
+(transforms.Resize and ml/image_io.load_resized_image).
+
+Backends are registered by name and chosen with INFERENCE_BACKEND:
+
+    keras        - a saved Keras model (.h5 / .keras), TensorFlow
+    torch        - SkinDiseaseClassifier weights (state dict .pth), eager PyTorch
+    torchscript  - SkinDiseaseClassifier exported with ml/export_model.py (.pt)
+    onnx         - SkinDiseaseClassifier exported with ml/export_model.py (.onnx), ONNX Runtime CPU
+    features     - the rule-based colour / texture / shape scorer, no model file
+
+Framework imports happen inside each backend, so only the selected one is loaded.
+"""
+
+import os
+from typing import Dict, List
+
+import numpy as np
+from PIL import Image
+
+from ml.image_context import ImageContext
+
+IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+TORCH_CLASS_NAMES = ['Eczema', 'Basal Cell Carcinoma']
+KERAS_CLASS_NAMES = ['Eczema', 'Melanocytic_Nevi', 'Melanoma']
+
+BACKENDS = {}
+
+def register_backend(name):
+    """Class decorator adding an InferenceBackend to the registry under ``name``"""
+    def register(cls):
+        cls.name = name
+        BACKENDS[name] = cls
+        return cls
+    return register
+
+def prepare_batch(images, size, resample=Image.BICUBIC) -> np.ndarray:
+    """Stack ImageContexts or paths into a float32 (N, H, W, 3) RGB batch in [0, 1]"""
+    return np.concatenate([ImageContext.ensure(image).resized_tensor(size, resample) for image in images], axis=0)
+
+def _to_nchw(batch: np.ndarray) -> np.ndarray:
+    """ImageNet-normalised, channels-first copy of an NHWC batch (what the torch models expect)"""
+    normalized = (np.asarray(batch, dtype=np.float32) - IMAGENET_MEAN) / IMAGENET_STD
+    return np.ascontiguousarray(normalized.transpose(0, 3, 1, 2))
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return (shifted / shifted.sum(axis=1, keepdims=True)).astype(np.float32)
+
+def _num_threads():
+    threads = int(os.getenv("INFERENCE_THREADS", "0"))
+    return threads if threads > 0 else (os.cpu_count() or 1)
+
+class InferenceBackend:
+    """Base class: a model that turns an image batch into class probabilities"""
+
+    name = "base"
+    input_size = (224, 224)
+    resample = Image.BICUBIC
+    class_names: List[str] = []
+
+    def __init__(self, model_path: str = None):
+        self.model_path = model_path
+
+    def predict_batch(self, batch: np.ndarray) -> np.ndarray:
+        """(N, H, W, 3) float32 RGB in [0, 1] -> (N, num_classes) probabilities"""
+        raise NotImplementedError
+
+    def predict_images(self, images) -> np.ndarray:
+        """Probabilities for a list of ImageContexts or paths"""
+        return self.predict_batch(prepare_batch(images, self.input_size, self.resample))
+
+    @property
+    def model_version(self) -> str:
+        """Backend name plus the model file's size and mtime, for cache keys"""
+        if not self.model_path or not os.path.exists(self.model_path):
+            return self.name
+        stat = os.stat(self.model_path)
+        return f"{self.name}:{self.model_path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def get_info(self) -> Dict:
+        return {
+            "backend": self.name,
+            "model_path": self.model_path,
+            "input_size": list(self.input_size),
+            "resample": Image.Resampling(self.resample).name.lower(),
+            "class_names": self.class_names
+        }
+
+def _require_file(model_path):
+    if not model_path or not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model file not found: {model_path}")
+
+@register_backend("torch")
+class TorchBackend(InferenceBackend):
+    """SkinDiseaseClassifier in eager PyTorch
+
+    Loads a state dict from ``model_path``. Without a path the classifier
+    keeps its ImageNet backbone and an untrained head (``pretrained``), which
+    is only useful for testing.
+    """
+
+    resample = Image.BILINEAR
+
+    def __init__(self, model_path: str = None, class_names: List[str] = None, pretrained: bool = False):
+        super().__init__(model_path)
+        import torch
+
+        self.torch = torch
+        self.class_names = class_names or TORCH_CLASS_NAMES
+        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        if os.getenv("INFERENCE_THREADS"):
+            torch.set_num_threads(_num_threads())
+        self.model = self._load_model(model_path, pretrained)
+        self.model.to(self.device)
+        self.model.eval()
+
+    def _load_model(self, model_path, pretrained):
+        from ml.classifier import SkinDiseaseClassifier
+
+        model = SkinDiseaseClassifier(num_classes=len(self.class_names), pretrained=pretrained)
+        if model_path:
+            _require_file(model_path)
+            model.load_state_dict(self.torch.load(model_path, map_location=self.device, weights_only=True))
+        return model
+
+    def predict_batch(self, batch):
+        inputs = self.torch.from_numpy(_to_nchw(batch)).to(self.device)
+        with self.torch.inference_mode():
+            probabilities = self.torch.softmax(self.model(inputs), dim=1)
+        return probabilities.float().cpu().numpy()
+
+@register_backend("torchscript")
+class TorchScriptBackend(TorchBackend):
+    """SkinDiseaseClassifier exported to TorchScript: no Python model code, frozen graph"""
+
+    def __init__(self, model_path: str = None, class_names: List[str] = None):
+        super().__init__(model_path, class_names)
+
+    def _load_model(self, model_path, pretrained):
+        _require_file(model_path)
+        return self.torch.jit.load(model_path, map_location=self.device)
+
+@register_backend("onnx")
+class OnnxBackend(InferenceBackend):
+    """SkinDiseaseClassifier exported to ONNX, run by ONNX Runtime on the CPU"""
+
+    resample = Image.BILINEAR
+
+    def __init__(self, model_path: str = None, class_names: List[str] = None, num_threads: int = None):
+        super().__init__(model_path)
+        import onnxruntime as ort
+
+        _require_file(model_path)
+        self.class_names = class_names or TORCH_CLASS_NAMES
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads or _num_threads()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict_batch(self, batch):
+        logits = self.session.run(None, {self.input_name: _to_nchw(batch)})[0]
+        return _softmax(logits)
+
+@register_backend("keras")
+class KerasBackend(InferenceBackend):
+    """A saved Keras model; its input size is read from the model"""
+
+    def __init__(self, model_path: str = None, class_names: List[str] = None):
+        super().__init__(model_path)
+        import tensorflow as tf
+
+        _require_file(model_path)
+        self.model = tf.keras.models.load_model(model_path, compile=False)
+        self.input_size = (self.model.input_shape[1], self.model.input_shape[2])
+        self.class_names = class_names or KERAS_CLASS_NAMES
+
+    def predict_batch(self, batch):
+        probabilities = np.asarray(self.model.predict(np.asarray(batch, dtype=np.float32), verbose=0),
+                                   dtype=np.float32)
+        if probabilities.shape[1] == 1:
+            # Single sigmoid output
+            probabilities = np.concatenate([1 - probabilities, probabilities], axis=1)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+@register_backend("features")
+class FeatureBackend(InferenceBackend):
+    """The colour / texture / shape rule scorer of KerasImageAnalyzer, as a backend
+
+    predict_images scores the full-resolution images, as the API does;
+    predict_batch scores whatever resolution it is given.
+    """
+
+    class_names = KERAS_CLASS_NAMES
+
+    def __init__(self, model_path: str = None):
+        super().__init__(None)
+        from ml.keras_model import get_keras_analyzer
+
+        self.analyzer = get_keras_analyzer()
+
+    def _score(self, contexts):
+        _, _, probabilities = self.analyzer.score_feature_table(self.analyzer.analyze_batch(contexts))
+        return probabilities.astype(np.float32)
+
+    def predict_batch(self, batch):
+        pixels = np.clip(np.rint(np.asarray(batch) * 255.0), 0, 255).astype(np.uint8)
+        return self._score([ImageContext(np.ascontiguousarray(rgb[..., ::-1])) for rgb in pixels])
+
+    def predict_images(self, images):
+        return self._score([ImageContext.ensure(image) for image in images])
+
+def create_backend(name: str = None, model_path: str = None, **options) -> InferenceBackend:
+    """Build the backend named ``name`` (default: INFERENCE_BACKEND, then "features")
+
+    ``model_path`` defaults to INFERENCE_MODEL_PATH. Raises ValueError for an
+    unknown name and FileNotFoundError if the backend needs a missing model file.
+    """
+    name = (name or os.getenv("INFERENCE_BACKEND") or "features").lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {name!r}, expected one of {sorted(BACKENDS)}")
+    model_path = model_path or os.getenv("INFERENCE_MODEL_PATH") or None
+    return BACKENDS[name](model_path=model_path, **options)
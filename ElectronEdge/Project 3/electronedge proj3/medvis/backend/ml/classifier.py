@@ -0,0 +1,24 @@
+import torch.nn as nn
+import torchvision.models as models
+
+class SkinDiseaseClassifier(nn.Module):
+    """ResNet18 classifier for skin disease images (Eczema vs Basal Cell Carcinoma)"""
+
+    def __init__(self, num_classes=2, pretrained=True):
+        super(SkinDiseaseClassifier, self).__init__()
+
+        # Use ResNet18 as backbone
+        self.backbone = models.resnet18(pretrained=pretrained)
+
+        # Replace the final layer for our classes
+        num_features = self.backbone.fc.in_features
+        self.backbone.fc = nn.Sequential(
+            nn.Dropout(0.5),
+            nn.Linear(num_features, 128),
+            nn.ReLU(),
+            nn.Dropout(0.3),
+            nn.Linear(128, num_classes)
+        )
+
+    def forward(self, x):
+        return self.backbone(x)
@@ -0,0 +1,316 @@
+"""Incremental dataset manifest for training runs
+
+A SQLite manifest records, for every image under data_dir/<class name>/:
+- its path, size, mtime and sha256
+- its label
+- where its preprocessed pixels are cached (shard file and row)
+
+Each run only reads what changed:
+- scan() stats the class folders and hashes only files whose size or
+  mtime changed, or that are new.
+- cache_pending() decodes and resizes only images without cached pixels
+  into new uint8 shards.
+So a dataset that grows by additions costs one pass over the new files.
+
+Train/val membership comes from each image's content hash rather than a
+shuffle: each class is ranked by hash and its first images go to val, so
+every class is split at the same fraction, duplicate files land on the
+same side, and growing the dataset only moves images near a class's
+cut-off (see DatasetManifest.split).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+from ml.image_io import IMAGE_EXTENSIONS, load_resized_image
+
+MANIFEST_FILE = "manifest.db"
+
+def file_sha256(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def hash_fraction(sha256: str, salt: str = "") -> float:
+    """Stable position in [0, 1) for an image, from its content hash"""
+    if salt:
+        sha256 = hashlib.sha256(f"{salt}:{sha256}".encode("utf-8")).hexdigest()
+    return int(sha256[:16], 16) / float(1 << 64)
+
+class DatasetManifest:
+    """SQLite index of a class-folder dataset and its preprocessed cache
+
+    The manifest and its shards live in ``cache_dir`` (default
+    data_dir/.manifest_cache). Changing the class list or the image size
+    invalidates the recorded labels or cached pixels, so they are rebuilt.
+    """
+
+    def __init__(self, data_dir, class_names, cache_dir=None, image_size=(224, 224), workers=None):
+        self.data_dir = data_dir
+        self.class_names = list(class_names)
+        self.cache_dir = cache_dir or os.path.join(data_dir, ".manifest_cache")
+        self.image_size = tuple(image_size)
+        self.workers = workers or os.cpu_count() or 1
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.db_path = os.path.join(self.cache_dir, MANIFEST_FILE)
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS images (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                path TEXT UNIQUE NOT NULL,
+                label INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                shard TEXT,
+                row INTEGER,
+                error TEXT,
+                indexed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_images_shard ON images(shard);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        ''')
+
+        # Labels are indexes into class_names and rows are cached at image_size
+        meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        class_names = json.dumps(self.class_names)
+        image_size = json.dumps(list(self.image_size))
+        if meta.get("class_names", class_names) != class_names:
+            print("🗂️ Class list changed; re-indexing the dataset")
+            conn.execute("DELETE FROM images")
+        elif meta.get("image_size", image_size) != image_size:
+            print("🗂️ Image size changed; re-caching every image")
+            conn.execute("UPDATE images SET shard = NULL, row = NULL, error = NULL")
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('class_names', ?)", (class_names,))
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('image_size', ?)", (image_size,))
+        conn.commit()
+        conn.close()
+
+    def _walk(self):
+        """(relative path, label, size, mtime_ns) of every image, from one scandir per class folder"""
+        for label, class_name in enumerate(self.class_names):
+            class_path = os.path.join(self.data_dir, class_name)
+            if not os.path.isdir(class_path):
+                continue
+            with os.scandir(class_path) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                        stat = entry.stat()
+                        yield os.path.join(class_name, entry.name), label, stat.st_size, stat.st_mtime_ns
+
+    def scan(self) -> Dict:
+        """Bring the manifest up to date with the files on disk; returns change counts
+
+        Unchanged files (same size and mtime) are not opened. New and
+        modified files are hashed in parallel. A modified file keeps its
+        cached pixels if its content hash did not change.
+        """
+        conn = self._connect()
+        known = {path: (label, size, mtime_ns, sha256) for path, label, size, mtime_ns, sha256
+                 in conn.execute("SELECT path, label, size, mtime_ns, sha256 FROM images")}
+
+        seen = set()
+        to_hash = []
+        for path, label, size, mtime_ns in self._walk():
+            seen.add(path)
+            record = known.get(path)
+            if record is None or record[1:3] != (size, mtime_ns) or record[0] != label:
+                to_hash.append((path, label, size, mtime_ns))
+
+        counts = {"new": 0, "changed": 0, "unchanged": len(seen) - len(to_hash), "removed": 0}
+        now = time.time()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            hashes = pool.map(lambda item: file_sha256(os.path.join(self.data_dir, item[0])), to_hash)
+            for (path, label, size, mtime_ns), sha256 in zip(to_hash, hashes):
+                record = known.get(path)
+                if record is None:
+                    counts["new"] += 1
+                    conn.execute(
+                        "INSERT INTO images (path, label, size, mtime_ns, sha256, indexed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                        (path, label, size, mtime_ns, sha256, now)
+                    )
+                elif record[3] == sha256:
+                    # Touched but identical: keep the cached pixels
+                    counts["unchanged"] += 1
+                    conn.execute("UPDATE images SET size = ?, mtime_ns = ? WHERE path = ?", (size, mtime_ns, path))
+                else:
+                    counts["changed"] += 1
+                    conn.execute(
+                        "UPDATE images SET label = ?, size = ?, mtime_ns = ?, sha256 = ?, shard = NULL, row = NULL, "
+                        "error = NULL, indexed_at = ? WHERE path = ?",
+                        (label, size, mtime_ns, sha256, now, path)
+                    )
+
+        removed = [(path,) for path in known if path not in seen]
+        conn.executemany("DELETE FROM images WHERE path = ?", removed)
+        counts["removed"] = len(removed)
+        conn.commit()
+        conn.close()
+
+        print(f"🗂️ Manifest: {counts['new']} new, {counts['changed']} changed, "
+              f"{counts['unchanged']} unchanged, {counts['removed']} removed")
+        return counts
+
+    def _next_shard_name(self, conn):
+        value = conn.execute("SELECT value FROM meta WHERE key = 'next_shard'").fetchone()
+        number = int(value[0]) if value else 0
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('next_shard', ?)", (str(number + 1),))
+        return f"shard_{number:05d}.npy"
+
+    def cache_pending(self, shard_size=1024) -> int:
+        """Decode and resize images without cached pixels into new shards; returns how many were cached
+
+        Unreadable images are marked with their error and not retried until
+        the file changes. Shards no image refers to any more are deleted.
+        """
+        conn = self._connect()
+        pending = conn.execute(
+            "SELECT id, path FROM images WHERE shard IS NULL AND error IS NULL ORDER BY id"
+        ).fetchall()
+        cached = 0
+        if pending:
+            print(f"📦 Caching {len(pending)} new or changed images...")
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for start in range(0, len(pending), shard_size):
+                chunk = pending[start:start + shard_size]
+                decoded = list(pool.map(
+                    lambda item: load_resized_image(os.path.join(self.data_dir, item[1]), self.image_size), chunk
+                ))
+                rows = [(image_id, pixels) for (image_id, _), pixels in zip(chunk, decoded) if pixels is not None]
+                for (image_id, path), pixels in zip(chunk, decoded):
+                    if pixels is None:
+                        conn.execute("UPDATE images SET error = 'unreadable image' WHERE id = ?", (image_id,))
+                if not rows:
+                    conn.commit()
+                    continue
+
+                shard_name = self._next_shard_name(conn)
+                shard = np.lib.format.open_memmap(os.path.join(self.cache_dir, shard_name), mode="w+",
+                                                  dtype=np.uint8,
+                                                  shape=(len(rows), self.image_size[0], self.image_size[1], 3))
+                for row, (_, pixels) in enumerate(rows):
+                    shard[row] = pixels
+                shard.flush()
+                del shard
+
+                # Rows point at the shard only once it is fully written
+                conn.executemany("UPDATE images SET shard = ?, row = ? WHERE id = ?",
+                                 [(shard_name, row, image_id) for row, (image_id, _) in enumerate(rows)])
+                conn.commit()
+                cached += len(rows)
+
+        self._prune_shards(conn)
+        conn.close()
+        return cached
+
+    def _prune_shards(self, conn):
+        referenced = {shard for (shard,) in conn.execute("SELECT DISTINCT shard FROM images WHERE shard IS NOT NULL")}
+        for name in os.listdir(self.cache_dir):
+            if name.startswith("shard_") and name not in referenced:
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def update(self, shard_size=1024) -> Dict:
+        """scan() then cache_pending(); what a training run calls before building its datasets"""
+        counts = self.scan()
+        counts["cached"] = self.cache_pending(shard_size)
+        return counts
+
+    def entries(self) -> List[Tuple[str, int, int, str]]:
+        """(shard, row, label, sha256) of every cached image, oldest first"""
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT shard, row, label, sha256 FROM images WHERE shard IS NOT NULL ORDER BY id"
+        ).fetchall()
+        conn.close()
+        return rows
+
+    def split(self, val_fraction=0.2, salt="") -> Tuple[List, List]:
+        """Deterministic stratified (train, val) entries derived from content hashes
+
+        Each class's distinct hashes are ranked by ``hash_fraction`` and the
+        first ``round(n * val_fraction)`` of them go to val, keeping at least
+        one on each side when the class has two or more. Each class is split
+        at that fraction however few images it has, and copies of one file
+        share a hash and therefore a side.
+
+        Membership depends only on the hashes within each class. Adding m
+        images to a class shifts every rank and the cut-off by at most about
+        m, so only images ranked near the cut-off can change side; images
+        far from it, and every other class, keep their split. Change
+        ``salt`` to draw a different split.
+        """
+        entries = self.entries()
+        by_class = {}
+        for entry in entries:
+            by_class.setdefault(entry[2], set()).add(entry[3])
+
+        val_hashes = set()
+        for label, hashes in by_class.items():
+            ranked = sorted(hashes, key=lambda sha256: (hash_fraction(sha256, salt), sha256))
+            count = round(len(ranked) * val_fraction)
+            if val_fraction > 0 and len(ranked) > 1:
+                count = min(max(count, 1), len(ranked) - 1)
+            val_hashes.update((label, sha256) for sha256 in ranked[:count])
+
+        train, val = [], []
+        for entry in entries:
+            (val if (entry[2], entry[3]) in val_hashes else train).append(entry)
+        return train, val
+
+class ManifestImageDataset(Dataset):
+    """Cached manifest images as uint8 (3, H, W) tensors plus labels
+
+    Each item is a copy-on-write memory-mapped view and ``transform`` runs on
+    the uint8 tensor. Shards are mapped lazily in each DataLoader worker.
+    ``fingerprint`` identifies the images and labels, in order.
+    """
+
+    def __init__(self, cache_dir, entries, transform=None):
+        self.cache_dir = cache_dir
+        self.entries = [(shard, row) for shard, row, *_ in entries]
+        self.labels = np.array([entry[2] for entry in entries], dtype=np.int64)
+        self.fingerprint = hashlib.sha256(
+            "".join(f"{label}:{sha256}\n" for _, _, label, sha256 in entries).encode("utf-8")
+        ).hexdigest()
+        self.transform = transform
+        self._shards = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_shards"] = {}
+        return state
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, idx):
+        shard, row = self.entries[idx]
+        images = self._shards.get(shard)
+        if images is None:
+            images = self._shards[shard] = np.load(os.path.join(self.cache_dir, shard), mmap_mode="c")
+        image = torch.from_numpy(images[row]).permute(2, 0, 1)
+        if self.transform:
+            image = self.transform(image)
+        return image, int(self.labels[idx])
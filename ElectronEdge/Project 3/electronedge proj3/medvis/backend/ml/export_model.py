@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Export the trained SkinDiseaseClassifier for the torchscript and onnx inference backends
+
+Writes <out-dir>/model.pt (traced and frozen TorchScript) and
+<out-dir>/model.onnx (dynamic batch size), then checks both against the
+eager model on a random batch.
+
+Usage: python ml/export_model.py [--weights ml/model.pth] [--out-dir ml/exported]
+"""
+
+import argparse
+import inspect
+import os
+import sys
+
+import numpy as np
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ml.backends import TORCH_CLASS_NAMES, BACKENDS
+from ml.classifier import SkinDiseaseClassifier
+
+def load_classifier(weights_path=None, num_classes=len(TORCH_CLASS_NAMES)):
+    """SkinDiseaseClassifier in eval mode, with trained weights if a path is given"""
+    model = SkinDiseaseClassifier(num_classes=num_classes, pretrained=False)
+    if weights_path:
+        model.load_state_dict(torch.load(weights_path, map_location="cpu", weights_only=True))
+    return model.eval()
+
+def export_torchscript(model, path, input_size=(224, 224)):
+    """Trace and freeze the model (folds batch norm and dropout away) and save it"""
+    example = torch.zeros(1, 3, *input_size)
+    with torch.no_grad():
+        scripted = torch.jit.freeze(torch.jit.trace(model.eval(), example))
+    scripted.save(path)
+    return path
+
+def export_onnx(model, path, input_size=(224, 224), opset=17):
+    """Export the model to ONNX with a dynamic batch dimension"""
+    example = torch.zeros(1, 3, *input_size)
+    options = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # Newer torch defaults to the dynamo exporter, which needs onnxscript
+        options["dynamo"] = False
+    torch.onnx.export(
+        model.eval(), example, path,
+        input_names=["images"], output_names=["logits"],
+        dynamic_axes={"images": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=opset, do_constant_folding=True, **options
+    )
+    return path
+
+def export_all(model, out_dir, input_size=(224, 224)):
+    """Export both formats into ``out_dir``; returns {backend name: path}"""
+    os.makedirs(out_dir, exist_ok=True)
+    return {
+        "torchscript": export_torchscript(model, os.path.join(out_dir, "model.pt"), input_size),
+        "onnx": export_onnx(model, os.path.join(out_dir, "model.onnx"), input_size)
+    }
+
+def check_exports(weights_path, paths, batch_size=4):
+    """Largest absolute probability difference between each export and the eager model"""
+    batch = np.random.RandomState(0).rand(batch_size, 224, 224, 3).astype(np.float32)
+    reference = BACKENDS["torch"](model_path=weights_path).predict_batch(batch)
+    return {name: float(np.abs(BACKENDS[name](model_path=path).predict_batch(batch) - reference).max())
+            for name, path in paths.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Export SkinDiseaseClassifier to TorchScript and ONNX")
+    parser.add_argument("--weights", default="ml/model.pth", help="state dict saved by train_model.py")
+    parser.add_argument("--out-dir", default="ml/exported")
+    args = parser.parse_args()
+
+    print("📦 Exporting SkinDiseaseClassifier")
+    print("=" * 50)
+
+    if not os.path.exists(args.weights):
+        print(f"❌ Weights not found: {args.weights} (run training first)")
+        sys.exit(1)
+
+    paths = export_all(load_classifier(args.weights), args.out_dir)
+    for name, path in paths.items():
+        print(f"✅ {name}: {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+    for name, difference in check_exports(args.weights, paths).items():
+        status = "✅" if difference < 1e-4 else "⚠️"
+        print(f"{status} {name} max |Δp| vs eager: {difference:.2e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import hashlib
+
+import cv2
+import numpy as np
+from PIL import Image
+
+class ImageContext:
+    """An uploaded image decoded once, with lazily cached derived representations
+
+    Every analyzer and fallback consumes the same context, so the upload is
+    decoded a single time and each colour conversion (RGB, HSV, gray) and
+    resized model tensor is computed at most once per request.
+    """
+
+    def __init__(self, bgr: np.ndarray, source: str = None):
+        if bgr is None or bgr.ndim != 3 or bgr.shape[2] != 3:
+            raise ValueError(f"Could not load image: {source}")
+        self.source = source
+        self._bgr = bgr
+        self._cache = {}
+
+    @classmethod
+    def from_bytes(cls, data, source: str = None):
+        """Decode an image straight from in-memory upload bytes"""
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        return cls(cv2.imdecode(buffer, cv2.IMREAD_COLOR), source=source)
+
+    @classmethod
+    def from_path(cls, image_path: str):
+        """Decode an image from disk"""
+        return cls(cv2.imread(image_path), source=image_path)
+
+    @classmethod
+    def ensure(cls, image):
+        """Accept an ImageContext or a file path and return an ImageContext"""
+        if isinstance(image, cls):
+            return image
+        return cls.from_path(image)
+
+    def prime(self, **representations):
+        """Seed the cache with representations computed elsewhere (e.g. in a batched pass)"""
+        for key, value in representations.items():
+            self._cache.setdefault(key, value)
+
+    def _cached(self, key, factory):
+        if key not in self._cache:
+            self._cache[key] = factory()
+        return self._cache[key]
+
+    @property
+    def shape(self):
+        return self._bgr.shape
+
+    @property
+    def bgr(self) -> np.ndarray:
+        return self._bgr
+
+    @property
+    def pixel_hash(self) -> str:
+        """sha256 of the decoded pixels (independent of file name and encoding metadata)"""
+        def build():
+            digest = hashlib.sha256(str(self._bgr.shape).encode("utf-8"))
+            digest.update(np.ascontiguousarray(self._bgr).data)
+            return digest.hexdigest()
+        return self._cached("pixel_hash", build)
+
+    @property
+    def rgb(self) -> np.ndarray:
+        return self._cached("rgb", lambda: cv2.cvtColor(self._bgr, cv2.COLOR_BGR2RGB))
+
+    @property
+    def hsv(self) -> np.ndarray:
+        return self._cached("hsv", lambda: cv2.cvtColor(self.rgb, cv2.COLOR_RGB2HSV))
+
+    @property
+    def gray(self) -> np.ndarray:
+        return self._cached("gray", lambda: cv2.cvtColor(self.rgb, cv2.COLOR_RGB2GRAY))
+
+    def pil(self) -> Image.Image:
+        """RGB PIL view of the decoded pixels"""
+        return self._cached("pil", lambda: Image.fromarray(self.rgb))
+
+    def resized_tensor(self, size, resample=Image.BICUBIC):
+        """Float32 (1, H, W, 3) array in [0, 1] resized with PIL
+
+        The default (PIL's own default, bicubic) is what the Keras model
+        expects; the torch models were trained on bilinear resizes.
+        """
+        def build():
+            image_array = np.array(self.pil().resize(size, resample)).astype(np.float32) / 255.0
+            return np.expand_dims(image_array, axis=0)
+        return self._cached(("tensor", tuple(size), resample), build)
@@ -0,0 +1,21 @@
+"""Training image decoding
+
+load_resized_image() is the one place training images are decoded and
+resized, so the dataset manifest's shards (ml/dataset_manifest.py) and
+preprocess_dataset (ml/preprocessing.py) hold identical pixels.
+"""
+
+import numpy as np
+from PIL import Image
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+def load_resized_image(path, image_size):
+    """uint8 (H, W, 3) RGB pixels resized like transforms.Resize, or None if unreadable"""
+    try:
+        with Image.open(path) as image:
+            resized = image.convert('RGB').resize((image_size[1], image_size[0]), Image.BILINEAR)
+            return np.asarray(resized, dtype=np.uint8)
+    except Exception as e:
+        print(f"Error loading image {path}: {e}")
+        return None
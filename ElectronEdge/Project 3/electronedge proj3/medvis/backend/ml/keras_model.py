@@ -1,9 +1,137 @@
-import tensorflow as tf
 import numpy as np
 import cv2
 import os
-from PIL import Image
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from ml.image_context import ImageContext
+
+# Column order of the feature table (matches the dict order of analyze_image_features)
+FEATURE_COLUMNS = [
+    'red_mean', 'green_mean', 'blue_mean', 'redness_ratio', 'saturation_mean', 'brightness_mean',
+    'texture_variance', 'edge_density', 'texture_std',
+    'circularity', 'contour_area', 'contour_perimeter'
+]
+
+# Table-driven scorer: for each feature, threshold edges and the (eczema, nevi, melanoma)
+# multipliers of every bin, evaluated with np.digitize. Edges are left-closed, so a strict
+# "> t" rule uses np.nextafter(t, inf) as its edge. Rules are applied in this order.
+_ABOVE = lambda threshold: np.nextafter(threshold, np.inf)
+NEUTRAL = (1.0, 1.0, 1.0)
+
+SCORING_RULES = [
+    # Color analysis - more discriminative thresholds
+    ('redness_ratio', [0.75, 0.9, _ABOVE(1.15), _ABOVE(1.4)], [
+        (0.4, 1.5, 2.0),   # < 0.75: low red = darker lesions
+        (0.7, 1.8, 1.3),   # < 0.9: moderate darkness
+        NEUTRAL,
+        (2.0, 0.6, 0.7),   # > 1.15: moderately red = possible eczema
+        (3.0, 0.3, 0.4),   # > 1.4: very red = strong eczema indicator
+    ]),
+    # Saturation analysis - refined
+    ('saturation_mean', [70, 100, _ABOVE(160)], [
+        (0.5, 1.2, 2.0),   # < 70: very low saturation
+        (0.8, 1.5, 1.4),   # < 100: low-moderate saturation
+        NEUTRAL,
+        (2.5, 0.5, 0.6),   # > 160: high saturation = inflammation
+    ]),
+    # Texture analysis - more balanced
+    ('texture_variance', [150, _ABOVE(300), _ABOVE(600), _ABOVE(1000)], [
+        (2.0, 0.7, 0.5),   # < 150: very smooth = eczema
+        NEUTRAL,
+        (0.9, 1.8, 1.1),   # > 300: moderate texture
+        (0.6, 1.0, 2.2),   # > 600: high texture
+        (0.3, 0.5, 3.0),   # > 1000: very high texture = melanoma
+    ]),
+    # Edge analysis - more discriminative
+    ('edge_density', [0.03, _ABOVE(0.06), _ABOVE(0.12), _ABOVE(0.18)], [
+        (2.2, 0.6, 0.4),   # < 0.03: very diffuse = eczema
+        NEUTRAL,
+        (1.0, 1.6, 1.2),   # > 0.06: moderate edges
+        (0.7, 1.2, 2.0),   # > 0.12: sharp edges
+        (0.4, 0.6, 2.8),   # > 0.18: very sharp edges = melanoma
+    ]),
+    # Brightness analysis - refined
+    ('brightness_mean', [70, 110, _ABOVE(150), _ABOVE(190)], [
+        (0.3, 1.0, 2.5),   # < 70: very dark = melanoma
+        (0.6, 1.8, 1.6),   # < 110: dark = nevi or melanoma
+        NEUTRAL,
+        (1.5, 0.8, 0.7),   # > 150: bright
+        (2.0, 0.5, 0.4),   # > 190: very bright = inflammation
+    ]),
+    # Circularity analysis - more balanced
+    ('circularity', [0.25, 0.4, _ABOVE(0.6), _ABOVE(0.85)], [
+        (1.8, 0.4, 1.6),   # < 0.25: very irregular = eczema or melanoma
+        (1.4, 0.7, 1.3),   # < 0.4: irregular
+        NEUTRAL,
+        (0.8, 1.8, 0.8),   # > 0.6: moderately round
+        (0.6, 2.5, 0.4),   # > 0.85: very round = nevi
+    ]),
+]
+
+_COMPILED_RULES = [
+    (FEATURE_COLUMNS.index(column), np.array(edges, dtype=np.float64),
+     np.array(multipliers, dtype=np.float64), multipliers.index(NEUTRAL))
+    for column, edges, multipliers in SCORING_RULES
+]
+
+_NOISE_TABLE = None
+
+def _noise_table():
+    """Deterministic noise for every seed, drawn once from local RandomState generators"""
+    global _NOISE_TABLE
+    if _NOISE_TABLE is None:
+        _NOISE_TABLE = np.array([np.random.RandomState(seed).normal(0, 0.02, 3) for seed in range(1000)])
+    return _NOISE_TABLE
+
+def feature_noise_seed(features):
+    """Noise seed derived from the feature values, so the same features give the same noise"""
+    return hash(str(features)) % 1000
+
+def score_feature_matrix(matrix, seeds):
+    """Score a (N, len(FEATURE_COLUMNS)) feature matrix in one vectorised pass
+    
+    NaN marks a missing feature (no multiplier applied). ``seeds`` holds one
+    noise seed in [0, 1000) per row. Returns (predicted_classes, confidences,
+    probabilities) as arrays of shape (N,), (N,) and (N, 3).
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    scores = np.ones((matrix.shape[0], 3))
+    
+    for column_index, edges, multipliers, neutral_bin in _COMPILED_RULES:
+        values = matrix[:, column_index]
+        bins = np.where(np.isnan(values), neutral_bin, np.digitize(values, edges))
+        scores = scores * multipliers[bins]
+    
+    # Normalize scores to probabilities
+    total_score = scores[:, 0] + scores[:, 1] + scores[:, 2]
+    probabilities = scores / total_score[:, None]
+    
+    # Add controlled randomness based on the feature hash for consistency
+    probabilities = probabilities + _noise_table()[np.asarray(seeds, dtype=np.int64)]
+    probabilities = np.abs(probabilities)  # Ensure positive
+    probabilities = probabilities / (probabilities[:, 0] + probabilities[:, 1] + probabilities[:, 2])[:, None]
+    
+    predicted_classes = np.argmax(probabilities, axis=1)
+    
+    # Ensure reasonable confidence range (65-85% for feature-based)
+    confidences = np.clip(np.max(probabilities, axis=1), 0.65, 0.85)
+    
+    return predicted_classes, confidences, probabilities
+
+def feature_table_rows(table):
+    """Convert a columnar feature table back into per-image feature dicts ({} for failed images)"""
+    rows = []
+    for index in range(len(table['valid'])):
+        if not table['valid'][index]:
+            rows.append({})
+            continue
+        rows.append({
+            column: float(table[column][index])
+            for column in FEATURE_COLUMNS
+            if not np.isnan(table[column][index])
+        })
+    return rows
 
 class KerasImageAnalyzer:
     """Image analyzer using trained Keras model for Eczema, Melanocytic Nevi, and Melanoma"""
@@ -23,7 +151,23 @@ class KerasImageAnalyzer:
             
         self.model_path = None
         self.model = self._load_model()
+        self.model_version = self._model_version()
         self.class_names = ['Eczema', 'Melanocytic_Nevi', 'Melanoma']
+        self._feature_pool = None
+    
+    def reload_model(self):
+        """Reload the model; model_version changes so cached predictions are invalidated"""
+        self.model_path = None
+        self.model = self._load_model()
+        self.model_version = self._model_version()
+        return self.model is not None
+    
+    def _model_version(self):
+        """Identify the loaded model (path, size and mtime) or the feature-based scorer"""
+        if self.model is None or not self.model_path:
+            return "feature-analysis-v1"
+        stat = os.stat(self.model_path)
+        return f"{self.model_path}:{stat.st_size}:{stat.st_mtime_ns}"
         
     def _load_model(self):
         """Load the trained Keras model from multiple possible locations"""
@@ -33,6 +177,9 @@ class KerasImageAnalyzer:
         print("🔧 USING FEATURE-BASED PREDICTION (trained model disabled for bias fix)")
         return None
         
+        # TensorFlow takes seconds to import, so only pay for it when a model is actually loaded
+        import tensorflow as tf
+        
         for model_path in self.possible_paths:
             if not os.path.exists(model_path):
                 continue
@@ -55,11 +202,11 @@ class KerasImageAnalyzer:
         print(f"❌ Could not load model from any of the paths: {self.possible_paths}")
         return None
     
-    def preprocess_image(self, image_path):
-        """Preprocess image for model prediction"""
+    def preprocess_image(self, image):
+        """Preprocess image for model prediction (accepts an ImageContext or a path)"""
         try:
-            # Load image
-            image = Image.open(image_path).convert('RGB')
+            # Reuse the decoded image
+            context = ImageContext.ensure(image)
             
             # Get model input shape (assuming it's (batch, height, width, channels))
             if self.model is not None:
@@ -68,46 +215,30 @@ class KerasImageAnalyzer:
             else:
                 target_size = (128, 128)  # Default size for our trained model
             
-            # Resize image
-            image = image.resize(target_size)
-            
-            # Convert to numpy array
-            image_array = np.array(image)
-            
-            # Normalize pixel values to [0, 1]
-            image_array = image_array.astype(np.float32) / 255.0
-            
-            # Add batch dimension
-            image_array = np.expand_dims(image_array, axis=0)
-            
-            return image_array
+            # Resize, normalize pixel values to [0, 1] and add batch dimension (cached on the context)
+            return context.resized_tensor(target_size)
             
         except Exception as e:
             print(f"❌ Error preprocessing image: {e}")
             return None
     
-    def analyze_image_features(self, image_path):
-        """Analyze image features for additional insights"""
+    def analyze_image_features(self, image):
+        """Analyze image features for additional insights (accepts an ImageContext or a path)"""
         try:
-            # Load image with OpenCV
-            image = cv2.imread(image_path)
-            if image is None:
-                raise ValueError(f"Could not load image: {image_path}")
-                
-            # Convert to RGB
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            # Decode once; RGB / HSV / gray are cached on the context
+            context = ImageContext.ensure(image)
             
             # Feature analysis
             features = {}
             
             # 1. Color analysis
-            features.update(self._analyze_colors(image_rgb))
+            features.update(self._analyze_colors(context))
             
             # 2. Texture analysis
-            features.update(self._analyze_texture(image_rgb))
+            features.update(self._analyze_texture(context))
             
             # 3. Shape analysis
-            features.update(self._analyze_shapes(image_rgb))
+            features.update(self._analyze_shapes(context))
             
             return features
             
@@ -115,11 +246,11 @@ class KerasImageAnalyzer:
             print(f"❌ Error analyzing image features: {e}")
             return {}
     
-    def _analyze_colors(self, image):
+    def _analyze_colors(self, context):
         """Analyze color characteristics"""
         try:
-            # Convert to different color spaces
-            hsv = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
+            image = context.rgb
+            hsv = context.hsv
             
             # Calculate color statistics
             red_mean = np.mean(image[:,:,0])
@@ -147,11 +278,10 @@ class KerasImageAnalyzer:
             print(f"❌ Error in color analysis: {e}")
             return {}
     
-    def _analyze_texture(self, image):
+    def _analyze_texture(self, context):
         """Analyze texture patterns"""
         try:
-            # Convert to grayscale
-            gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+            gray = context.gray
             
             # Calculate texture features using Laplacian variance
             laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
@@ -172,11 +302,11 @@ class KerasImageAnalyzer:
             print(f"❌ Error in texture analysis: {e}")
             return {}
     
-    def _analyze_shapes(self, image):
+    def _analyze_shapes(self, context):
         """Analyze shape characteristics"""
         try:
-            # Convert to grayscale and threshold
-            gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+            # Threshold the shared grayscale image
+            gray = context.gray
             _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
             
             # Find contours
@@ -207,65 +337,204 @@ class KerasImageAnalyzer:
             print(f"❌ Error in shape analysis: {e}")
             return {}
     
-    def predict_with_features(self, image_path):
+    def analyze_batch(self, images):
+        """Analyze many images at once and return a columnar feature table
+        
+        Same-sized images are stacked into an (N, H, W, C) array so the colour,
+        HSV, texture-variance and texture-std statistics are computed in one
+        vectorised pass per size group. Canny edges and contours still run per
+        image, in parallel threads. The table maps each name in FEATURE_COLUMNS
+        to a float64 array of length N, plus a boolean 'valid' column (False
+        for images that could not be decoded; their values are NaN).
+        """
+        contexts = [self._load_context(image) for image in images]
+        count = len(contexts)
+        table = {column: np.full(count, np.nan) for column in FEATURE_COLUMNS}
+        table['valid'] = np.array([context is not None for context in contexts], dtype=bool)
+        
+        # 1. Vectorised colour / HSV / texture statistics per same-size group
+        groups = {}
+        for index, context in enumerate(contexts):
+            if context is not None:
+                groups.setdefault(context.shape, []).append(index)
+        
+        for indices in groups.values():
+            try:
+                statistics = self._batch_statistics([contexts[index] for index in indices])
+                for column, values in statistics.items():
+                    table[column][indices] = values
+            except Exception as e:
+                print(f"❌ Error in batch feature analysis: {e}")
+        
+        # 2. Edge density and contours per image, in parallel
+        valid_indices = [index for index, context in enumerate(contexts) if context is not None]
+        if valid_indices:
+            if self._feature_pool is None:
+                self._feature_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1,
+                                                        thread_name_prefix="keras-features")
+            per_image = self._feature_pool.map(lambda index: self._analyze_edges_and_shapes(contexts[index]),
+                                               valid_indices)
+            for index, features in zip(valid_indices, per_image):
+                for column, value in features.items():
+                    table[column][index] = value
+        
+        return table
+    
+    def _batch_statistics(self, contexts):
+        """Colour, HSV and texture statistics for same-sized images in one pass"""
+        rgb = np.stack([context.rgb for context in contexts])
+        count, height, width, _ = rgb.shape
+        
+        # Per-pixel colour conversions run once over the images stacked vertically
+        stacked = rgb.reshape(count * height, width, 3)
+        hsv = cv2.cvtColor(stacked, cv2.COLOR_RGB2HSV).reshape(count, height, width, 3)
+        gray = cv2.cvtColor(stacked, cv2.COLOR_RGB2GRAY).reshape(count, height, width)
+        
+        # Share the converted planes with the per-image contour pass
+        for index, context in enumerate(contexts):
+            context.prime(hsv=hsv[index], gray=gray[index])
+        
+        channel_means = rgb.reshape(count, -1, 3).mean(axis=1)
+        red_mean, green_mean, blue_mean = channel_means[:, 0], channel_means[:, 1], channel_means[:, 2]
+        
+        # Laplacian (3x3 aperture, reflect-101 border - same as cv2.Laplacian defaults) for all images at once
+        gray_int = gray.astype(np.int16)
+        padded = np.pad(gray_int, ((0, 0), (1, 1), (1, 1)), mode='reflect')
+        laplacian = (padded[:, :-2, 1:-1] + padded[:, 2:, 1:-1] +
+                     padded[:, 1:-1, :-2] + padded[:, 1:-1, 2:] - 4 * gray_int)
+        
+        return {
+            'red_mean': red_mean,
+            'green_mean': green_mean,
+            'blue_mean': blue_mean,
+            'redness_ratio': red_mean / (green_mean + blue_mean + 1e-6),
+            'saturation_mean': hsv[..., 1].reshape(count, -1).mean(axis=1),
+            'brightness_mean': hsv[..., 2].reshape(count, -1).mean(axis=1),
+            'texture_variance': laplacian.reshape(count, -1).var(axis=1, dtype=np.float64),
+            'texture_std': gray.reshape(count, -1).std(axis=1)
+        }
+    
+    def _analyze_edges_and_shapes(self, context):
+        """Per-image part of the batch analysis: Canny edge density and contour shape"""
+        features = {}
+        try:
+            edges = cv2.Canny(context.gray, 50, 150)
+            features['edge_density'] = float(np.sum(edges > 0) / edges.size)
+        except Exception as e:
+            print(f"❌ Error in edge analysis: {e}")
+        features.update(self._analyze_shapes(context))
+        return features
+    
+    def predict_with_features(self, image):
         """Make prediction using trained Keras model with feature analysis"""
+        return self.predict_batch([image])[0]
+    
+    def predict_batch(self, images):
+        """Predict a batch of images with a single forward pass through the model
+        
+        Accepts ImageContexts or file paths. Returns one result dict per input,
+        in input order. Images the model cannot handle fall back to feature
+        analysis individually.
+        """
+        results = [None] * len(images)
+        contexts = [self._load_context(image) for image in images]
         
-        # 1. Always do feature analysis first
-        features = self.analyze_image_features(image_path)
+        # 1. Always do feature analysis first (vectorised across the batch)
+        features_list = feature_table_rows(self.analyze_batch(contexts))
         
         if self.model is not None:
             try:
-                # 2. Use trained model if available
-                processed_image = self.preprocess_image(image_path)
-                if processed_image is None:
-                    raise ValueError("Failed to preprocess image")
-                
-                # Get model prediction
-                predictions = self.model.predict(processed_image, verbose=0)
-                
-                # Handle different output formats
-                if len(predictions.shape) == 2 and predictions.shape[1] == 3:
-                    # Multi-class classification with 3 outputs
-                    probabilities = predictions[0]
-                elif len(predictions.shape) == 2 and predictions.shape[1] == 2:
-                    # Binary classification with 2 outputs - extend to 3 classes
-                    binary_probs = predictions[0]
-                    probabilities = np.array([binary_probs[0], binary_probs[1], 0.0])
-                elif len(predictions.shape) == 2 and predictions.shape[1] == 1:
-                    # Binary classification with 1 output (sigmoid)
-                    prob_positive = predictions[0][0]
-                    probabilities = np.array([1 - prob_positive, prob_positive, 0.0])
-                else:
-                    # Fallback
-                    probabilities = predictions[0] if len(predictions.shape) > 1 else predictions
-                
-                # Ensure we have 3 probabilities
-                if len(probabilities) != 3:
-                    # Pad or truncate to 3 classes
-                    if len(probabilities) < 3:
-                        probabilities = np.pad(probabilities, (0, 3 - len(probabilities)), 'constant')
-                    else:
-                        probabilities = probabilities[:3]
-                
-                # Ensure probabilities sum to 1
-                probabilities = probabilities / np.sum(probabilities)
+                # 2. Use trained model if available - stack every image into one batch
+                batch_rows = []
+                batch_indices = []
+                for index, context in enumerate(contexts):
+                    if context is None:
+                        continue
+                    processed_image = self.preprocess_image(context)
+                    if processed_image is None:
+                        print(f"⚠️ Failed to preprocess image, using feature analysis: {context.source}")
+                        continue
+                    batch_rows.append(processed_image)
+                    batch_indices.append(index)
                 
-                # Get predicted class
-                predicted_class = np.argmax(probabilities)
-                confidence = np.max(probabilities)
-                
-                model_type = 'trained_keras'
+                if batch_rows:
+                    # Get model predictions for the whole batch
+                    predictions = self.model.predict(np.concatenate(batch_rows, axis=0), verbose=0)
+                    
+                    for row, index in enumerate(batch_indices):
+                        probabilities = self._normalize_model_output(predictions[row:row + 1])
+                        
+                        # Get predicted class
+                        predicted_class = np.argmax(probabilities)
+                        confidence = np.max(probabilities)
+                        
+                        results[index] = self._build_result(
+                            features_list[index], predicted_class, confidence, probabilities, 'trained_keras'
+                        )
                 
             except Exception as e:
                 print(f"⚠️ Model prediction failed, using advanced feature analysis: {e}")
-                predicted_class, confidence, probabilities = self._advanced_feature_prediction(features)
-                model_type = 'advanced_feature_analysis'
+                results = [None] * len(images)
         else:
             # 3. Use advanced feature analysis if model not available
-            print("🔍 Using advanced feature analysis (no model loaded)")
-            predicted_class, confidence, probabilities = self._advanced_feature_prediction(features)
-            model_type = 'advanced_feature_analysis'
+            print(f"🔍 Using advanced feature analysis (no model loaded) for {len(images)} image(s)")
+        
+        # Score every image still without a result through the vectorised feature scorer
+        pending = [index for index, result in enumerate(results) if result is None]
+        if pending:
+            matrix = np.array([[features_list[index].get(column, np.nan) for column in FEATURE_COLUMNS]
+                               for index in pending], dtype=np.float64)
+            seeds = np.array([feature_noise_seed(features_list[index]) for index in pending])
+            predicted_classes, confidences, probabilities = score_feature_matrix(matrix, seeds)
+            for row, index in enumerate(pending):
+                results[index] = self._build_result(
+                    features_list[index], predicted_classes[row], confidences[row], probabilities[row],
+                    'advanced_feature_analysis'
+                )
         
+        return results
+    
+    def _load_context(self, image):
+        """Decode an image once, or return None if it cannot be loaded"""
+        if image is None:
+            return None
+        try:
+            return ImageContext.ensure(image)
+        except Exception as e:
+            print(f"❌ Error loading image: {e}")
+            return None
+    
+    def _normalize_model_output(self, predictions):
+        """Convert a single-row model output into three class probabilities"""
+        # Handle different output formats
+        if len(predictions.shape) == 2 and predictions.shape[1] == 3:
+            # Multi-class classification with 3 outputs
+            probabilities = predictions[0]
+        elif len(predictions.shape) == 2 and predictions.shape[1] == 2:
+            # Binary classification with 2 outputs - extend to 3 classes
+            binary_probs = predictions[0]
+            probabilities = np.array([binary_probs[0], binary_probs[1], 0.0])
+        elif len(predictions.shape) == 2 and predictions.shape[1] == 1:
+            # Binary classification with 1 output (sigmoid)
+            prob_positive = predictions[0][0]
+            probabilities = np.array([1 - prob_positive, prob_positive, 0.0])
+        else:
+            # Fallback
+            probabilities = predictions[0] if len(predictions.shape) > 1 else predictions
+        
+        # Ensure we have 3 probabilities
+        if len(probabilities) != 3:
+            # Pad or truncate to 3 classes
+            if len(probabilities) < 3:
+                probabilities = np.pad(probabilities, (0, 3 - len(probabilities)), 'constant')
+            else:
+                probabilities = probabilities[:3]
+        
+        # Ensure probabilities sum to 1
+        return probabilities / np.sum(probabilities)
+    
+    def _build_result(self, features, predicted_class, confidence, probabilities, model_type):
+        """Assemble the prediction payload returned to the API"""
         # 4. Generate insights
         feature_insights = self._get_feature_insights(features, predicted_class)
         
@@ -282,147 +551,24 @@ class KerasImageAnalyzer:
             'model_type': model_type
         }
     
+    def score_feature_table(self, table, seeds=None):
+        """Score every row of a feature table from analyze_batch in one vectorised pass
+        
+        ``seeds`` defaults to the same per-image noise seeds the single-image
+        path uses. Returns (predicted_classes, confidences, probabilities) as
+        arrays of shape (N,), (N,) and (N, 3).
+        """
+        matrix = np.column_stack([table[column] for column in FEATURE_COLUMNS])
+        if seeds is None:
+            seeds = np.array([feature_noise_seed(features) for features in feature_table_rows(table)], dtype=np.int64)
+        return score_feature_matrix(matrix, seeds)
+    
     def _advanced_feature_prediction(self, features):
         """Advanced rule-based prediction using image features for 3 classes"""
-        
-        # Initialize equal base probabilities for 3 classes
-        eczema_score = 1.0
-        melanocytic_nevi_score = 1.0
-        melanoma_score = 1.0
-        
-        # Color analysis - more discriminative thresholds
-        if 'redness_ratio' in features:
-            if features['redness_ratio'] > 1.4:  # Very red = strong eczema indicator
-                eczema_score *= 3.0
-                melanocytic_nevi_score *= 0.3
-                melanoma_score *= 0.4
-            elif features['redness_ratio'] > 1.15:  # Moderately red = possible eczema
-                eczema_score *= 2.0
-                melanocytic_nevi_score *= 0.6
-                melanoma_score *= 0.7
-            elif features['redness_ratio'] < 0.75:  # Low red = darker lesions
-                eczema_score *= 0.4
-                melanocytic_nevi_score *= 1.5
-                melanoma_score *= 2.0
-            elif features['redness_ratio'] < 0.9:  # Moderate darkness
-                eczema_score *= 0.7
-                melanocytic_nevi_score *= 1.8
-                melanoma_score *= 1.3
-        
-        # Saturation analysis - refined
-        if 'saturation_mean' in features:
-            if features['saturation_mean'] > 160:  # High saturation = inflammation
-                eczema_score *= 2.5
-                melanocytic_nevi_score *= 0.5
-                melanoma_score *= 0.6
-            elif features['saturation_mean'] < 70:  # Very low saturation
-                eczema_score *= 0.5
-                melanocytic_nevi_score *= 1.2
-                melanoma_score *= 2.0
-            elif features['saturation_mean'] < 100:  # Low-moderate saturation
-                eczema_score *= 0.8
-                melanocytic_nevi_score *= 1.5
-                melanoma_score *= 1.4
-        
-        # Texture analysis - more balanced
-        if 'texture_variance' in features:
-            if features['texture_variance'] > 1000:  # Very high texture = melanoma
-                eczema_score *= 0.3
-                melanocytic_nevi_score *= 0.5
-                melanoma_score *= 3.0
-            elif features['texture_variance'] > 600:  # High texture
-                eczema_score *= 0.6
-                melanocytic_nevi_score *= 1.0
-                melanoma_score *= 2.2
-            elif features['texture_variance'] > 300:  # Moderate texture
-                eczema_score *= 0.9
-                melanocytic_nevi_score *= 1.8
-                melanoma_score *= 1.1
-            elif features['texture_variance'] < 150:  # Very smooth = eczema
-                eczema_score *= 2.0
-                melanocytic_nevi_score *= 0.7
-                melanoma_score *= 0.5
-        
-        # Edge analysis - more discriminative
-        if 'edge_density' in features:
-            if features['edge_density'] > 0.18:  # Very sharp edges = melanoma
-                eczema_score *= 0.4
-                melanocytic_nevi_score *= 0.6
-                melanoma_score *= 2.8
-            elif features['edge_density'] > 0.12:  # Sharp edges
-                eczema_score *= 0.7
-                melanocytic_nevi_score *= 1.2
-                melanoma_score *= 2.0
-            elif features['edge_density'] > 0.06:  # Moderate edges
-                eczema_score *= 1.0
-                melanocytic_nevi_score *= 1.6
-                melanoma_score *= 1.2
-            elif features['edge_density'] < 0.03:  # Very diffuse = eczema
-                eczema_score *= 2.2
-                melanocytic_nevi_score *= 0.6
-                melanoma_score *= 0.4
-        
-        # Brightness analysis - refined
-        if 'brightness_mean' in features:
-            if features['brightness_mean'] < 70:  # Very dark = melanoma
-                eczema_score *= 0.3
-                melanocytic_nevi_score *= 1.0
-                melanoma_score *= 2.5
-            elif features['brightness_mean'] < 110:  # Dark = nevi or melanoma
-                eczema_score *= 0.6
-                melanocytic_nevi_score *= 1.8
-                melanoma_score *= 1.6
-            elif features['brightness_mean'] > 190:  # Very bright = inflammation
-                eczema_score *= 2.0
-                melanocytic_nevi_score *= 0.5
-                melanoma_score *= 0.4
-            elif features['brightness_mean'] > 150:  # Bright
-                eczema_score *= 1.5
-                melanocytic_nevi_score *= 0.8
-                melanoma_score *= 0.7
-        
-        # Circularity analysis - more balanced
-        if 'circularity' in features:
-            if features['circularity'] > 0.85:  # Very round = nevi
-                eczema_score *= 0.6
-                melanocytic_nevi_score *= 2.5
-                melanoma_score *= 0.4
-            elif features['circularity'] > 0.6:  # Moderately round
-                eczema_score *= 0.8
-                melanocytic_nevi_score *= 1.8
-                melanoma_score *= 0.8
-            elif features['circularity'] < 0.25:  # Very irregular = eczema or melanoma
-                eczema_score *= 1.8
-                melanocytic_nevi_score *= 0.4
-                melanoma_score *= 1.6
-            elif features['circularity'] < 0.4:  # Irregular
-                eczema_score *= 1.4
-                melanocytic_nevi_score *= 0.7
-                melanoma_score *= 1.3
-        
-        # Normalize scores to probabilities
-        total_score = eczema_score + melanocytic_nevi_score + melanoma_score
-        probabilities = np.array([
-            eczema_score / total_score,
-            melanocytic_nevi_score / total_score,
-            melanoma_score / total_score
-        ])
-        
-        # Add controlled randomness based on image hash for consistency
-        image_hash = hash(str(features)) % 1000
-        np.random.seed(image_hash)
-        noise = np.random.normal(0, 0.02, 3)
-        probabilities = probabilities + noise
-        probabilities = np.abs(probabilities)  # Ensure positive
-        probabilities = probabilities / np.sum(probabilities)  # Normalize
-        
-        predicted_class = np.argmax(probabilities)
-        confidence = np.max(probabilities)
-        
-        # Ensure reasonable confidence range (65-85% for feature-based)
-        confidence = max(0.65, min(0.85, confidence))
-        
-        return predicted_class, confidence, probabilities
+        matrix = np.array([[features.get(column, np.nan) for column in FEATURE_COLUMNS]], dtype=np.float64)
+        seeds = np.array([feature_noise_seed(features)])
+        predicted_classes, confidences, probabilities = score_feature_matrix(matrix, seeds)
+        return predicted_classes[0], confidences[0], probabilities[0]
     
     def _get_feature_insights(self, features, predicted_class):
         """Generate insights based on image features"""
@@ -463,5 +609,21 @@ class KerasImageAnalyzer:
             print(f"❌ Error generating feature insights: {e}")
             return []
 
-# Global analyzer instance
-keras_analyzer = KerasImageAnalyzer()
\ No newline at end of file
+# Global analyzer instance, built on first use (loading a model is slow)
+_analyzer_lock = threading.Lock()
+
+def get_keras_analyzer() -> KerasImageAnalyzer:
+    analyzer = globals().get("keras_analyzer")
+    if analyzer is None:
+        with _analyzer_lock:
+            analyzer = globals().get("keras_analyzer")
+            if analyzer is None:
+                analyzer = KerasImageAnalyzer()
+                globals()["keras_analyzer"] = analyzer
+    return analyzer
+
+def __getattr__(name):
+    # ml.keras_model.keras_analyzer keeps working; the first access builds it
+    if name == "keras_analyzer":
+        return get_keras_analyzer()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
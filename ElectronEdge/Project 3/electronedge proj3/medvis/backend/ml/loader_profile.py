@@ -0,0 +1,74 @@
+import os
+from typing import Dict
+
+import torch
+
+def available_cores() -> int:
+    """CPU cores this process may run on (respects taskset / container CPU sets)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+class LoaderProfile:
+    """DataLoader settings for training: worker processes, prefetching and pinned memory
+
+    auto() sizes the profile from the machine:
+    - On a GPU, up to 8 workers feed the device while it computes.
+    - On a CPU node, the forward and backward passes need cores too, so
+      at most half go to workers and the rest to torch's intra-op threads.
+    Each setting can be overridden with LOADER_WORKERS, LOADER_PREFETCH,
+    LOADER_PIN_MEMORY and LOADER_TORCH_THREADS. With 0 workers, batches
+    are loaded in the training process between steps.
+    """
+
+    def __init__(self, num_workers: int = 0, prefetch_factor: int = 2, pin_memory: bool = False,
+                 persistent_workers: bool = True, torch_threads: int = None):
+        self.num_workers = max(0, num_workers)
+        self.prefetch_factor = max(1, prefetch_factor)
+        self.pin_memory = pin_memory
+        self.persistent_workers = persistent_workers
+        self.torch_threads = torch_threads
+
+    @classmethod
+    def auto(cls, device: torch.device = None) -> "LoaderProfile":
+        cuda = (device.type == "cuda") if device is not None else torch.cuda.is_available()
+        cores = available_cores()
+        if cuda:
+            workers = min(8, cores - 1)
+            threads = None
+        else:
+            workers = min(4, cores // 2)
+            threads = max(1, cores - workers)
+
+        def env_int(name, default):
+            value = os.getenv(name)
+            return int(value) if value not in (None, "") else default
+
+        return cls(
+            num_workers=env_int("LOADER_WORKERS", workers),
+            prefetch_factor=env_int("LOADER_PREFETCH", 2),
+            pin_memory=os.getenv("LOADER_PIN_MEMORY", str(cuda)).lower() in ("1", "true", "yes"),
+            torch_threads=env_int("LOADER_TORCH_THREADS", threads)
+        )
+
+    def loader_kwargs(self) -> Dict:
+        """Keyword arguments for torch.utils.data.DataLoader"""
+        kwargs = {"num_workers": self.num_workers, "pin_memory": self.pin_memory}
+        if self.num_workers > 0:
+            # Only valid with worker processes; persistent workers skip the re-fork every epoch
+            kwargs["prefetch_factor"] = self.prefetch_factor
+            kwargs["persistent_workers"] = self.persistent_workers
+        return kwargs
+
+    def apply(self):
+        """Give torch the cores the loader workers don't use"""
+        if self.torch_threads:
+            torch.set_num_threads(self.torch_threads)
+
+    def describe(self) -> str:
+        if self.num_workers == 0:
+            loading = "in-process loading"
+        else:
+            loading = f"{self.num_workers} workers x {self.prefetch_factor} prefetched batches"
+        return (f"{loading}, pin_memory={self.pin_memory}, "
+                f"torch threads={self.torch_threads or torch.get_num_threads()}")
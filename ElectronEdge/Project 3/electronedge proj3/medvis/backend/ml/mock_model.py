@@ -31,6 +31,17 @@ class MockDiseaseClassifier(nn.Module):
             
         return self.features(x)
 
+class SimpleMockModel(nn.Module):
+    """Single linear layer over a flattened 224x224 RGB image (the API's last-resort fallback)"""
+    
+    def __init__(self):
+        super(SimpleMockModel, self).__init__()
+        self.classifier = nn.Linear(224*224*3, 2)
+    
+    def forward(self, x):
+        x = x.view(x.size(0), -1)
+        return self.classifier(x)
+
 def create_mock_model():
     """Create and save a mock model for testing"""
     model = MockDiseaseClassifier(num_classes=2)
@@ -2,6 +2,45 @@ import torch
 import torchvision.transforms as transforms
 from PIL import Image
 import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from ml.image_io import IMAGE_EXTENSIONS, load_resized_image
+
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+class MemmapImageDataset(torch.utils.data.Dataset):
+    """Preprocessed images stored as uint8 in a memory-mapped .npy file
+
+    Items are normalised float32 (3, H, W) tensors, the same values
+    ImagePreprocessor.preprocess_image gives, computed when each item is
+    read. The file is mapped lazily in each process, so DataLoader workers
+    don't receive a pickled copy of it.
+    """
+
+    def __init__(self, path, labels, count=None):
+        self.path = path
+        self.labels = torch.as_tensor(labels, dtype=torch.long)
+        self.count = len(self.labels) if count is None else count
+        self._mean = torch.tensor(IMAGENET_MEAN).view(3, 1, 1)
+        self._std = torch.tensor(IMAGENET_STD).view(3, 1, 1)
+        self._images = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_images"] = None
+        return state
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, idx):
+        if self._images is None:
+            self._images = np.load(self.path, mmap_mode="r")
+        pixels = torch.from_numpy(np.array(self._images[idx])).permute(2, 0, 1)
+        image = (pixels.float() / 255.0 - self._mean) / self._std
+        return image, self.labels[idx]
 
 class ImagePreprocessor:
     def __init__(self, image_size=(224, 224)):
@@ -9,63 +48,89 @@ class ImagePreprocessor:
         self.transform = transforms.Compose([
             transforms.Resize(image_size),
             transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406], 
-                               std=[0.229, 0.224, 0.225])
+            transforms.Normalize(mean=IMAGENET_MEAN,
+                               std=IMAGENET_STD)
         ])
-    
+
     def preprocess_image(self, image_path):
         """Load and preprocess single image"""
         image = Image.open(image_path).convert('RGB')
         return self.transform(image).unsqueeze(0)
-    
-    def preprocess_dataset(self, dataset_path):
-        """Preprocess entire dataset for training"""
-        processed_data = []
-        labels = []
-        
-        for disease_folder in os.listdir(dataset_path):
+
+    def list_dataset(self, dataset_path):
+        """(paths, labels) of every image in the dataset's class folders (eczema = 0, anything else = 1)"""
+        paths, labels = [], []
+        for disease_folder in sorted(os.listdir(dataset_path)):
             disease_path = os.path.join(dataset_path, disease_folder)
             if not os.path.isdir(disease_path):
                 continue
-                
+
             label = 0 if disease_folder.lower() == 'eczema' else 1
-            
-            for img_file in os.listdir(disease_path):
-                if img_file.lower().endswith(('.jpg', '.jpeg', '.png')):
-                    img_path = os.path.join(disease_path, img_file)
-                    try:
-                        processed_img = self.preprocess_image(img_path)
-                        processed_data.append(processed_img.squeeze(0))
-                        labels.append(label)
-                    except Exception as e:
-                        print(f"Error processing {img_path}: {e}")
-        
-        return torch.stack(processed_data), torch.tensor(labels)
-
-def create_data_loaders(dataset_path, batch_size=32, train_split=0.8):
+
+            for img_file in sorted(os.listdir(disease_path)):
+                if img_file.lower().endswith(IMAGE_EXTENSIONS):
+                    paths.append(os.path.join(disease_path, img_file))
+                    labels.append(label)
+        return paths, labels
+
+    def preprocess_dataset(self, dataset_path, output_path=None, chunk_size=256, workers=None):
+        """Preprocess entire dataset for training into a memory-mapped uint8 file
+
+        Images are decoded and resized in ``workers`` processes, ``chunk_size``
+        at a time, and written into a .npy file preallocated for the whole
+        dataset. Only one chunk of uint8 pixels is held in memory, never the
+        float dataset. Normalisation happens when items are read. Unreadable
+        images are skipped. Returns a MemmapImageDataset.
+        """
+        paths, labels = self.list_dataset(dataset_path)
+        workers = workers or os.cpu_count() or 1
+        height, width = self.image_size
+        output_path = output_path or os.path.join(dataset_path, f".preprocessed_{height}x{width}.npy")
+
+        # Preallocate the file; rows are written in order, so skipped images leave no holes
+        images = np.lib.format.open_memmap(output_path, mode="w+", dtype=np.uint8,
+                                           shape=(max(len(paths), 1), height, width, 3))
+        del images
+
+        kept_labels = []
+        decode = partial(load_resized_image, image_size=self.image_size)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for start in range(0, len(paths), chunk_size):
+                chunk = paths[start:start + chunk_size]
+                decoded = pool.map(decode, chunk, chunksize=max(1, len(chunk) // (4 * workers)))
+
+                # Map the file only while writing this chunk, so written pages don't accumulate in RSS
+                images = np.load(output_path, mmap_mode="r+")
+                for pixels, label in zip(decoded, labels[start:start + chunk_size]):
+                    if pixels is None:
+                        continue
+                    images[len(kept_labels)] = pixels
+                    kept_labels.append(label)
+                images.flush()
+                del images
+
+        print(f"Preprocessed {len(kept_labels)} of {len(paths)} images into {output_path}")
+        return MemmapImageDataset(output_path, kept_labels, count=len(kept_labels))
+
+def create_data_loaders(dataset_path, batch_size=32, train_split=0.8, chunk_size=256, workers=None):
     """Create train and validation data loaders"""
     preprocessor = ImagePreprocessor()
-    data, labels = preprocessor.preprocess_dataset(dataset_path)
-    
+    dataset = preprocessor.preprocess_dataset(dataset_path, chunk_size=chunk_size, workers=workers)
+
     # Split data
-    dataset_size = len(data)
+    dataset_size = len(dataset)
     train_size = int(train_split * dataset_size)
-    
+
     indices = torch.randperm(dataset_size)
     train_indices = indices[:train_size]
     val_indices = indices[train_size:]
-    
-    train_data = data[train_indices]
-    train_labels = labels[train_indices]
-    val_data = data[val_indices]
-    val_labels = labels[val_indices]
-    
-    # Create datasets
-    train_dataset = torch.utils.data.TensorDataset(train_data, train_labels)
-    val_dataset = torch.utils.data.TensorDataset(val_data, val_labels)
-    
+
+    # Create datasets (index views over the same memory-mapped file)
+    train_dataset = torch.utils.data.Subset(dataset, train_indices.tolist())
+    val_dataset = torch.utils.data.Subset(dataset, val_indices.tolist())
+
     # Create data loaders
     train_loader = torch.utils.data.DataLoader(train_dataset, batch_size=batch_size, shuffle=True)
     val_loader = torch.utils.data.DataLoader(val_dataset, batch_size=batch_size, shuffle=False)
-    
-    return train_loader, val_loader
\ No newline at end of file
+
+    return train_loader, val_loader
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Throughput probe: is training input-bound or compute-bound?
+
+For each loader profile, measures images/sec for:
+    loader only      - iterating the training DataLoader (decode from cache + augmentation)
+    compute only     - forward + backward + optimizer step on one reused batch
+    loader + model   - the real training loop
+If the loader alone is slower than compute alone, training is input-bound:
+add workers or make augmentation cheaper. Otherwise the model is the limit.
+
+Usage: python ml/probe_loader.py [--data-dir ml/dataset] [--batch-size 16] [--batches 20] [--workers 0,2,auto]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ml.classifier import SkinDiseaseClassifier
+from ml.loader_profile import LoaderProfile, available_cores
+from ml.train_model import create_data_loaders
+
+def batches_from(loader, count):
+    """Yield ``count`` batches, starting new epochs as needed"""
+    produced = 0
+    while produced < count:
+        for batch in loader:
+            yield batch
+            produced += 1
+            if produced == count:
+                return
+
+def train_step(model, optimizer, criterion, images, labels, device):
+    images, labels = images.to(device, non_blocking=True), labels.to(device, non_blocking=True)
+    optimizer.zero_grad()
+    loss = criterion(model(images), labels)
+    loss.backward()
+    optimizer.step()
+
+def images_per_second(batches, step):
+    """Time ``step`` over the batches, excluding the first (worker start-up, allocator warm-up)"""
+    iterator = iter(batches)
+    step(*next(iterator))
+    images = 0
+    start = time.perf_counter()
+    for images_batch, labels in iterator:
+        step(images_batch, labels)
+        images += len(labels)
+    elapsed = time.perf_counter() - start
+    return images / elapsed if elapsed > 0 else 0.0
+
+def make_profile(workers, prefetch, device):
+    if workers == "auto":
+        return LoaderProfile.auto(device)
+    workers = int(workers)
+    cuda = device.type == "cuda"
+    return LoaderProfile(num_workers=workers, prefetch_factor=prefetch, pin_memory=cuda,
+                         torch_threads=None if cuda else max(1, available_cores() - workers))
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure data loading vs model throughput")
+    parser.add_argument("--data-dir", default="ml/dataset")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--prefetch", type=int, default=2)
+    parser.add_argument("--workers", default="0,auto", help="comma-separated worker counts, or auto")
+    args = parser.parse_args()
+
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    print("⏱️ Training Throughput Probe")
+    print("=" * 50)
+    print(f"Device: {device}, {available_cores()} cores, batch size {args.batch_size}, {args.batches} batches")
+
+    model = SkinDiseaseClassifier(num_classes=2, pretrained=False).to(device).train()
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(model.parameters(), lr=0.001)
+    step = lambda images, labels: train_step(model, optimizer, criterion, images, labels, device)
+
+    for workers in args.workers.split(","):
+        profile = make_profile(workers.strip(), args.prefetch, device)
+        train_loader, _ = create_data_loaders(args.data_dir, args.batch_size, profile=profile)
+
+        loader_ips = images_per_second(batches_from(train_loader, args.batches), lambda images, labels: None)
+        fixed = next(iter(train_loader))
+        compute_ips = images_per_second([fixed] * args.batches, step)
+        combined_ips = images_per_second(batches_from(train_loader, args.batches), step)
+
+        bound = "input-bound" if loader_ips < compute_ips else "compute-bound"
+        print(f"\n📊 {profile.describe()}")
+        print(f"  loader only:    {loader_ips:8.1f} images/s")
+        print(f"  compute only:   {compute_ips:8.1f} images/s")
+        print(f"  loader + model: {combined_ips:8.1f} images/s "
+              f"({combined_ips / min(loader_ips, compute_ips):.0%} of the slower side)")
+        print(f"  ➡️ {bound}")
+
+if __name__ == "__main__":
+    main()
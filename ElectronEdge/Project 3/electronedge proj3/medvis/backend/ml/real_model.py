@@ -1,100 +1,60 @@
-import torch
-import torch.nn as nn
-import torchvision.models as models
-import torchvision.transforms as transforms
-from PIL import Image
 import numpy as np
 import cv2
 import os
-
-class SkinDiseaseClassifier(nn.Module):
-    """Real CNN model for skin disease classification - Eczema vs Basal Cell Carcinoma"""
-    
-    def __init__(self, num_classes=2, pretrained=True):
-        super(SkinDiseaseClassifier, self).__init__()
-        
-        # Use ResNet18 as backbone
-        self.backbone = models.resnet18(pretrained=pretrained)
-        
-        # Replace the final layer for our classes
-        num_features = self.backbone.fc.in_features
-        self.backbone.fc = nn.Sequential(
-            nn.Dropout(0.5),
-            nn.Linear(num_features, 128),
-            nn.ReLU(),
-            nn.Dropout(0.3),
-            nn.Linear(128, num_classes)
-        )
-        
-    def forward(self, x):
-        return self.backbone(x)
+from ml.backends import TorchBackend
+from ml.classifier import SkinDiseaseClassifier  # re-exported for existing imports
+from ml.image_context import ImageContext
 
 class ImageAnalyzer:
     """Advanced image analysis for Eczema vs Basal Cell Carcinoma"""
     
     def __init__(self):
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        
-        # Image preprocessing pipeline
-        self.transform = transforms.Compose([
-            transforms.Resize((224, 224)),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406], 
-                               std=[0.229, 0.224, 0.225])
-        ])
-        
-        # Load or create model
-        self.model = self._load_model()
-        
-    def _load_model(self):
-        """Load trained model or create a new one"""
-        model = SkinDiseaseClassifier(num_classes=2)
+        # CNN inference and its preprocessing are shared with the other backends (ml/backends.py)
+        self.backend = self._load_backend()
+        self.device = self.backend.device
+        self.model = self.backend.model
+        
+    def _load_backend(self):
+        """Load trained weights or fall back to the pretrained ResNet18 backbone"""
         model_path = "ml/model.pth"
         
         if os.path.exists(model_path):
             try:
                 # Try to load existing trained model
-                state_dict = torch.load(model_path, map_location=self.device, weights_only=True)
-                model.load_state_dict(state_dict)
+                backend = TorchBackend(model_path=model_path)
                 print("✅ Loaded trained Eczema vs Basal Cell model")
+                return backend
             except Exception as e:
                 print(f"⚠️ Could not load trained model: {e}")
                 print("🔄 Using pretrained ResNet18 with random classification layer")
         else:
             print("🔄 No trained model found, using pretrained ResNet18")
             
-        model.to(self.device)
-        model.eval()
-        return model
+        return TorchBackend(pretrained=True)
     
-    def analyze_image_features(self, image_path):
-        """Analyze image features for skin condition detection"""
-        # Load image
-        image = cv2.imread(image_path)
-        if image is None:
-            raise ValueError(f"Could not load image: {image_path}")
-            
-        # Convert to RGB
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    def analyze_image_features(self, image):
+        """Analyze image features for skin condition detection (accepts an ImageContext or a path)"""
+        # Decode once; RGB / HSV / gray are cached on the context
+        context = ImageContext.ensure(image)
         
         # Feature analysis
         features = {}
         
         # 1. Color analysis
-        features.update(self._analyze_colors(image_rgb))
+        features.update(self._analyze_colors(context))
         
         # 2. Texture analysis
-        features.update(self._analyze_texture(image_rgb))
+        features.update(self._analyze_texture(context))
         
         # 3. Shape analysis
-        features.update(self._analyze_shapes(image_rgb))
+        features.update(self._analyze_shapes(context))
         
         return features
     
-    def _analyze_colors(self, image):
+    def _analyze_colors(self, context):
         """Analyze color characteristics"""
-        # Convert to different color spaces
-        hsv = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
+        image = context.rgb
+        hsv = context.hsv
         
         # Calculate color statistics
         red_mean = np.mean(image[:,:,0])
@@ -113,10 +73,9 @@ class ImageAnalyzer:
             'saturation_mean': saturation_mean
         }
     
-    def _analyze_texture(self, image):
+    def _analyze_texture(self, context):
         """Analyze texture patterns"""
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        gray = context.gray
         
         # Calculate texture features using Laplacian variance
         laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
@@ -130,10 +89,10 @@ class ImageAnalyzer:
             'edge_density': edge_density
         }
     
-    def _analyze_shapes(self, image):
+    def _analyze_shapes(self, context):
         """Analyze shape characteristics"""
-        # Convert to grayscale and threshold
-        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        # Threshold the shared grayscale image
+        gray = context.gray
         _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
         
         # Find contours
@@ -159,39 +118,43 @@ class ImageAnalyzer:
         
         return {'circularity': 0, 'contour_area': 0}
     
-    def predict_with_features(self, image_path):
+    def predict_with_features(self, image):
         """Make prediction using both CNN and feature analysis"""
-        # 1. CNN prediction
-        image = Image.open(image_path).convert('RGB')
-        image_tensor = self.transform(image).unsqueeze(0).to(self.device)
-        
-        with torch.no_grad():
-            outputs = self.model(image_tensor)
-            probabilities = torch.softmax(outputs, dim=1)
-            cnn_probs = probabilities.cpu().numpy()[0]
-        
-        # 2. Feature-based analysis
-        features = self.analyze_image_features(image_path)
-        feature_probs = self._classify_by_features(features)
-        
-        # 3. Combine predictions (weighted average)
-        combined_probs = 0.7 * cnn_probs + 0.3 * feature_probs
-        
-        # Get final prediction
-        predicted_class = np.argmax(combined_probs)
-        confidence = np.max(combined_probs)
-        
-        return {
-            'predicted_class': predicted_class,
-            'confidence': float(confidence),
-            'probabilities': {
-                'Eczema': float(combined_probs[0]),
-                'Ringworm': float(combined_probs[1])
-            },
-            'features': features,
-            'cnn_probs': cnn_probs.tolist(),
-            'feature_probs': feature_probs.tolist()
-        }
+        return self.predict_batch([image])[0]
+    
+    def predict_batch(self, images):
+        """Predict several images (ImageContexts or paths) with one batched CNN forward pass"""
+        contexts = [ImageContext.ensure(image) for image in images]
+        
+        # 1. CNN prediction - one batched forward pass through the torch backend
+        cnn_batch_probs = self.backend.predict_images(contexts)
+        
+        results = []
+        for context, cnn_probs in zip(contexts, cnn_batch_probs):
+            # 2. Feature-based analysis
+            features = self.analyze_image_features(context)
+            feature_probs = self._classify_by_features(features)
+            
+            # 3. Combine predictions (weighted average)
+            combined_probs = 0.7 * cnn_probs + 0.3 * feature_probs
+            
+            # Get final prediction
+            predicted_class = np.argmax(combined_probs)
+            confidence = np.max(combined_probs)
+            
+            results.append({
+                'predicted_class': predicted_class,
+                'confidence': float(confidence),
+                'probabilities': {
+                    'Eczema': float(combined_probs[0]),
+                    'Ringworm': float(combined_probs[1])
+                },
+                'features': features,
+                'cnn_probs': cnn_probs.tolist(),
+                'feature_probs': feature_probs.tolist()
+            })
+        
+        return results
     
     def _classify_by_features(self, features):
         """Rule-based classification using extracted features"""
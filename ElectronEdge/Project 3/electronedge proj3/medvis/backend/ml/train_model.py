@@ -6,238 +6,115 @@ Training script for Eczema vs Basal Cell Carcinoma classification
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import DataLoader, Dataset
+from torch.utils.data import DataLoader
 import torchvision.transforms as transforms
-from torchvision import models
 import os
-from PIL import Image
-import numpy as np
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import matplotlib.pyplot as plt
 import seaborn as sns
 from tqdm import tqdm
 import json
+import sys
 
-class SkinDiseaseDataset(Dataset):
-    """Custom dataset for skin disease classification"""
-    
-    def __init__(self, data_dir, transform=None):
-        self.data_dir = data_dir
-        self.transform = transform
-        self.images = []
-        self.labels = []
-        self.class_names = ['eczema', 'basal cell']
-        
-        # Load images and labels
-        for class_idx, class_name in enumerate(self.class_names):
-            class_path = os.path.join(data_dir, class_name)
-            if os.path.exists(class_path):
-                for img_name in os.listdir(class_path):
-                    if img_name.lower().endswith(('.jpg', '.jpeg', '.png')):
-                        img_path = os.path.join(class_path, img_name)
-                        self.images.append(img_path)
-                        self.labels.append(class_idx)
-        
-        print(f"Loaded {len(self.images)} images:")
-        print(f"  Eczema: {self.labels.count(0)} images")
-        print(f"  Basal Cell: {self.labels.count(1)} images")
-    
-    def __len__(self):
-        return len(self.images)
-    
-    def __getitem__(self, idx):
-        img_path = self.images[idx]
-        label = self.labels[idx]
-        
-        try:
-            image = Image.open(img_path).convert('RGB')
-            if self.transform:
-                image = self.transform(image)
-            return image, label
-        except Exception as e:
-            print(f"Error loading image {img_path}: {e}")
-            # Return a black image as fallback
-            if self.transform:
-                return self.transform(Image.new('RGB', (224, 224), (0, 0, 0))), label
-            return Image.new('RGB', (224, 224), (0, 0, 0)), label
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
-class SkinDiseaseClassifier(nn.Module):
-    """CNN model for skin disease classification"""
-    
-    def __init__(self, num_classes=2, pretrained=True):
-        super(SkinDiseaseClassifier, self).__init__()
-        
-        # Use ResNet18 as backbone
-        self.backbone = models.resnet18(pretrained=pretrained)
-        
-        # Replace the final layer for our classes
-        num_features = self.backbone.fc.in_features
-        self.backbone.fc = nn.Sequential(
-            nn.Dropout(0.5),
-            nn.Linear(num_features, 128),
-            nn.ReLU(),
-            nn.Dropout(0.3),
-            nn.Linear(128, num_classes)
-        )
-        
-    def forward(self, x):
-        return self.backbone(x)
+from ml.classifier import SkinDiseaseClassifier
+from ml.loader_profile import LoaderProfile
+from ml.dataset_manifest import DatasetManifest, ManifestImageDataset
+from ml.training_engine import ResumableRandomSampler, TrainingEngine
 
-def create_data_loaders(data_dir, batch_size=16, train_split=0.8):
-    """Create train and validation data loaders"""
-    
-    # Data augmentation for training
+CLASS_NAMES = ['eczema', 'basal cell']
+
+def create_data_loaders(data_dir, batch_size=16, train_split=0.8, cache_dir=None, profile=None, seed=42):
+    """Create train and validation data loaders over the incrementally cached dataset
+    
+    Only new or changed files are hashed and preprocessed (see
+    ml/dataset_manifest.py). The train/val split comes from content hashes,
+    so it is stratified and stable as the dataset grows. ``profile`` sets
+    worker processes, prefetching and pinned memory (default:
+    LoaderProfile.auto() for this machine). ``seed`` fixes the shuffling,
+    so a resumed run sees the same batches.
+    """
+    
+    normalize = transforms.Normalize(mean=[0.485, 0.456, 0.406], 
+                                     std=[0.229, 0.224, 0.225])
+    
+    # Data augmentation for training - images are already resized in the cache,
+    # so these run on uint8 tensors instead of decoded PIL images
     train_transform = transforms.Compose([
-        transforms.Resize((224, 224)),
         transforms.RandomHorizontalFlip(p=0.5),
         transforms.RandomRotation(degrees=15),
         transforms.ColorJitter(brightness=0.2, contrast=0.2, saturation=0.2, hue=0.1),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], 
-                           std=[0.229, 0.224, 0.225])
+        transforms.ConvertImageDtype(torch.float32),
+        normalize
     ])
     
     # No augmentation for validation
     val_transform = transforms.Compose([
-        transforms.Resize((224, 224)),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], 
-                           std=[0.229, 0.224, 0.225])
+        transforms.ConvertImageDtype(torch.float32),
+        normalize
     ])
     
-    # Load full dataset
-    full_dataset = SkinDiseaseDataset(data_dir, transform=None)
+    # Hash and decode only what changed since the last run
+    manifest = DatasetManifest(data_dir, CLASS_NAMES, cache_dir=cache_dir, image_size=(224, 224))
+    manifest.update()
+    train_entries, val_entries = manifest.split(val_fraction=1 - train_split)
     
-    # Split indices
-    dataset_size = len(full_dataset)
-    indices = list(range(dataset_size))
-    np.random.shuffle(indices)
+    # Both datasets map the same shards, with different transforms
+    train_dataset = ManifestImageDataset(manifest.cache_dir, train_entries, transform=train_transform)
+    val_dataset = ManifestImageDataset(manifest.cache_dir, val_entries, transform=val_transform)
+    labels = train_dataset.labels.tolist() + val_dataset.labels.tolist()
     
-    train_size = int(train_split * dataset_size)
-    train_indices = indices[:train_size]
-    val_indices = indices[train_size:]
+    print(f"Loaded {len(labels)} images:")
+    print(f"  Eczema: {labels.count(0)} images")
+    print(f"  Basal Cell: {labels.count(1)} images")
     
-    # Create separate datasets with different transforms
-    train_dataset = SkinDiseaseDataset(data_dir, transform=train_transform)
-    val_dataset = SkinDiseaseDataset(data_dir, transform=val_transform)
+    # Create samplers (the training order can be resumed mid-epoch)
+    train_sampler = ResumableRandomSampler(range(len(train_dataset)), seed=seed)
     
-    # Create subset samplers
-    train_sampler = torch.utils.data.SubsetRandomSampler(train_indices)
-    val_sampler = torch.utils.data.SubsetRandomSampler(val_indices)
+    # Create data loaders - workers decode and augment the next batches while the model trains
+    profile = profile or LoaderProfile.auto()
+    profile.apply()
+    train_loader = DataLoader(train_dataset, batch_size=batch_size, sampler=train_sampler, **profile.loader_kwargs())
+    val_loader = DataLoader(val_dataset, batch_size=batch_size, shuffle=False, **profile.loader_kwargs())
     
-    # Create data loaders
-    train_loader = DataLoader(train_dataset, batch_size=batch_size, sampler=train_sampler)
-    val_loader = DataLoader(val_dataset, batch_size=batch_size, sampler=val_sampler)
+    print(f"Data loading: {profile.describe()}")
     
-    print(f"Training samples: {len(train_indices)}")
-    print(f"Validation samples: {len(val_indices)}")
+    print(f"Training samples: {len(train_dataset)}")
+    print(f"Validation samples: {len(val_dataset)}")
     
     return train_loader, val_loader
 
-def train_model(model, train_loader, val_loader, num_epochs=20, learning_rate=0.001):
-    """Train the model"""
+def train_model(model, train_loader, val_loader, num_epochs=20, learning_rate=0.001, precision="fp32",
+                channels_last=False, checkpoint_path=None, checkpoint_every=200, resume=True):
+    """Train the model
+    
+    ``precision`` is "fp32" or "bf16" (autocast), ``channels_last`` switches
+    the memory format. With ``checkpoint_path`` the run is checkpointed
+    every ``checkpoint_every`` steps and, if ``resume``, continues from an
+    existing checkpoint. A checkpoint taken on different data (the dataset
+    grew) resumes at the start of its epoch.
+    """
     
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-    print(f"Training on device: {device}")
+    print(f"Training on device: {device} ({precision}{', channels_last' if channels_last else ''})")
     
     model = model.to(device)
     criterion = nn.CrossEntropyLoss()
     optimizer = optim.Adam(model.parameters(), lr=learning_rate, weight_decay=1e-4)
     scheduler = optim.lr_scheduler.StepLR(optimizer, step_size=7, gamma=0.1)
     
-    train_losses = []
-    val_losses = []
-    train_accuracies = []
-    val_accuracies = []
-    
-    best_val_acc = 0.0
-    best_model_state = None
-    
-    for epoch in range(num_epochs):
-        print(f'\\nEpoch {epoch+1}/{num_epochs}')
-        print('-' * 50)
-        
-        # Training phase
-        model.train()
-        train_loss = 0.0
-        train_correct = 0
-        train_total = 0
-        
-        train_pbar = tqdm(train_loader, desc='Training')
-        for images, labels in train_pbar:
-            images, labels = images.to(device), labels.to(device)
-            
-            optimizer.zero_grad()
-            outputs = model(images)
-            loss = criterion(outputs, labels)
-            loss.backward()
-            optimizer.step()
-            
-            train_loss += loss.item()
-            _, predicted = torch.max(outputs.data, 1)
-            train_total += labels.size(0)
-            train_correct += (predicted == labels).sum().item()
-            
-            train_pbar.set_postfix({
-                'Loss': f'{loss.item():.4f}',
-                'Acc': f'{100 * train_correct / train_total:.2f}%'
-            })
-        
-        # Validation phase
-        model.eval()
-        val_loss = 0.0
-        val_correct = 0
-        val_total = 0
-        
-        with torch.no_grad():
-            val_pbar = tqdm(val_loader, desc='Validation')
-            for images, labels in val_pbar:
-                images, labels = images.to(device), labels.to(device)
-                outputs = model(images)
-                loss = criterion(outputs, labels)
-                
-                val_loss += loss.item()
-                _, predicted = torch.max(outputs.data, 1)
-                val_total += labels.size(0)
-                val_correct += (predicted == labels).sum().item()
-                
-                val_pbar.set_postfix({
-                    'Loss': f'{loss.item():.4f}',
-                    'Acc': f'{100 * val_correct / val_total:.2f}%'
-                })
-        
-        # Calculate epoch metrics
-        epoch_train_loss = train_loss / len(train_loader)
-        epoch_val_loss = val_loss / len(val_loader)
-        epoch_train_acc = 100 * train_correct / train_total
-        epoch_val_acc = 100 * val_correct / val_total
-        
-        train_losses.append(epoch_train_loss)
-        val_losses.append(epoch_val_loss)
-        train_accuracies.append(epoch_train_acc)
-        val_accuracies.append(epoch_val_acc)
-        
-        print(f'Train Loss: {epoch_train_loss:.4f}, Train Acc: {epoch_train_acc:.2f}%')
-        print(f'Val Loss: {epoch_val_loss:.4f}, Val Acc: {epoch_val_acc:.2f}%')
-        
-        # Save best model
-        if epoch_val_acc > best_val_acc:
-            best_val_acc = epoch_val_acc
-            best_model_state = model.state_dict().copy()
-            print(f'New best validation accuracy: {best_val_acc:.2f}%')
-        
-        scheduler.step()
-    
-    # Load best model
-    model.load_state_dict(best_model_state)
-    
-    return model, {
-        'train_losses': train_losses,
-        'val_losses': val_losses,
-        'train_accuracies': train_accuracies,
-        'val_accuracies': val_accuracies,
-        'best_val_acc': best_val_acc
-    }
+    # Identifies the train/val split, so a checkpoint taken on other data isn't resumed mid-epoch
+    dataset_fingerprint = "/".join(str(getattr(loader.dataset, "fingerprint", None))
+                                   for loader in (train_loader, val_loader))
+    engine = TrainingEngine(model, optimizer, scheduler, criterion, device, precision=precision,
+                            channels_last=channels_last, checkpoint_path=checkpoint_path,
+                            checkpoint_every=checkpoint_every, dataset_fingerprint=dataset_fingerprint)
+    if resume:
+        engine.resume(train_loader.sampler)
+    
+    history = engine.fit(train_loader, val_loader, num_epochs)
+    return model, history
 
 def evaluate_model(model, val_loader):
     """Evaluate model and generate detailed metrics"""
@@ -251,7 +128,7 @@ def evaluate_model(model, val_loader):
     
     with torch.no_grad():
         for images, labels in tqdm(val_loader, desc='Evaluating'):
-            images, labels = images.to(device), labels.to(device)
+            images, labels = images.to(device, non_blocking=True), labels.to(device, non_blocking=True)
             outputs = model(images)
             _, predicted = torch.max(outputs, 1)
             
@@ -318,6 +195,10 @@ def main():
     batch_size = 16
     num_epochs = 25
     learning_rate = 0.001
+    precision = os.getenv("TRAIN_PRECISION", "fp32")  # fp32 | bf16
+    channels_last = os.getenv("TRAIN_CHANNELS_LAST", "0").lower() in ("1", "true", "yes")
+    checkpoint_path = os.getenv("TRAIN_CHECKPOINT", "checkpoint.pt")
+    checkpoint_every = int(os.getenv("TRAIN_CHECKPOINT_EVERY", "200"))
     
     # Create data loaders
     print("📊 Loading dataset...")
@@ -329,7 +210,9 @@ def main():
     
     # Train model
     print("🚀 Starting training...")
-    trained_model, history = train_model(model, train_loader, val_loader, num_epochs, learning_rate)
+    trained_model, history = train_model(model, train_loader, val_loader, num_epochs, learning_rate,
+                                         precision=precision, channels_last=channels_last,
+                                         checkpoint_path=checkpoint_path, checkpoint_every=checkpoint_every)
     
     # Evaluate model
     print("📈 Evaluating model...")
@@ -343,6 +226,10 @@ def main():
     torch.save(trained_model.state_dict(), model_path)
     print(f"✅ Model saved to {model_path}")
     
+    # The run is complete, so a later run should start fresh rather than resume
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    
     # Save training info
     training_info = {
         'accuracy': float(accuracy),
@@ -350,6 +237,9 @@ def main():
         'num_epochs': num_epochs,
         'batch_size': batch_size,
         'learning_rate': learning_rate,
+        'precision': precision,
+        'channels_last': channels_last,
+        'train_images_per_sec': history['train_images_per_sec'],
         'class_names': ['Eczema', 'Basal Cell Carcinoma']
     }
     
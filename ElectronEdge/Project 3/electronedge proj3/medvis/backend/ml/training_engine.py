@@ -0,0 +1,291 @@
+import os
+import random
+import time
+
+import numpy as np
+import torch
+from torch.utils.data import Sampler
+from tqdm import tqdm
+
+PRECISIONS = ("fp32", "bf16")
+
+class ResumableRandomSampler(Sampler):
+    """Random order over ``indices`` that can be replayed and entered part-way through
+
+    The order of each epoch depends only on (seed, epoch), so a resumed run
+    sees the same batches as an uninterrupted one. set_epoch(epoch, start)
+    skips the first ``start`` samples, which are the batches trained on
+    before the checkpoint.
+    """
+
+    def __init__(self, indices, seed=0):
+        self.indices = list(indices)
+        self.seed = seed
+        self.epoch = 0
+        self.start = 0
+
+    def set_epoch(self, epoch, start=0):
+        self.epoch = epoch
+        self.start = min(start, len(self.indices))
+
+    def __iter__(self):
+        generator = torch.Generator()
+        generator.manual_seed(self.seed + self.epoch)
+        order = torch.randperm(len(self.indices), generator=generator).tolist()
+        return iter([self.indices[position] for position in order[self.start:]])
+
+    def __len__(self):
+        return len(self.indices) - self.start
+
+    def state_dict(self):
+        return {"indices": self.indices, "seed": self.seed}
+
+    def load_state_dict(self, state):
+        self.indices = list(state["indices"])
+        self.seed = state["seed"]
+
+class TrainingEngine:
+    """Epoch loop for a classifier with mixed precision, channels_last and checkpoints
+
+    precision="bf16" runs forward passes and the loss under bfloat16 autocast.
+    This helps on CPUs with native bf16 (AVX512-BF16 / AMX) and needs no
+    loss scaling. channels_last stores activations as NHWC, which the
+    oneDNN CPU convolutions prefer.
+
+    With a ``checkpoint_path``, the full training state is written every
+    ``checkpoint_every`` steps, at the end of each epoch and on Ctrl+C.
+    That state is the model, optimizer, scheduler, running epoch totals, best
+    snapshot, history, sampler and RNG states. Files are written to a temp
+    file and renamed, so a crash never leaves a torn checkpoint. resume()
+    continues from the exact batch when the train loader uses a
+    ResumableRandomSampler, and from the start of that epoch otherwise.
+
+    ``dataset_fingerprint`` identifies the train/val data (see
+    ManifestImageDataset.fingerprint) and is saved with the checkpoint. If
+    the data changed since, resume() restarts the interrupted epoch on the
+    current data and drops the best snapshot, whose accuracy was measured
+    on a different validation split.
+    """
+
+    def __init__(self, model, optimizer, scheduler, criterion, device, precision="fp32",
+                 channels_last=False, checkpoint_path=None, checkpoint_every=200, dataset_fingerprint=None):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision {precision!r}, expected one of {PRECISIONS}")
+        self.model = model
+        self.optimizer = optimizer
+        self.scheduler = scheduler
+        self.criterion = criterion
+        self.device = device
+        self.precision = precision
+        self.channels_last = channels_last
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.dataset_fingerprint = dataset_fingerprint
+        self.memory_format = torch.channels_last if channels_last else torch.contiguous_format
+
+        if channels_last:
+            self.model.to(memory_format=torch.channels_last)
+
+        self.epoch = 0
+        self.step = 0
+        self.running = self._new_totals()
+        self.best_val_acc = 0.0
+        self.best_model_state = None
+        self.history = {
+            'train_losses': [], 'val_losses': [], 'train_accuracies': [], 'val_accuracies': [],
+            'train_images_per_sec': [], 'val_images_per_sec': []
+        }
+
+    @staticmethod
+    def _new_totals():
+        return {"loss": 0.0, "correct": 0, "total": 0, "batches": 0, "seconds": 0.0}
+
+    def _autocast(self):
+        return torch.autocast(device_type=self.device.type, dtype=torch.bfloat16,
+                              enabled=self.precision == "bf16")
+
+    def _to_device(self, images, labels):
+        images = images.to(self.device, memory_format=self.memory_format, non_blocking=True)
+        return images, labels.to(self.device, non_blocking=True)
+
+    def _snapshot(self):
+        """Deep copy of the weights on the CPU (state_dict() alone aliases the live tensors)"""
+        return {name: tensor.detach().to("cpu", copy=True) for name, tensor in self.model.state_dict().items()}
+
+    def state_dict(self, sampler=None):
+        return {
+            "epoch": self.epoch,
+            "step": self.step,
+            "running": self.running,
+            "model": self.model.state_dict(),
+            "optimizer": self.optimizer.state_dict(),
+            "scheduler": self.scheduler.state_dict() if self.scheduler else None,
+            "best_val_acc": self.best_val_acc,
+            "best_model_state": self.best_model_state,
+            "history": self.history,
+            "sampler": sampler.state_dict() if isinstance(sampler, ResumableRandomSampler) else None,
+            "precision": self.precision,
+            "dataset_fingerprint": self.dataset_fingerprint,
+            "rng": {
+                "torch": torch.get_rng_state(),
+                "numpy": np.random.get_state(),
+                "python": random.getstate()
+            }
+        }
+
+    def save_checkpoint(self, sampler=None):
+        if not self.checkpoint_path:
+            return
+        temp_path = self.checkpoint_path + ".tmp"
+        torch.save(self.state_dict(sampler), temp_path)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def resume(self, sampler=None) -> bool:
+        """Load the checkpoint if there is one; returns True if training state was restored"""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return False
+        state = torch.load(self.checkpoint_path, map_location="cpu", weights_only=False)
+        self.model.load_state_dict(state["model"])
+        self.optimizer.load_state_dict(state["optimizer"])
+        if self.scheduler and state["scheduler"]:
+            self.scheduler.load_state_dict(state["scheduler"])
+        self.epoch = state["epoch"]
+        self.step = state["step"]
+        self.running = state["running"]
+        self.best_val_acc = state["best_val_acc"]
+        self.best_model_state = state["best_model_state"]
+        self.history = state["history"]
+        torch.set_rng_state(state["rng"]["torch"])
+        np.random.set_state(state["rng"]["numpy"])
+        random.setstate(state["rng"]["python"])
+
+        if state.get("dataset_fingerprint") != self.dataset_fingerprint:
+            print("⚠️ The dataset changed since the checkpoint; restarting the interrupted epoch on the "
+                  "current data and re-selecting the best model on the new validation split")
+            self.step = 0
+            self.running = self._new_totals()
+            self.best_val_acc = 0.0
+            self.best_model_state = None
+        elif isinstance(sampler, ResumableRandomSampler) and state["sampler"]:
+            sampler.load_state_dict(state["sampler"])
+        elif self.step:
+            print("⚠️ Train loader can't skip batches; restarting the interrupted epoch")
+            self.step = 0
+            self.running = self._new_totals()
+        print(f"♻️ Resumed from {self.checkpoint_path}: epoch {self.epoch + 1}, step {self.step}")
+        return True
+
+    def train_epoch(self, train_loader):
+        """Train until the end of the current epoch, continuing after ``self.step`` batches"""
+        sampler = train_loader.sampler
+        if isinstance(sampler, ResumableRandomSampler):
+            sampler.set_epoch(self.epoch, start=self.step * train_loader.batch_size)
+
+        self.model.train()
+        totals = self.running
+        started = time.perf_counter()
+        train_pbar = tqdm(train_loader, desc='Training', initial=self.step,
+                          total=self.step + len(train_loader))
+        for images, labels in train_pbar:
+            images, labels = self._to_device(images, labels)
+
+            self.optimizer.zero_grad()
+            with self._autocast():
+                outputs = self.model(images)
+                loss = self.criterion(outputs, labels)
+            loss.backward()
+            self.optimizer.step()
+
+            totals["loss"] += loss.item()
+            totals["batches"] += 1
+            totals["total"] += labels.size(0)
+            totals["correct"] += (outputs.argmax(dim=1) == labels).sum().item()
+            self.step += 1
+
+            train_pbar.set_postfix({
+                'Loss': f'{loss.item():.4f}',
+                'Acc': f'{100 * totals["correct"] / totals["total"]:.2f}%'
+            })
+
+            if self.checkpoint_every and self.step % self.checkpoint_every == 0:
+                totals["seconds"] += time.perf_counter() - started
+                started = time.perf_counter()
+                self.save_checkpoint(sampler)
+
+        totals["seconds"] += time.perf_counter() - started
+        return totals
+
+    def validate(self, val_loader):
+        self.model.eval()
+        totals = self._new_totals()
+        started = time.perf_counter()
+        with torch.no_grad(), self._autocast():
+            val_pbar = tqdm(val_loader, desc='Validation')
+            for images, labels in val_pbar:
+                images, labels = self._to_device(images, labels)
+                outputs = self.model(images)
+                loss = self.criterion(outputs, labels)
+
+                totals["loss"] += loss.item()
+                totals["batches"] += 1
+                totals["total"] += labels.size(0)
+                totals["correct"] += (outputs.argmax(dim=1) == labels).sum().item()
+
+                val_pbar.set_postfix({
+                    'Loss': f'{loss.item():.4f}',
+                    'Acc': f'{100 * totals["correct"] / totals["total"]:.2f}%'
+                })
+        totals["seconds"] = time.perf_counter() - started
+        return totals
+
+    def fit(self, train_loader, val_loader, num_epochs):
+        """Train up to ``num_epochs`` (counting resumed ones); loads the best weights at the end"""
+        try:
+            while self.epoch < num_epochs:
+                print(f'\nEpoch {self.epoch + 1}/{num_epochs}')
+                print('-' * 50)
+
+                train = self.train_epoch(train_loader)
+                val = self.validate(val_loader)
+                self._record_epoch(train, val)
+
+                self.epoch += 1
+                self.step = 0
+                self.running = self._new_totals()
+                if self.scheduler:
+                    self.scheduler.step()
+                self.save_checkpoint(train_loader.sampler)
+        except KeyboardInterrupt:
+            self.save_checkpoint(train_loader.sampler)
+            print(f"\n💾 Interrupted; progress saved to {self.checkpoint_path}" if self.checkpoint_path
+                  else "\n⚠️ Interrupted (no checkpoint path, progress not saved)")
+            raise
+
+        # Load best model
+        if self.best_model_state is not None:
+            self.model.load_state_dict(self.best_model_state)
+        return dict(self.history, best_val_acc=self.best_val_acc)
+
+    def _record_epoch(self, train, val):
+        epoch_train_loss = train["loss"] / max(1, train["batches"])
+        epoch_val_loss = val["loss"] / max(1, val["batches"])
+        epoch_train_acc = 100 * train["correct"] / max(1, train["total"])
+        epoch_val_acc = 100 * val["correct"] / max(1, val["total"])
+        train_speed = train["total"] / train["seconds"] if train["seconds"] else 0.0
+        val_speed = val["total"] / val["seconds"] if val["seconds"] else 0.0
+
+        self.history['train_losses'].append(epoch_train_loss)
+        self.history['val_losses'].append(epoch_val_loss)
+        self.history['train_accuracies'].append(epoch_train_acc)
+        self.history['val_accuracies'].append(epoch_val_acc)
+        self.history['train_images_per_sec'].append(train_speed)
+        self.history['val_images_per_sec'].append(val_speed)
+
+        print(f'Train Loss: {epoch_train_loss:.4f}, Train Acc: {epoch_train_acc:.2f}%, {train_speed:.1f} images/s')
+        print(f'Val Loss: {epoch_val_loss:.4f}, Val Acc: {epoch_val_acc:.2f}%, {val_speed:.1f} images/s')
+
+        # Save best model
+        if self.best_model_state is None or epoch_val_acc > self.best_val_acc:
+            self.best_val_acc = epoch_val_acc
+            self.best_model_state = self._snapshot()
+            print(f'New best validation accuracy: {self.best_val_acc:.2f}%')
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Startup profile: import time of the API, by package
+
+Imports a module in a fresh interpreter with ``-X importtime`` and prints
+the total import time and the packages it is spent in. Save a run as a baseline and compare
+later runs against it to catch startup regressions; with --compare, the
+exit code is 1 when the total grew by more than --max-regression.
+
+Usage:
+    python profile_startup.py [--module simple_app] [--top 15]
+    python profile_startup.py --save startup_baseline.json
+    python profile_startup.py --compare startup_baseline.json [--max-regression 0.2]
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def profile_import(module):
+    """Import ``module`` in a child interpreter; returns (wall seconds, total us, {package: us})
+
+    Each module's own (self) time is added to its top-level package, so the
+    numbers don't overlap and add up to the total. Interpreter start-up
+    imports (everything up to ``site``) are excluded.
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        raise SystemExit(f"❌ import {module} failed")
+
+    rows = [match.groups() for match in map(_LINE.match, result.stderr.splitlines()) if match]
+    startup = max((i for i, row in enumerate(rows) if row[3] == "site" and len(row[2]) == 1), default=-1)
+    packages = {}
+    for self_us, _, _, name in rows[startup + 1:]:
+        root = name.split(".")[0]
+        packages[root] = packages.get(root, 0) + int(self_us)
+    return wall, sum(packages.values()), packages
+
+def compare(baseline, current, max_regression):
+    """Print per-package deltas; returns False if the total regressed beyond ``max_regression``"""
+    print(f"\nCompared with baseline ({baseline['module']}):")
+    names = sorted(set(baseline["packages"]) | set(current["packages"]),
+                   key=lambda name: -abs(current["packages"].get(name, 0) - baseline["packages"].get(name, 0)))
+    for name in names[:10]:
+        before = baseline["packages"].get(name, 0) / 1000
+        after = current["packages"].get(name, 0) / 1000
+        if abs(after - before) >= 1:
+            print(f"  {name:<28} {before:8.1f} ms -> {after:8.1f} ms  ({after - before:+.1f} ms)")
+    change = (current["total_ms"] - baseline["total_ms"]) / baseline["total_ms"] if baseline["total_ms"] else 0.0
+    print(f"  {'total':<28} {baseline['total_ms']:8.1f} ms -> {current['total_ms']:8.1f} ms  ({change:+.1%})")
+    return change <= max_regression
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time profile of the API")
+    parser.add_argument("--module", default="simple_app")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--save", help="write this run to a JSON baseline")
+    parser.add_argument("--compare", help="compare with a JSON baseline")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print("⏱️ Startup Import Profile")
+    print("=" * 50)
+
+    wall, total_us, packages = profile_import(args.module)
+    total_ms = total_us / 1000
+    print(f"import {args.module}: {total_ms:.1f} ms in imports, {wall * 1000:.1f} ms wall (interpreter start included)")
+    print("\nSlowest packages (own import time of all their modules):")
+    for name, us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<28} {us / 1000:8.1f} ms  {us / 1000 / total_ms:6.1%}")
+
+    current = {"module": args.module, "total_ms": total_ms, "wall_ms": wall * 1000, "packages": packages}
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+        print(f"\n✅ Baseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(baseline, current, args.max_regression):
+            print(f"❌ Startup regressed by more than {args.max_regression:.0%}")
+            sys.exit(1)
+        print("✅ Startup within budget")
+
+if __name__ == "__main__":
+    main()
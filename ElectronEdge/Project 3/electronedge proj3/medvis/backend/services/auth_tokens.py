@@ -0,0 +1,180 @@
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict
+
+import jwt
+
+class TokenRevoked(jwt.InvalidTokenError):
+    """The token was valid but has been revoked by logout or account deletion"""
+
+class TokenVerifier:
+    """Issues and verifies HS256 access tokens without re-verifying on every request
+
+    Verified tokens are kept in a bounded LRU with their decoded claims
+    until their ``exp``. The key is the whole token, not just its
+    signature, so a cached signature can never be paired with a different
+    payload.
+
+    Revocations are checked in memory on every request, cache hit or not:
+    - A logout revokes one token by its ``jti``.
+    - Deleting an account revokes every token for that subject issued up to now.
+
+    Revocations are written to SQLite and reloaded at startup. A revocation
+    is dropped once every token it could match has expired, so the set stays
+    small. Each server process keeps its own copy, loaded at startup.
+    """
+
+    def __init__(self, secret_key: str, algorithm: str = "HS256", max_token_age_seconds: float = 1800,
+                 max_entries: int = 10000, db_path: str = "token_revocations.db"):
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+        self.max_token_age_seconds = max_token_age_seconds
+        self.max_entries = max_entries
+        self.db_path = db_path
+
+        self._lock = threading.Lock()
+        self._verified = OrderedDict()
+        self._revoked_tokens = {}
+        self._revoked_subjects = {}
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+        self._init_db()
+        self._load()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path)
+
+    def _init_db(self):
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS token_revocations (
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                revoked_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (kind, value)
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def _load(self):
+        """Read unexpired revocations into memory and drop the rest"""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("DELETE FROM token_revocations WHERE expires_at <= ?", (now,))
+        rows = conn.execute("SELECT kind, value, revoked_at, expires_at FROM token_revocations").fetchall()
+        conn.commit()
+        conn.close()
+        for kind, value, revoked_at, expires_at in rows:
+            if kind == "jti":
+                self._revoked_tokens[value] = expires_at
+            else:
+                self._revoked_subjects[value] = (revoked_at, expires_at)
+        if rows:
+            print(f"🔐 Loaded {len(rows)} token revocations from {self.db_path}")
+
+    def _persist(self, kind: str, value: str, revoked_at: float, expires_at: float):
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO token_revocations (kind, value, revoked_at, expires_at) VALUES (?, ?, ?, ?)",
+            (kind, value, revoked_at, expires_at)
+        )
+        conn.execute("DELETE FROM token_revocations WHERE expires_at <= ?", (revoked_at,))
+        conn.commit()
+        conn.close()
+
+    def issue(self, subject: str, expires_delta: timedelta = None) -> str:
+        """Signed access token with a unique ``jti`` so it can be revoked on its own"""
+        now = datetime.utcnow()
+        claims = {
+            "sub": subject,
+            "iat": now,
+            "exp": now + (expires_delta or timedelta(minutes=15)),
+            "jti": uuid.uuid4().hex
+        }
+        return jwt.encode(claims, self.secret_key, algorithm=self.algorithm)
+
+    def _is_revoked(self, claims: Dict) -> bool:
+        if claims.get("jti") in self._revoked_tokens:
+            return True
+        subject = self._revoked_subjects.get(claims.get("sub"))
+        # Tokens without iat predate revocation support, so treat them as issued at the epoch
+        return subject is not None and claims.get("iat", 0) <= subject[0]
+
+    def verify(self, token: str) -> Dict:
+        """Decoded claims of a valid, unrevoked token; raises jwt.InvalidTokenError otherwise"""
+        now = time.time()
+        with self._lock:
+            claims = self._verified.get(token)
+            if claims is not None:
+                if claims["exp"] <= now:
+                    del self._verified[token]
+                    claims = None
+                else:
+                    self._verified.move_to_end(token)
+                    self.hits += 1
+
+        if claims is None:
+            self.misses += 1
+            claims = jwt.decode(token, self.secret_key, algorithms=[self.algorithm],
+                                options={"require": ["exp", "sub"]})
+            with self._lock:
+                self._verified[token] = claims
+                while len(self._verified) > self.max_entries:
+                    self._verified.popitem(last=False)
+
+        if self._is_revoked(claims):
+            self.rejected += 1
+            raise TokenRevoked("Token has been revoked")
+        return claims
+
+    def revoke_token(self, claims: Dict):
+        """Revoke one token (logout) until it would have expired anyway"""
+        self.prune()
+        jti = claims.get("jti")
+        if not jti:
+            # Tokens issued before jti was added can only be revoked with their subject
+            self.revoke_subject(claims["sub"])
+            return
+        expires_at = float(claims["exp"])
+        with self._lock:
+            self._revoked_tokens[jti] = expires_at
+        self._persist("jti", jti, time.time(), expires_at)
+
+    def revoke_subject(self, subject: str):
+        """Revoke every token issued to ``subject`` so far (account deletion)"""
+        self.prune()
+        now = time.time()
+        expires_at = now + self.max_token_age_seconds
+        with self._lock:
+            self._revoked_subjects[subject] = (int(now), expires_at)
+        self._persist("subject", subject, int(now), expires_at)
+
+    def prune(self):
+        """Forget revocations whose tokens have all expired"""
+        now = time.time()
+        with self._lock:
+            self._revoked_tokens = {jti: exp for jti, exp in self._revoked_tokens.items() if exp > now}
+            self._revoked_subjects = {sub: entry for sub, entry in self._revoked_subjects.items() if entry[1] > now}
+
+    def get_stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "cached_tokens": len(self._verified),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "rejected": self.rejected,
+            "revoked_tokens": len(self._revoked_tokens),
+            "revoked_subjects": len(self._revoked_subjects)
+        }
@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from typing import List
+
+from services.uploads import VALID_EXTENSIONS
+
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+ZIP_CONTENT_TYPES = {"application/zip", "application/x-zip-compressed"}
+
+def is_zip_upload(filename: str, content_type: str = None) -> bool:
+    return (filename or "").lower().endswith(".zip") or content_type in ZIP_CONTENT_TYPES
+
+class BatchItem:
+    """One image of a batch: where its bytes are, not the bytes themselves"""
+
+    def __init__(self, index: int, filename: str, size: int, archive: zipfile.ZipFile = None,
+                 member: zipfile.ZipInfo = None, offset: int = 0):
+        self.index = index
+        self.filename = filename
+        self.size = size
+        self.archive = archive
+        self.member = member
+        self.offset = offset
+
+class BatchUpload:
+    """The images of a /predict/batch request, spooled to disk the handler owns
+
+    The request's own upload files are closed when the endpoint returns,
+    before a streamed response is sent, so plain image uploads are copied
+    into one temp file (recorded as offset and length) and each zip archive
+    into its own. Image bytes are read back one at a time as results are
+    streamed, so memory use is bounded by the number of images in flight,
+    not the size of the batch. All methods block; run them on the io stage.
+    """
+
+    def __init__(self, max_images: int = 500):
+        self.max_images = max_images
+        self.items: List[BatchItem] = []
+        self._spool = tempfile.TemporaryFile()
+        self._spool_lock = threading.Lock()
+        self._archives = []
+
+    def _add(self, item: BatchItem):
+        if len(self.items) >= self.max_images:
+            raise ValueError(f"Too many images in batch (maximum {self.max_images})")
+        self.items.append(item)
+
+    def add_image(self, filename: str, fileobj):
+        """Copy one uploaded image into the spool"""
+        fileobj.seek(0)
+        with self._spool_lock:
+            self._spool.seek(0, os.SEEK_END)
+            offset = self._spool.tell()
+            shutil.copyfileobj(fileobj, self._spool, 1024 * 1024)
+            size = self._spool.tell() - offset
+        self._add(BatchItem(len(self.items), filename, size, offset=offset))
+
+    def add_zip(self, filename: str, fileobj):
+        """Copy an uploaded zip archive and register its image members; raises ValueError if it isn't a zip"""
+        fileobj.seek(0)
+        copy = tempfile.TemporaryFile()
+        shutil.copyfileobj(fileobj, copy, 1024 * 1024)
+        copy.seek(0)
+        try:
+            archive = zipfile.ZipFile(copy)
+        except zipfile.BadZipFile:
+            copy.close()
+            raise ValueError(f"{filename} is not a valid zip archive")
+        self._archives.append((archive, copy))
+
+        for member in archive.infolist():
+            name = os.path.basename(member.filename)
+            # Skip folders, macOS resource forks and anything that isn't an image
+            if member.is_dir() or name.startswith(".") or "__MACOSX" in member.filename:
+                continue
+            if os.path.splitext(name)[1].lower() not in VALID_EXTENSIONS:
+                continue
+            self._add(BatchItem(len(self.items), member.filename, member.file_size, archive=archive, member=member))
+
+    def read(self, item: BatchItem) -> bytes:
+        """Bytes of one image; raises ValueError if it's too large to analyze"""
+        if item.size > MAX_IMAGE_BYTES:
+            raise ValueError(f"Image is larger than {MAX_IMAGE_BYTES // (1024 * 1024)} MB")
+        if item.archive is not None:
+            # Never decompresses more than the member's declared size
+            return item.archive.read(item.member)
+        with self._spool_lock:
+            self._spool.seek(item.offset)
+            return self._spool.read(item.size)
+
+    def close(self):
+        for archive, copy in self._archives:
+            archive.close()
+            copy.close()
+        self._archives = []
+        self._spool.close()
@@ -0,0 +1,176 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Callable, Dict, List
+
+class MicroBatcher:
+    """Collects concurrent inference requests into batches for a single forward pass
+
+    Requests submitted within ``max_wait_ms`` of the first queued request (up to
+    ``max_batch_size`` of them) are handed to ``batch_fn`` together. ``batch_fn``
+    receives a list of items and must return a list of results in the same order.
+    A result that is an ``Exception`` instance is raised for that request only.
+    When an ``executor`` (StageExecutor) is given, batches run under its ``stage``
+    concurrency limit instead of the loop's default thread pool.
+
+    Up to ``max_in_flight`` batches run at once (default: the stage's limit,
+    or 1 without an executor). The next batch is collected while earlier
+    ones are still running.
+    """
+
+    def __init__(self, batch_fn: Callable[[List], List], max_batch_size: int = 8,
+                 max_wait_ms: float = 10.0, name: str = "batcher",
+                 executor=None, stage: str = "inference", max_in_flight: int = None):
+        self.batch_fn = batch_fn
+        self.executor = executor
+        self.stage = stage
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self.name = name
+        if max_in_flight is None:
+            max_in_flight = executor.stage_limits.get(stage, 1) if executor is not None else 1
+        self.max_in_flight = max(1, int(max_in_flight))
+
+        self._queue = None
+        self._worker = None
+        self._in_flight = set()
+
+        # Metrics
+        self.total_requests = 0
+        self.total_batches = 0
+        self.total_batched_items = 0
+        self.total_failures = 0
+        self.max_queue_depth = 0
+        self.batch_size_histogram: Dict[int, int] = {}
+        self._queue_waits_ms = deque(maxlen=1000)
+        self._batch_durations_ms = deque(maxlen=1000)
+
+    def _ensure_worker(self):
+        """Start the batching loop on the running event loop if needed"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+            print(f"✅ {self.name} batching worker started "
+                  f"(max_batch_size={self.max_batch_size}, max_wait_ms={self.max_wait_ms})")
+
+    async def submit(self, item):
+        """Queue an item for the next batch and wait for its result"""
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.perf_counter()))
+
+        self.total_requests += 1
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return await future
+
+    async def _run(self):
+        """Batching loop: wait for a first item, then fill the batch until full or timed out
+
+        Each batch is dispatched as its own task, at most ``max_in_flight``
+        at a time, so collecting the next batch never waits on the current one.
+        """
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.max_in_flight)
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait_ms / 1000.0
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await slots.acquire()
+            # Requests that arrived while every slot was busy join this batch
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            task = loop.create_task(self._dispatch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _dispatch(self, batch):
+        """Run one batch off the event loop and fan results back out"""
+        started = time.perf_counter()
+        for _, _, enqueued in batch:
+            self._queue_waits_ms.append((started - enqueued) * 1000.0)
+
+        items = [item for item, _, _ in batch]
+        try:
+            if self.executor is not None:
+                results = await self.executor.run(self.stage, self.batch_fn, items)
+            else:
+                results = await asyncio.get_running_loop().run_in_executor(None, self.batch_fn, items)
+            if len(results) != len(items):
+                raise RuntimeError(f"{self.name} returned {len(results)} results for {len(items)} items")
+        except Exception as e:
+            print(f"❌ {self.name} batch of {len(items)} failed: {e}")
+            self.total_failures += len(items)
+            results = [e] * len(items)
+
+        self._record_batch(len(items), (time.perf_counter() - started) * 1000.0)
+
+        for (_, future, _), result in zip(batch, results):
+            if future.done():
+                # The caller went away (e.g. client disconnected)
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def _record_batch(self, size: int, duration_ms: float):
+        self.total_batches += 1
+        self.total_batched_items += size
+        self.batch_size_histogram[size] = self.batch_size_histogram.get(size, 0) + 1
+        self._batch_durations_ms.append(duration_ms)
+
+    def get_stats(self) -> Dict:
+        """Queue depth and batch-size metrics for throughput / latency tuning"""
+        waits = sorted(self._queue_waits_ms)
+        durations = sorted(self._batch_durations_ms)
+
+        def percentile(values, pct):
+            if not values:
+                return 0.0
+            return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+        return {
+            "name": self.name,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "max_in_flight": self.max_in_flight,
+            "batches_in_flight": len(self._in_flight),
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "total_requests": self.total_requests,
+            "total_batches": self.total_batches,
+            "total_failures": self.total_failures,
+            "avg_batch_size": (self.total_batched_items / self.total_batches) if self.total_batches else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_size_histogram.items())),
+            "queue_wait_ms": {
+                "p50": percentile(waits, 50),
+                "p99": percentile(waits, 99)
+            },
+            "batch_duration_ms": {
+                "p50": percentile(durations, 50),
+                "p99": percentile(durations, 99)
+            }
+        }
+
+def create_batcher_from_env(batch_fn: Callable[[List], List], name: str = "predict",
+                            executor=None) -> MicroBatcher:
+    """Create a batcher configured by PREDICT_MAX_BATCH_SIZE / PREDICT_MAX_WAIT_MS"""
+    return MicroBatcher(
+        batch_fn,
+        max_batch_size=int(os.getenv("PREDICT_MAX_BATCH_SIZE", "8")),
+        max_wait_ms=float(os.getenv("PREDICT_MAX_WAIT_MS", "10")),
+        name=name,
+        executor=executor
+    )
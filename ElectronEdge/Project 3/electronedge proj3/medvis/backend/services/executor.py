@@ -0,0 +1,106 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+# Default per-stage concurrency limits. Stages share one bounded thread pool;
+# the limits stop one slow stage (e.g. inference) from occupying every worker.
+DEFAULT_STAGE_LIMITS = {
+    "io": 8,
+    "inference": 2,
+    "analysis": 4
+}
+
+class StageExecutor:
+    """Runs blocking pipeline stages in a bounded thread pool, off the event loop
+
+    OpenCV, NumPy and file I/O release the GIL for most of their
+    work, so a thread pool keeps the event loop free for /health and /auth/*
+    while predictions are in flight.
+    """
+
+    def __init__(self, max_workers: int = None, stage_limits: Dict[str, int] = None):
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.stage_limits = dict(DEFAULT_STAGE_LIMITS)
+        if stage_limits:
+            self.stage_limits.update(stage_limits)
+
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="medvis-stage")
+        self._semaphores = {}
+        self._stats = {stage: {"running": 0, "waiting": 0, "completed": 0, "failed": 0, "cancelled": 0}
+                       for stage in self.stage_limits}
+
+    def _semaphore(self, stage: str) -> asyncio.Semaphore:
+        if stage not in self._semaphores:
+            self._semaphores[stage] = asyncio.Semaphore(self.stage_limits.get(stage, self.max_workers))
+            self._stats.setdefault(stage, {"running": 0, "waiting": 0, "completed": 0, "failed": 0, "cancelled": 0})
+        return self._semaphores[stage]
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        return self._pool
+
+    async def run(self, stage: str, fn: Callable, *args, **kwargs):
+        """Run ``fn(*args, **kwargs)`` in the pool, respecting the stage's concurrency limit"""
+        semaphore = self._semaphore(stage)
+        stats = self._stats[stage]
+
+        stats["waiting"] += 1
+        try:
+            await semaphore.acquire()
+        except asyncio.CancelledError:
+            stats["cancelled"] += 1
+            raise
+        finally:
+            stats["waiting"] -= 1
+
+        stats["running"] += 1
+        try:
+            call = functools.partial(fn, *args, **kwargs)
+            result = await asyncio.get_running_loop().run_in_executor(self._pool, call)
+            stats["completed"] += 1
+            return result
+        except asyncio.CancelledError:
+            # The caller went away; the pool thread still finishes the call
+            stats["cancelled"] += 1
+            raise
+        except Exception:
+            stats["failed"] += 1
+            raise
+        finally:
+            stats["running"] -= 1
+            semaphore.release()
+
+    def get_stats(self) -> Dict:
+        """Per-stage queueing and completion counters"""
+        return {
+            "max_workers": self.max_workers,
+            "stages": {
+                stage: {"limit": self.stage_limits.get(stage, self.max_workers), **counters}
+                for stage, counters in self._stats.items()
+            }
+        }
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+def _stage_limits_from_env() -> Dict[str, int]:
+    """Read STAGE_LIMIT_<STAGE> overrides, e.g. STAGE_LIMIT_IO=16; warns about unknown stages"""
+    limits = {}
+    for stage in DEFAULT_STAGE_LIMITS:
+        value = os.getenv(f"STAGE_LIMIT_{stage.upper()}")
+        if value:
+            limits[stage] = int(value)
+
+    known = {f"STAGE_LIMIT_{stage.upper()}" for stage in DEFAULT_STAGE_LIMITS}
+    for name in sorted(os.environ):
+        if name.startswith("STAGE_LIMIT_") and name not in known:
+            print(f"⚠️ Ignoring {name}: no such stage (expected one of {sorted(known)})")
+    return limits
+
+# Global executor instance
+stage_executor = StageExecutor(
+    max_workers=int(os.getenv("STAGE_MAX_WORKERS", "0")) or None,
+    stage_limits=_stage_limits_from_env()
+)
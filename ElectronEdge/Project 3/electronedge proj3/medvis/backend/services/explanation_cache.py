@@ -0,0 +1,240 @@
+import asyncio
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from services.executor import stage_executor
+from services.llm_client import llm_client
+from services.llm_notes import PROMPT_VERSION, llm_service
+
+class ExplanationCache:
+    """TTL + LRU cache of LLM explanations, backed by SQLite, with stale-while-revalidate
+
+    Entries are keyed by (disease, confidence bucket, provider, prompt version),
+    so there are only a handful of distinct keys and steady-state lookups never
+    reach an LLM. Explanations are generated for the bucket's midpoint
+    confidence so every request in a bucket gets the same text.
+
+    - Fresh entries (younger than ``ttl_seconds``) are returned directly.
+    - Stale entries (younger than ``max_stale_seconds``) are returned
+      immediately while one background task regenerates them.
+    - Misses wait for generation; concurrent misses for the same key share a
+      single LLM request.
+
+    Fallback explanations (no provider configured, or every provider failed)
+    are returned but never cached. Cached dicts are shared and must not be
+    mutated. Intended to be used from a single event loop; SQLite writes run
+    on the executor's io stage.
+    """
+
+    def __init__(self, generate: Callable[[str, float], Awaitable[Tuple[Dict, str]]],
+                 provider_key: Callable[[], Optional[str]], fallback: Callable[[str], Dict],
+                 max_entries: int = 256, ttl_seconds: float = 86400.0,
+                 max_stale_seconds: float = 7 * 86400.0, bucket_width: float = 0.1,
+                 db_path: Optional[str] = None, prompt_version: str = PROMPT_VERSION,
+                 executor=stage_executor):
+        self.generate = generate
+        self.provider_key = provider_key
+        self.fallback = fallback
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = max(max_stale_seconds, ttl_seconds)
+        self.bucket_width = bucket_width
+        self.num_buckets = max(1, math.ceil(1.0 / bucket_width))
+        self.db_path = db_path
+        self.prompt_version = prompt_version
+        self.executor = executor
+
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._conn = None
+        self._db_lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.refreshes = 0
+        self.failures = 0
+        self.evictions = 0
+
+        if self.db_path:
+            self._init_disk_tier()
+
+    def _init_disk_tier(self):
+        """Create the table and load persisted entries for the current prompt version"""
+        # Shared by the io stage's threads; _db_lock serialises access
+        conn = self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS explanation_cache (
+                disease TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                provider TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                explanation TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (disease, bucket, provider, prompt_version)
+            )
+        ''')
+        conn.execute("DELETE FROM explanation_cache WHERE prompt_version != ?", (self.prompt_version,))
+        conn.commit()
+        rows = conn.execute(
+            "SELECT disease, bucket, provider, prompt_version, explanation, created_at "
+            "FROM explanation_cache ORDER BY created_at DESC LIMIT ?",
+            (self.max_entries,)
+        ).fetchall()
+
+        for disease, bucket, provider, prompt_version, explanation, created_at in reversed(rows):
+            self._entries[(disease, bucket, provider, prompt_version)] = (json.loads(explanation), created_at)
+        print(f"✅ Explanation cache disk tier: {self.db_path} ({len(rows)} entries loaded)")
+
+    def bucket(self, confidence: float) -> int:
+        """Confidence bucket index, e.g. 0.83 -> 8 with the default 0.1 width"""
+        # The epsilon keeps exact boundaries (0.7 / 0.1 = 6.999...) in the upper bucket
+        return min(max(int(confidence / self.bucket_width + 1e-9), 0), self.num_buckets - 1)
+
+    def bucket_confidence(self, bucket: int) -> float:
+        """Representative (midpoint) confidence used when generating a bucket's explanation"""
+        return round(min((bucket + 0.5) * self.bucket_width, 1.0), 4)
+
+    async def get(self, disease_name: str, confidence: float) -> Dict:
+        """Cached explanation for this disease and confidence"""
+        provider = self.provider_key()
+        if not provider:
+            self.bypassed += 1
+            return self.fallback(disease_name)
+
+        key = (disease_name, self.bucket(confidence), provider, self.prompt_version)
+        entry = self._entries.get(key)
+        if entry is not None:
+            explanation, created_at = entry
+            age = time.time() - created_at
+            if age < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return explanation
+            if age < self.max_stale_seconds:
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                self._start_refresh(key)
+                return explanation
+
+        self.misses += 1
+        explanation = await asyncio.shield(self._start_refresh(key))
+        return explanation if explanation is not None else self.fallback(disease_name)
+
+    def _start_refresh(self, key) -> asyncio.Task:
+        """Single-flight regeneration of one key"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._refresh(key))
+            self._inflight[key] = task
+        return task
+
+    async def _refresh(self, key) -> Optional[Dict]:
+        disease_name, bucket, _, _ = key
+        self.refreshes += 1
+        try:
+            explanation, provider = await self.generate(disease_name, self.bucket_confidence(bucket))
+            print(f"✅ Cached {provider} explanation for {disease_name} (bucket {bucket})")
+            created_at = self._store(key, explanation)
+            if self.db_path:
+                await self._persist(key, explanation, created_at)
+            return explanation
+        except Exception as e:
+            self.failures += 1
+            print(f"⚠️ Explanation refresh failed for {disease_name}: {e}")
+            return None
+        finally:
+            self._inflight.pop(key, None)
+
+    def _store(self, key, explanation: Dict) -> float:
+        created_at = time.time()
+        self._entries[key] = (explanation, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return created_at
+
+    async def _persist(self, key, explanation: Dict, created_at: float):
+        try:
+            await self.executor.run(
+                "io", self._execute,
+                "INSERT OR REPLACE INTO explanation_cache "
+                "(disease, bucket, provider, prompt_version, explanation, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, json.dumps(explanation), created_at)
+            )
+        except Exception as e:
+            print(f"⚠️ Explanation cache disk write failed: {e}")
+
+    def _execute(self, sql: str, params=()):
+        with self._db_lock:
+            self._conn.execute(sql, params)
+            self._conn.commit()
+
+    async def warm(self, disease_names: Iterable[str], confidences: List[float]) -> int:
+        """Pre-generate explanations for every disease at the given confidences"""
+        if not self.provider_key():
+            print("⚠️ No LLM provider configured, skipping explanation cache warm-up")
+            return 0
+
+        buckets = sorted({self.bucket(confidence) for confidence in confidences})
+        requests = [(name, self.bucket_confidence(bucket)) for name in disease_names for bucket in buckets]
+        await asyncio.gather(*(self.get(name, confidence) for name, confidence in requests))
+        print(f"🔥 Explanation cache warmed: {len(requests)} keys, {len(self._entries)} entries")
+        return len(requests)
+
+    def clear(self):
+        self._entries.clear()
+        if self.db_path:
+            self._execute("DELETE FROM explanation_cache")
+
+    def get_stats(self) -> Dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "prompt_version": self.prompt_version,
+            "provider": self.provider_key(),
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "refreshes": self.refreshes,
+            "refreshes_in_flight": len(self._inflight),
+            "failures": self.failures,
+            "evictions": self.evictions,
+            "hit_rate": ((self.hits + self.stale_hits) / lookups) if lookups else 0.0,
+            "disk_tier": self.db_path
+        }
+
+def _configured_providers() -> Optional[str]:
+    """Cache partition for the current provider configuration, or None when only fallbacks are available"""
+    return "+".join(llm_client.available_providers()) or None
+
+def warm_confidences_from_env() -> List[float]:
+    """EXPLANATION_CACHE_WARM_CONFIDENCES, e.g. "0.65,0.75,0.85" (the feature scorer's range)"""
+    value = os.getenv("EXPLANATION_CACHE_WARM_CONFIDENCES", "0.65,0.75,0.85")
+    return [float(item) for item in value.split(",") if item.strip()]
+
+# Global cache instance
+explanation_cache = ExplanationCache(
+    generate=llm_client.generate,
+    provider_key=_configured_providers,
+    fallback=llm_service._get_fallback_explanation,
+    max_entries=int(os.getenv("EXPLANATION_CACHE_SIZE", "256")),
+    ttl_seconds=float(os.getenv("EXPLANATION_CACHE_TTL_SECONDS", "86400")),
+    max_stale_seconds=float(os.getenv("EXPLANATION_CACHE_MAX_STALE_SECONDS", "604800")),
+    bucket_width=float(os.getenv("EXPLANATION_CACHE_BUCKET_WIDTH", "0.1")),
+    db_path=os.getenv("EXPLANATION_CACHE_DB", "explanation_cache.db") or None
+)
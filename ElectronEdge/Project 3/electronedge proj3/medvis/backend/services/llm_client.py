@@ -0,0 +1,196 @@
+import asyncio
+import os
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from services.llm_notes import (
+    ANTHROPIC_MODEL,
+    ANTHROPIC_VERSION,
+    OPENAI_MODEL,
+    OPENAI_SYSTEM_PROMPT,
+    build_anthropic_prompt,
+    build_openai_prompt,
+    parse_explanation_text
+)
+
+class AsyncLLMClient:
+    """Async explanation client with a pooled HTTP session and hedged requests
+
+    One ``httpx.AsyncClient`` is shared by every call, so TLS connections to
+    the providers are reused instead of being set up per request. Each
+    provider has its own concurrency limit. When both providers are
+    configured, the second one is launched if the first hasn't answered
+    within ``hedge_delay_ms`` (or fails); the first valid answer wins and the
+    other request is cancelled.
+
+    Base URLs are configurable so the client can be pointed at a local stub
+    server in tests.
+    """
+
+    def __init__(self, openai_api_key: str = None, anthropic_api_key: str = None,
+                 openai_base_url: str = "https://api.openai.com/v1",
+                 anthropic_base_url: str = "https://api.anthropic.com/v1",
+                 timeout: float = 30.0, hedge_delay_ms: float = 2000.0,
+                 max_connections: int = 20, provider_limits: Dict[str, int] = None):
+        self.openai_api_key = openai_api_key
+        self.anthropic_api_key = anthropic_api_key
+        self.base_urls = {
+            "openai": openai_base_url.rstrip("/"),
+            "anthropic": anthropic_base_url.rstrip("/")
+        }
+        self.timeout = timeout
+        self.hedge_delay_ms = hedge_delay_ms
+        self.max_connections = max_connections
+        self.provider_limits = {"openai": 4, "anthropic": 4}
+        if provider_limits:
+            self.provider_limits.update(provider_limits)
+
+        self._session = None
+        self._semaphores = {}
+        self.stats = {
+            "requests": {"openai": 0, "anthropic": 0},
+            "failures": {"openai": 0, "anthropic": 0},
+            "wins": {"openai": 0, "anthropic": 0},
+            "hedges_launched": 0,
+            "cancelled": 0
+        }
+
+    def available_providers(self) -> List[str]:
+        """Configured providers in order of preference"""
+        providers = []
+        if self.openai_api_key and self.openai_api_key.startswith("sk-"):
+            providers.append("openai")
+        if self.anthropic_api_key and self.anthropic_api_key.startswith("sk-ant-"):
+            providers.append("anthropic")
+        return providers
+
+    def _get_session(self) -> httpx.AsyncClient:
+        """Shared connection pool, created lazily on the running event loop"""
+        if self._session is None or self._session.is_closed:
+            self._session = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=5.0),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections)
+            )
+        return self._session
+
+    def _semaphore(self, provider: str) -> asyncio.Semaphore:
+        if provider not in self._semaphores:
+            self._semaphores[provider] = asyncio.Semaphore(self.provider_limits.get(provider, 4))
+        return self._semaphores[provider]
+
+    async def generate_with_openai(self, disease_name: str, confidence: float) -> Dict:
+        """Generate explanation using the OpenAI chat completions API"""
+        response = await self._get_session().post(
+            f"{self.base_urls['openai']}/chat/completions",
+            headers={"Authorization": f"Bearer {self.openai_api_key}"},
+            json={
+                "model": OPENAI_MODEL,
+                "messages": [
+                    {"role": "system", "content": OPENAI_SYSTEM_PROMPT},
+                    {"role": "user", "content": build_openai_prompt(disease_name, confidence)}
+                ],
+                "max_tokens": 1000,
+                "temperature": 0.3
+            }
+        )
+        response.raise_for_status()
+        return parse_explanation_text(response.json()["choices"][0]["message"]["content"])
+
+    async def generate_with_anthropic(self, disease_name: str, confidence: float) -> Dict:
+        """Generate explanation using the Anthropic messages API"""
+        response = await self._get_session().post(
+            f"{self.base_urls['anthropic']}/messages",
+            headers={
+                "x-api-key": self.anthropic_api_key,
+                "anthropic-version": ANTHROPIC_VERSION
+            },
+            json={
+                "model": ANTHROPIC_MODEL,
+                "max_tokens": 1000,
+                "messages": [{"role": "user", "content": build_anthropic_prompt(disease_name, confidence)}]
+            }
+        )
+        response.raise_for_status()
+        return parse_explanation_text(response.json()["content"][0]["text"])
+
+    async def _call(self, provider: str, disease_name: str, confidence: float) -> Dict:
+        """One provider request under that provider's concurrency limit"""
+        generate = self.generate_with_openai if provider == "openai" else self.generate_with_anthropic
+        async with self._semaphore(provider):
+            self.stats["requests"][provider] += 1
+            try:
+                return await generate(disease_name, confidence)
+            except asyncio.CancelledError:
+                self.stats["cancelled"] += 1
+                raise
+            except Exception:
+                self.stats["failures"][provider] += 1
+                raise
+
+    async def generate(self, disease_name: str, confidence: float) -> Tuple[Dict, str]:
+        """Hedged generation: returns (explanation, provider) or raises if every provider fails"""
+        providers = self.available_providers()
+        if not providers:
+            raise RuntimeError("No LLM provider configured")
+
+        loop = asyncio.get_running_loop()
+        tasks = {loop.create_task(self._call(providers[0], disease_name, confidence)): providers[0]}
+        backups = list(providers[1:])
+        hedge_at = loop.time() + self.hedge_delay_ms / 1000.0
+        errors = []
+
+        try:
+            while tasks:
+                timeout = max(0.0, hedge_at - loop.time()) if backups else None
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    provider = tasks.pop(task)
+                    if task.exception() is None:
+                        self.stats["wins"][provider] += 1
+                        return task.result(), provider
+                    print(f"⚠️ {provider} explanation failed: {task.exception()}")
+                    errors.append(f"{provider}: {task.exception()}")
+
+                # Hedge: launch the next provider when the deadline passes or everything in flight failed
+                if backups and (not done or not tasks):
+                    provider = backups.pop(0)
+                    self.stats["hedges_launched"] += 1
+                    tasks[loop.create_task(self._call(provider, disease_name, confidence))] = provider
+                    hedge_at = loop.time() + self.hedge_delay_ms / 1000.0
+        finally:
+            # Cancel the losers (or everything, if we were cancelled ourselves)
+            for task in tasks:
+                task.cancel()
+
+        raise RuntimeError(f"All LLM providers failed: {'; '.join(errors)}")
+
+    async def aclose(self):
+        """Close the pooled HTTP session"""
+        if self._session is not None and not self._session.is_closed:
+            await self._session.aclose()
+        self._session = None
+
+    def get_stats(self) -> Dict:
+        return {
+            "providers": self.available_providers(),
+            "hedge_delay_ms": self.hedge_delay_ms,
+            "provider_limits": self.provider_limits,
+            **self.stats
+        }
+
+# Global client instance
+llm_client = AsyncLLMClient(
+    openai_api_key=os.getenv("OPENAI_API_KEY"),
+    anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
+    openai_base_url=os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+    anthropic_base_url=os.getenv("ANTHROPIC_BASE_URL", "https://api.anthropic.com/v1"),
+    timeout=float(os.getenv("LLM_TIMEOUT_SECONDS", "30")),
+    hedge_delay_ms=float(os.getenv("LLM_HEDGE_DELAY_MS", "2000")),
+    provider_limits={
+        "openai": int(os.getenv("LLM_OPENAI_CONCURRENCY", "4")),
+        "anthropic": int(os.getenv("LLM_ANTHROPIC_CONCURRENCY", "4"))
+    }
+)
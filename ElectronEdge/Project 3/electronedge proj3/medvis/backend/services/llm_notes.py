@@ -2,7 +2,55 @@ import os
 import json
 from typing import Dict, Optional
 import requests
-from openai import OpenAI
+
+OPENAI_MODEL = "gpt-3.5-turbo"
+ANTHROPIC_MODEL = "claude-3-sonnet-20240229"
+ANTHROPIC_VERSION = "2023-06-01"
+
+# Bump whenever a prompt or the expected JSON shape changes; cached explanations are keyed by it
+PROMPT_VERSION = "explanation-v1"
+
+OPENAI_SYSTEM_PROMPT = "You are a helpful medical AI assistant that explains medical conditions in patient-friendly language. Always return valid JSON."
+
+def build_openai_prompt(disease_name: str, confidence: float) -> str:
+    """Prompt used for OpenAI chat completions"""
+    return f"""
+            As a medical AI assistant, provide a comprehensive but accessible explanation for a patient who has been diagnosed with {disease_name} with {confidence:.1%} confidence from medical image analysis.
+
+            Please structure your response as a JSON object with the following fields:
+            - name: The condition name in patient-friendly terms
+            - description: A clear, non-technical explanation of what this condition is
+            - symptoms: List of 4-5 common symptoms patients might experience
+            - causes: List of 3-4 potential causes or risk factors
+            - treatment: List of 4-5 general treatment approaches
+            - urgency: "low", "moderate", or "high" based on typical urgency
+            - next_steps: Specific recommendation for what the patient should do next
+            - disclaimer: Important medical disclaimer
+            - dos: List of 4-5 specific do's for managing this condition
+            - donts: List of 4-5 specific don'ts to avoid
+
+            Keep the language compassionate, clear, and avoid overly technical medical jargon. Focus on being informative while encouraging professional medical consultation.
+            """
+
+def build_anthropic_prompt(disease_name: str, confidence: float) -> str:
+    """Prompt used for Anthropic messages"""
+    return f"""
+            Provide a patient-friendly medical explanation for {disease_name} detected with {confidence:.1%} confidence.
+            
+            Return a JSON response with: name, description, symptoms (array), causes (array), treatment (array), urgency, next_steps, disclaimer, dos (array), donts (array).
+            
+            Use clear, compassionate language that patients can understand while being medically accurate.
+            """
+
+def parse_explanation_text(explanation_text: str) -> Dict:
+    """Strip markdown fences from an LLM reply and parse the JSON explanation"""
+    # Clean up the response to ensure it's valid JSON
+    explanation_text = explanation_text.strip()
+    if explanation_text.startswith('```json'):
+        explanation_text = explanation_text[7:]
+    if explanation_text.endswith('```'):
+        explanation_text = explanation_text[:-3]
+    return json.loads(explanation_text)
 
 class LLMExplanationService:
     def __init__(self):
@@ -11,6 +59,7 @@ class LLMExplanationService:
         
         # Initialize OpenAI client if API key is available
         if self.openai_api_key and self.openai_api_key.startswith("sk-"):
+            from openai import OpenAI  # slow to import; only needed when a key is configured
             self.openai_client = OpenAI(api_key=self.openai_api_key)
             print("✅ OpenAI client initialized")
         else:
@@ -23,28 +72,12 @@ class LLMExplanationService:
             raise Exception("OpenAI client not initialized")
             
         try:
-            prompt = f"""
-            As a medical AI assistant, provide a comprehensive but accessible explanation for a patient who has been diagnosed with {disease_name} with {confidence:.1%} confidence from medical image analysis.
-
-            Please structure your response as a JSON object with the following fields:
-            - name: The condition name in patient-friendly terms
-            - description: A clear, non-technical explanation of what this condition is
-            - symptoms: List of 4-5 common symptoms patients might experience
-            - causes: List of 3-4 potential causes or risk factors
-            - treatment: List of 4-5 general treatment approaches
-            - urgency: "low", "moderate", or "high" based on typical urgency
-            - next_steps: Specific recommendation for what the patient should do next
-            - disclaimer: Important medical disclaimer
-            - dos: List of 4-5 specific do's for managing this condition
-            - donts: List of 4-5 specific don'ts to avoid
-
-            Keep the language compassionate, clear, and avoid overly technical medical jargon. Focus on being informative while encouraging professional medical consultation.
-            """
+            prompt = build_openai_prompt(disease_name, confidence)
             
             response = self.openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
+                model=OPENAI_MODEL,
                 messages=[
-                    {"role": "system", "content": "You are a helpful medical AI assistant that explains medical conditions in patient-friendly language. Always return valid JSON."},
+                    {"role": "system", "content": OPENAI_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=1000,
@@ -52,15 +85,7 @@ class LLMExplanationService:
             )
             
             explanation_text = response.choices[0].message.content
-            
-            # Clean up the response to ensure it's valid JSON
-            explanation_text = explanation_text.strip()
-            if explanation_text.startswith('```json'):
-                explanation_text = explanation_text[7:]
-            if explanation_text.endswith('```'):
-                explanation_text = explanation_text[:-3]
-            
-            result = json.loads(explanation_text)
+            result = parse_explanation_text(explanation_text)
             print(f"✅ OpenAI generated explanation for {disease_name}")
             return result
             
@@ -77,19 +102,13 @@ class LLMExplanationService:
             headers = {
                 "Content-Type": "application/json",
                 "x-api-key": self.anthropic_api_key,
-                "anthropic-version": "2023-06-01"
+                "anthropic-version": ANTHROPIC_VERSION
             }
             
-            prompt = f"""
-            Provide a patient-friendly medical explanation for {disease_name} detected with {confidence:.1%} confidence.
-            
-            Return a JSON response with: name, description, symptoms (array), causes (array), treatment (array), urgency, next_steps, disclaimer, dos (array), donts (array).
-            
-            Use clear, compassionate language that patients can understand while being medically accurate.
-            """
+            prompt = build_anthropic_prompt(disease_name, confidence)
             
             data = {
-                "model": "claude-3-sonnet-20240229",
+                "model": ANTHROPIC_MODEL,
                 "max_tokens": 1000,
                 "messages": [{"role": "user", "content": prompt}]
             }
@@ -104,15 +123,7 @@ class LLMExplanationService:
             if response.status_code == 200:
                 result = response.json()
                 explanation_text = result["content"][0]["text"]
-                
-                # Clean up the response
-                explanation_text = explanation_text.strip()
-                if explanation_text.startswith('```json'):
-                    explanation_text = explanation_text[7:]
-                if explanation_text.endswith('```'):
-                    explanation_text = explanation_text[:-3]
-                
-                parsed_result = json.loads(explanation_text)
+                parsed_result = parse_explanation_text(explanation_text)
                 print(f"✅ Anthropic generated explanation for {disease_name}")
                 return parsed_result
             else:
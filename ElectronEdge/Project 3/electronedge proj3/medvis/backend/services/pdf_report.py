@@ -1,50 +1,43 @@
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
 from datetime import datetime
+import hashlib
+import json
 import os
 from services.llm_notes import format_explanation_for_report
 from services.specialist import format_specialists_for_report
+from services.storage import storage_manager
 
-def generate_pdf_report(prediction_result, explanation, specialists, image_path):
+def json_default(value):
+    """json.dumps default for report inputs"""
+    # NumPy scalars (features, probabilities) serialise as plain numbers
+    return value.item() if hasattr(value, "item") else str(value)
+
+def report_filename(prefix, *inputs):
+    """Content-addressed report filename: identical inputs map to the same file, different inputs never collide"""
+    canonical = json.dumps(inputs, sort_keys=True, default=json_default)
+    return f"{prefix}_{hashlib.sha256(canonical.encode('utf-8')).hexdigest()}.pdf"
+
+def generate_pdf_report(prediction_result, explanation, specialists, image_path, filepath=None):
     """
     Generate comprehensive PDF report with diagnosis and recommendations
     """
-    # Create reports directory
-    os.makedirs("static/reports", exist_ok=True)
-    
-    # Generate unique filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"medical_report_{timestamp}.pdf"
-    filepath = f"static/reports/{filename}"
-    
-    # Create PDF document
-    doc = SimpleDocTemplate(filepath, pagesize=letter)
-    styles = getSampleStyleSheet()
+    # Content-addressed filename (timestamps collide within the same second)
+    if filepath is None:
+        filename = report_filename("medical_report", prediction_result, explanation, specialists, image_path)
+        filepath = storage_manager.reports.prepare(filename)
+    
+    # ReportLab is imported on first render, so the API process (which only queues jobs) never loads it
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Paragraph
+    from services.report_templates import build_document, report_styles, static_flowables, thumbnail_flowable
+    
+    # Styles and static sections (title, headings, disclaimer) are built once per process
+    styles = report_styles()
+    static = static_flowables()
     story = []
     
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        textColor=colors.darkblue
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceAfter=12,
-        textColor=colors.darkblue
-    )
-    
     # Title
-    story.append(Paragraph("MEDICAL IMAGE ANALYSIS REPORT", title_style))
-    story.append(Spacer(1, 20))
+    story.append(static["title"])
+    story.append(static["spacer"])
     
     # Report metadata
     report_info = f"""
@@ -53,76 +46,63 @@ def generate_pdf_report(prediction_result, explanation, specialists, image_path)
     <b>Confidence Level:</b> {prediction_result['confidence']:.1%}<br/>
     """
     story.append(Paragraph(report_info, styles['Normal']))
-    story.append(Spacer(1, 20))
-    
-    # Add analyzed image if exists
-    if os.path.exists(image_path):
-        try:
-            # Resize image to fit in report
-            img = Image(image_path, width=3*inch, height=3*inch)
-            story.append(Paragraph("ANALYZED IMAGE:", heading_style))
+    story.append(static["spacer"])
+    
+    # Add analyzed image if exists (as a downscaled JPEG thumbnail, not the full-resolution upload)
+    if image_path and os.path.exists(image_path):
+        img = thumbnail_flowable(image_path, width=3*inch, height=3*inch)
+        if img is not None:
+            story.append(static["image_heading"])
             story.append(img)
-            story.append(Spacer(1, 20))
-        except Exception as e:
-            print(f"Could not add image to report: {e}")
+            story.append(static["spacer"])
     
     # Diagnosis section
-    story.append(Paragraph("DIAGNOSIS RESULTS:", heading_style))
+    story.append(static["diagnosis_heading"])
+    probabilities_html = "".join(
+        f"• {name}: {probability:.1%}<br/>" for name, probability in prediction_result['probabilities'].items()
+    )
     diagnosis_text = f"""
     <b>Detected Condition:</b> {prediction_result['disease']}<br/>
     <b>Confidence Score:</b> {prediction_result['confidence']:.1%}<br/>
     <b>Classification Probabilities:</b><br/>
-    • Disease A: {prediction_result['probabilities']['Disease_A']:.1%}<br/>
-    • Disease B: {prediction_result['probabilities']['Disease_B']:.1%}<br/>
+    {probabilities_html}
     """
     story.append(Paragraph(diagnosis_text, styles['Normal']))
-    story.append(Spacer(1, 20))
+    story.append(static["spacer"])
     
     # Medical explanation
-    story.append(Paragraph("MEDICAL INFORMATION:", heading_style))
+    story.append(static["information_heading"])
     explanation_text = format_explanation_for_report(explanation)
     # Convert to HTML-friendly format
     explanation_html = explanation_text.replace('\n', '<br/>')
     story.append(Paragraph(explanation_html, styles['Normal']))
-    story.append(Spacer(1, 20))
+    story.append(static["spacer"])
     
     # Specialists section
     if specialists:
-        story.append(Paragraph("SPECIALIST RECOMMENDATIONS:", heading_style))
+        story.append(static["specialists_heading"])
         specialists_text = format_specialists_for_report(specialists)
         specialists_html = specialists_text.replace('\n', '<br/>')
         story.append(Paragraph(specialists_html, styles['Normal']))
-        story.append(Spacer(1, 20))
+        story.append(static["spacer"])
     
     # Disclaimer
-    story.append(Paragraph("IMPORTANT DISCLAIMER:", heading_style))
-    disclaimer = """
-    <b>This report is generated by an AI system and is intended for informational purposes only. 
-    It should not be used as a substitute for professional medical advice, diagnosis, or treatment. 
-    Always seek the advice of qualified healthcare providers with any questions regarding medical conditions. 
-    Never disregard professional medical advice or delay seeking it because of information from this report.</b>
-    """
-    story.append(Paragraph(disclaimer, styles['Normal']))
+    story.append(static["disclaimer_heading"])
+    story.append(static["disclaimer"])
     
     # Build PDF
-    doc.build(story)
-    
-    return filepath
+    return build_document(filepath, story)
 
-def generate_simple_report(disease, confidence, image_path):
+def generate_simple_report(disease, confidence, image_path, filepath=None):
     """Generate a simplified report for quick analysis"""
-    os.makedirs("static/reports", exist_ok=True)
+    if filepath is None:
+        filepath = storage_manager.reports.prepare(report_filename("quick_report", disease, confidence, image_path))
     
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"quick_report_{timestamp}.pdf"
-    filepath = f"static/reports/{filename}"
+    from reportlab.platypus import Paragraph
+    from services.report_templates import build_document, report_styles, static_flowables
     
-    doc = SimpleDocTemplate(filepath, pagesize=letter)
-    styles = getSampleStyleSheet()
-    story = []
-    
-    story.append(Paragraph("QUICK ANALYSIS REPORT", styles['Title']))
-    story.append(Spacer(1, 20))
+    static = static_flowables()
+    story = [static["quick_title"], static["spacer"]]
     
     content = f"""
     <b>Analysis Date:</b> {datetime.now().strftime("%B %d, %Y")}<br/>
@@ -132,7 +112,63 @@ def generate_simple_report(disease, confidence, image_path):
     <b>Note:</b> This is a preliminary analysis. Please consult with a healthcare professional for proper diagnosis and treatment.
     """
     
-    story.append(Paragraph(content, styles['Normal']))
-    doc.build(story)
+    story.append(Paragraph(content, report_styles()['Normal']))
+    return build_document(filepath, story)
+
+def generate_simple_pdf(prediction, explanation, specialists, image_path, filepath=None):
+    """Generate simple PDF report"""
+    if filepath is None:
+        filename = report_filename("medical_report", prediction, explanation, specialists, image_path)
+        filepath = storage_manager.reports.prepare(filename)
     
+    from reportlab.platypus import Paragraph
+    from services.report_templates import build_document, report_styles, static_flowables
+    
+    story = []
+    
+    # Title
+    story.append(static_flowables()["simple_title"])
+    
+    # Content
+    content = f"""
+    <b>Report Generated:</b> {datetime.now().strftime("%B %d, %Y at %I:%M %p")}<br/>
+    <b>Detected Condition:</b> {prediction['disease']}<br/>
+    <b>Confidence Level:</b> {prediction['confidence']:.1%}<br/>
+    <b>Analysis Method:</b> AI-Powered Image Classification<br/><br/>
+    
+    <b>Medical Information:</b><br/>
+    {explanation['description']}<br/><br/>
+    
+    <b>Recommended Next Steps:</b><br/>
+    {explanation['next_steps']}<br/><br/>
+    
+    <b>IMPORTANT DISCLAIMER:</b><br/>
+    {explanation['disclaimer']}
+    """
+    
+    story.append(Paragraph(content, report_styles()['Normal']))
+    return build_document(filepath, story)
+
+# Report kinds the background job queue can render
+RENDERERS = {
+    "simple": generate_simple_pdf,
+    "full": generate_pdf_report
+}
+
+def render_report_job(kind, payload, filepath):
+    """Render one queued report (runs in a worker process); writes atomically and returns the path"""
+    if os.path.exists(filepath):
+        # Identical report already rendered; refresh its age for storage retention
+        os.utime(filepath)
+        return filepath
+    
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    tmp_path = f"{filepath}.{os.getpid()}.tmp"
+    try:
+        RENDERERS[kind](payload["prediction"], payload["explanation"], payload["specialists"],
+                        payload["image_path"], filepath=tmp_path)
+        os.replace(tmp_path, filepath)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
     return filepath
\ No newline at end of file
@@ -0,0 +1,119 @@
+import asyncio
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable
+
+class TaskGraph:
+    """A small per-request DAG of async stages
+
+    Each stage is an async function that receives its dependencies' results
+    as keyword arguments. ``start()`` launches every stage at once; a stage
+    waits only on its own dependencies, so independent stages (e.g. the
+    explanation and the specialist lookup) run concurrently. If a dependency
+    fails, its dependents fail with the same exception.
+
+    Callers await just the results they need (``gather``). Stages added with
+    ``background=True`` are kept alive after the request returns and are
+    never awaited by ``gather``.
+
+        graph = TaskGraph("predict")
+        graph.add("prediction", predict)
+        graph.add("explanation", explain, deps=["prediction"])
+        graph.add("report", render, deps=["prediction", "explanation"], background=True)
+        graph.start()
+        results = await graph.gather("prediction", "explanation")
+    """
+
+    # Strong references to background stages that outlive their request
+    _background = set()
+
+    def __init__(self, name: str = "request"):
+        self.name = name
+        self._stages = {}
+        self._tasks = {}
+        self.timings_ms = {}
+
+    def add(self, name: str, fn: Callable[..., Awaitable], deps: Iterable[str] = (), background: bool = False):
+        """Register a stage; dependencies must already be registered"""
+        if name in self._stages:
+            raise ValueError(f"Stage already registered: {name}")
+        deps = tuple(deps)
+        missing = [dep for dep in deps if dep not in self._stages]
+        if missing:
+            raise ValueError(f"Stage {name} depends on unknown stages: {missing}")
+        self._stages[name] = (fn, deps, background)
+        return self
+
+    def start(self):
+        """Launch every stage on the running event loop"""
+        loop = asyncio.get_running_loop()
+        for name, (fn, deps, background) in self._stages.items():
+            task = loop.create_task(self._run_stage(name, fn, deps), name=f"{self.name}:{name}")
+            self._tasks[name] = task
+            task.add_done_callback(self._stage_done)
+            if background:
+                TaskGraph._background.add(task)
+                task.add_done_callback(TaskGraph._background.discard)
+        return self
+
+    async def _run_stage(self, name: str, fn: Callable[..., Awaitable], deps):
+        # Shield dependencies so a cancelled dependent doesn't cancel a shared stage
+        kwargs = {dep: await asyncio.shield(self._tasks[dep]) for dep in deps}
+        start = time.perf_counter()
+        try:
+            return await fn(**kwargs)
+        finally:
+            self.timings_ms[name] = (time.perf_counter() - start) * 1000
+
+    def _stage_done(self, task: asyncio.Task):
+        # Retrieve every exception (failures surface through gather or dependents); log background ones
+        if task.cancelled() or task.exception() is None:
+            return
+        if task in TaskGraph._background:
+            print(f"⚠️ Background stage {task.get_name()} failed: {task.exception()}")
+
+    def task(self, name: str) -> asyncio.Task:
+        return self._tasks[name]
+
+    async def gather(self, *names: str) -> Dict:
+        """Wait for the named stages and return {name: result}; re-raises the first failure"""
+        try:
+            results = await asyncio.gather(*(self._tasks[name] for name in names))
+        except BaseException:
+            self.cancel_foreground()
+            raise
+        return dict(zip(names, results))
+
+    def cancel_foreground(self):
+        """Cancel unfinished request-scoped stages (background stages keep running)"""
+        for name, task in self._tasks.items():
+            if not self._stages[name][2] and not task.done():
+                task.cancel()
+
+    @classmethod
+    def background_count(cls) -> int:
+        return len(cls._background)
+
+async def bounded_as_completed(items: Iterable, fn: Callable[..., Awaitable], window: int) -> AsyncIterator:
+    """Run ``fn(item)`` over ``items`` with at most ``window`` calls in flight, yielding results as they finish
+
+    New work starts only when a result has been taken, so a slow consumer
+    (e.g. a client reading a streamed response) pauses the pipeline instead
+    of letting finished results pile up. If the consumer stops early, the
+    calls still in flight are cancelled.
+    """
+    iterator = iter(items)
+    pending = set()
+    try:
+        while True:
+            for item in iterator:
+                pending.add(asyncio.ensure_future(fn(item)))
+                if len(pending) >= window:
+                    break
+            if not pending:
+                return
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,176 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from services.executor import stage_executor
+
+class PredictionCache:
+    """LRU cache of prediction results keyed by decoded-pixel hash and model version
+
+    Entries hold the full analyzer result (features, probabilities, insights).
+    The in-memory tier is a bounded OrderedDict; an optional SQLite tier keeps
+    entries across restarts. Whenever a lookup or store arrives with a model
+    version different from the one the cache was filled with, both tiers are
+    invalidated, so a reloaded model never serves stale predictions.
+
+    Memory lookups run on the event loop. Disk reads and writes run on the
+    executor's io stage over one long-lived WAL connection.
+
+    Cached result dicts are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, max_entries: int = 1024, db_path: Optional[str] = None, executor=stage_executor):
+        self.max_entries = max(1, int(max_entries))
+        self.db_path = db_path
+        self.executor = executor
+        self.model_version = None
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._db_lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        if self.db_path:
+            self._init_disk_tier()
+
+    def _init_disk_tier(self):
+        # Shared by the io stage's threads; _db_lock serialises access
+        conn = self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS prediction_cache (
+                pixel_hash TEXT NOT NULL,
+                model_version TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (pixel_hash, model_version)
+            )
+        ''')
+        conn.commit()
+        print(f"✅ Prediction cache disk tier: {self.db_path}")
+
+    def _check_model_version(self, model_version: str) -> bool:
+        """Drop every in-memory entry when the analyzer's model changes (caller holds the lock)
+
+        Returns True when the disk tier needs the old versions purged.
+        """
+        if model_version == self.model_version:
+            return False
+        if self.model_version is not None:
+            print(f"🔄 Model changed ({self.model_version} -> {model_version}), invalidating prediction cache")
+            self.invalidations += 1
+        self._entries.clear()
+        self.model_version = model_version
+        return bool(self.db_path)
+
+    async def _purge_other_versions(self, model_version: str):
+        # Disk rows are keyed by model version, so lookups stay correct while this runs
+        try:
+            await self.executor.run("io", self._execute,
+                                    "DELETE FROM prediction_cache WHERE model_version != ?", (model_version,))
+        except Exception as e:
+            print(f"⚠️ Prediction cache invalidation failed: {e}")
+
+    def _execute(self, sql: str, params=()):
+        with self._db_lock:
+            self._conn.execute(sql, params)
+            self._conn.commit()
+
+    async def get(self, pixel_hash: str, model_version: str) -> Optional[Dict]:
+        """Return the cached result for this image and model, or None"""
+        with self._lock:
+            purge = self._check_model_version(model_version)
+            result = self._entries.get(pixel_hash)
+            if result is not None:
+                self._entries.move_to_end(pixel_hash)
+                self.hits += 1
+                return result
+        if purge:
+            await self._purge_other_versions(model_version)
+
+        if self.db_path:
+            result = await self.executor.run("io", self._get_from_disk, pixel_hash, model_version)
+            if result is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._store_in_memory(pixel_hash, result)
+                return result
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    async def put(self, pixel_hash: str, model_version: str, result: Dict):
+        """Cache a prediction result"""
+        with self._lock:
+            purge = self._check_model_version(model_version)
+            self._store_in_memory(pixel_hash, result)
+        if purge:
+            await self._purge_other_versions(model_version)
+
+        if self.db_path:
+            try:
+                await self.executor.run(
+                    "io", self._execute,
+                    "INSERT OR REPLACE INTO prediction_cache (pixel_hash, model_version, result) VALUES (?, ?, ?)",
+                    (pixel_hash, model_version, json.dumps(result))
+                )
+            except Exception as e:
+                print(f"⚠️ Prediction cache disk write failed: {e}")
+
+    def _store_in_memory(self, pixel_hash: str, result: Dict):
+        self._entries[pixel_hash] = result
+        self._entries.move_to_end(pixel_hash)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _get_from_disk(self, pixel_hash: str, model_version: str) -> Optional[Dict]:
+        try:
+            with self._db_lock:
+                row = self._conn.execute(
+                    "SELECT result FROM prediction_cache WHERE pixel_hash = ? AND model_version = ?",
+                    (pixel_hash, model_version)
+                ).fetchone()
+            return json.loads(row[0]) if row else None
+        except Exception as e:
+            print(f"⚠️ Prediction cache disk read failed: {e}")
+            return None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.db_path:
+            self._execute("DELETE FROM prediction_cache")
+
+    def get_stats(self) -> Dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "model_version": self.model_version,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": ((self.hits + self.disk_hits) / lookups) if lookups else 0.0,
+            "disk_tier": self.db_path
+        }
+
+# Global cache instance
+prediction_cache = PredictionCache(
+    max_entries=int(os.getenv("PREDICTION_CACHE_SIZE", "1024")),
+    db_path=os.getenv("PREDICTION_CACHE_DB") or None
+)
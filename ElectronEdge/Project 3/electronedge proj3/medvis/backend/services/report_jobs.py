@@ -0,0 +1,301 @@
+import asyncio
+import functools
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Dict, Optional
+
+from services.pdf_report import RENDERERS, json_default, render_report_job, report_filename
+from services.storage import StorageArea, storage_manager
+
+class ReportJobQueue:
+    """Persistent PDF report jobs rendered by a process pool
+
+    Jobs live in a SQLite table, so a report survives the request that asked
+    for it and clients can poll ``GET /reports/{id}``. Each job moves through
+    these states:
+
+        waiting  - reserved by /predict, inputs not ready yet
+        pending  - queued for rendering (also after a retryable failure)
+        running  - being rendered in a worker process
+        ready    - PDF written to its content-addressed path
+        failed   - inputs failed, or rendering failed ``max_attempts`` times
+
+    A ready report whose file was removed by storage retention is reported
+    as ``expired``.
+
+    ReportLab rendering is CPU-bound pure Python, so it runs in worker
+    processes instead of on the request path or in the shared thread pool.
+    Filenames are sha256 digests of the report inputs. Identical reports are
+    rendered once, and two reports can never overwrite each other.
+
+    Every query runs on one dedicated DB thread that owns a long-lived WAL
+    connection, so commits never block the event loop and job updates are
+    applied in the order they were issued.
+    """
+
+    def __init__(self, db_path: str = "report_jobs.db", max_workers: int = None,
+                 max_attempts: int = 3, retry_delay_seconds: float = 2.0, storage: StorageArea = None,
+                 max_dispatch_backoff_seconds: float = 30.0):
+        self.db_path = db_path
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) // 2)
+        self.max_attempts = max(1, int(max_attempts))
+        self.retry_delay_seconds = retry_delay_seconds
+        self.max_dispatch_backoff_seconds = max_dispatch_backoff_seconds
+        self.storage = storage or storage_manager.reports
+
+        self._db = ThreadPoolExecutor(max_workers=1, thread_name_prefix="report-jobs-db")
+        self._conn = None
+        self._pool = None
+        self._dispatcher = None
+        self._wakeup = None
+        self._running = set()
+
+        # Counters
+        self.rendered = 0
+        self.retries = 0
+        self.failures = 0
+        self.dispatch_errors = 0
+        self.render_seconds = 0.0
+
+        self._db.submit(self._init_db).result()
+
+    async def _call(self, fn, *args, **kwargs):
+        """Run a query method on the DB thread"""
+        call = functools.partial(fn, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self._db, call)
+
+    def _init_db(self):
+        # Opened on, and only ever used from, the DB thread
+        conn = self._conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS report_jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                payload TEXT,
+                filename TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                created_at TIMESTAMP NOT NULL,
+                completed_at TIMESTAMP
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_report_jobs_due ON report_jobs (status, next_attempt_at)")
+        conn.commit()
+
+    def _update(self, job_id: str, **fields):
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        self._conn.execute(f"UPDATE report_jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+        self._conn.commit()
+
+    def _insert(self, job_id: str, kind: str):
+        self._conn.execute(
+            "INSERT INTO report_jobs (id, kind, status, created_at) VALUES (?, ?, 'waiting', ?)",
+            (job_id, kind, datetime.now().isoformat())
+        )
+        self._conn.commit()
+
+    async def reserve(self, kind: str = "simple") -> str:
+        """Create a job whose inputs are still being computed and return its id"""
+        if kind not in RENDERERS:
+            raise ValueError(f"Unknown report kind: {kind}")
+        job_id = uuid.uuid4().hex
+        await self._call(self._insert, job_id, kind)
+        return job_id
+
+    async def submit(self, job_id: str, prediction: Dict, explanation: Dict, specialists,
+                     image_path: Optional[str]):
+        """Attach the report inputs to a reserved job and queue it for rendering"""
+        payload = {
+            "prediction": prediction,
+            "explanation": explanation,
+            "specialists": specialists,
+            "image_path": image_path
+        }
+        filename = report_filename("medical_report", prediction, explanation, specialists, image_path)
+        await self._call(self._update, job_id, status="pending",
+                         payload=json.dumps(payload, default=json_default), filename=filename, next_attempt_at=0)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def abandon(self, job_id: str, error: str):
+        """Mark a reserved job failed because its inputs could not be produced (queued on the DB thread)"""
+        self._db.submit(self._update, job_id, status="failed", error=error,
+                        completed_at=datetime.now().isoformat())
+
+    def abandon_on_failure(self, job_id: str, task: asyncio.Task):
+        """Fail a reserved job if the task that submits its inputs fails or is cancelled"""
+        def finished(task):
+            if task.cancelled():
+                self.abandon(job_id, "cancelled")
+            elif task.exception() is not None:
+                self.abandon(job_id, str(task.exception()))
+        task.add_done_callback(finished)
+
+    async def status(self, job_id: str) -> Optional[Dict]:
+        """Public status for a job, or None if unknown"""
+        return await self._call(self._status, job_id)
+
+    def _status(self, job_id: str) -> Optional[Dict]:
+        row = self._conn.execute(
+            "SELECT id, status, filename, attempts, error, created_at, completed_at FROM report_jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        status = row["status"]
+        if status == "ready" and not os.path.exists(self.storage.path_for(row["filename"])):
+            status = "expired"
+        return {
+            "id": row["id"],
+            "status": status,
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "completed_at": row["completed_at"],
+            "download_url": self.storage.url_for(row["filename"]) if status == "ready" else None,
+            "error": row["error"]
+        }
+
+    def _recover(self):
+        # Rendering was interrupted: try again. Inputs never arrived: nothing to render.
+        self._conn.execute("UPDATE report_jobs SET status = 'pending', next_attempt_at = 0 WHERE status = 'running'")
+        self._conn.execute(
+            "UPDATE report_jobs SET status = 'failed', error = 'interrupted before inputs were ready' "
+            "WHERE status = 'waiting'"
+        )
+        self._conn.commit()
+
+    async def start(self):
+        """Recover jobs left over by a previous process and start dispatching"""
+        await self._call(self._recover)
+
+        self._wakeup = asyncio.Event()
+        self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch_loop())
+        print(f"🖨️ Report workers: {self.max_workers} processes, jobs in {self.db_path}")
+
+    async def stop(self):
+        """Stop dispatching; running jobs are re-queued on the next start"""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # spawn: the server process runs many threads, which fork does not handle safely
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def _claim_due_jobs(self, limit: int):
+        conn = self._conn
+        rows = conn.execute(
+            "SELECT id, kind, payload, filename, attempts FROM report_jobs "
+            "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY created_at LIMIT ?",
+            (time.time(), limit)
+        ).fetchall()
+        for row in rows:
+            conn.execute("UPDATE report_jobs SET status = 'running' WHERE id = ?", (row["id"],))
+        conn.commit()
+        return rows
+
+    def _next_due_in(self) -> Optional[float]:
+        row = self._conn.execute("SELECT MIN(next_attempt_at) FROM report_jobs WHERE status = 'pending'").fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    async def _dispatch_loop(self):
+        failures = 0
+        while True:
+            try:
+                free_slots = self.max_workers - len(self._running)
+                if free_slots > 0:
+                    for row in await self._call(self._claim_due_jobs, free_slots):
+                        task = asyncio.get_running_loop().create_task(self._execute(row))
+                        self._running.add(task)
+                        task.add_done_callback(self._running.discard)
+                        task.add_done_callback(lambda _: self._wakeup.set())
+
+                self._wakeup.clear()
+                timeout = await self._call(self._next_due_in) if len(self._running) < self.max_workers else None
+                failures = 0
+            except Exception as e:
+                # e.g. "database is locked": keep the dispatcher alive and try again
+                failures += 1
+                self.dispatch_errors += 1
+                delay = min(self.retry_delay_seconds * 2 ** (failures - 1), self.max_dispatch_backoff_seconds)
+                print(f"⚠️ Report dispatcher error, retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _execute(self, row):
+        job_id = row["id"]
+        attempts = row["attempts"] + 1
+        start = time.perf_counter()
+        try:
+            # A bad row must fail or retry the claimed job, not leave it running; the worker creates the directory
+            filepath = self.storage.path_for(row["filename"])
+            payload = json.loads(row["payload"])
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._get_pool(), render_report_job, row["kind"], payload, filepath)
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                self._pool = None
+            if attempts < self.max_attempts:
+                self.retries += 1
+                delay = self.retry_delay_seconds * attempts
+                print(f"⚠️ Report {job_id} failed (attempt {attempts}), retrying in {delay:.1f}s: {e}")
+                await self._call(self._update, job_id, status="pending", attempts=attempts, error=str(e),
+                                 next_attempt_at=time.time() + delay)
+            else:
+                self.failures += 1
+                print(f"❌ Report {job_id} failed after {attempts} attempts: {e}")
+                await self._call(self._update, job_id, status="failed", attempts=attempts, error=str(e),
+                                 completed_at=datetime.now().isoformat())
+            return
+
+        self.rendered += 1
+        self.render_seconds += time.perf_counter() - start
+        await self._call(self._update, job_id, status="ready", attempts=attempts, error=None,
+                                 completed_at=datetime.now().isoformat())
+
+    def _status_counts(self) -> Dict[str, int]:
+        return dict(self._conn.execute("SELECT status, COUNT(*) FROM report_jobs GROUP BY status").fetchall())
+
+    async def get_stats(self) -> Dict:
+        counts = await self._call(self._status_counts)
+        return {
+            "workers": self.max_workers,
+            "in_flight": len(self._running),
+            "jobs": counts,
+            "rendered": self.rendered,
+            "retries": self.retries,
+            "failures": self.failures,
+            "dispatch_errors": self.dispatch_errors,
+            "avg_render_ms": (self.render_seconds / self.rendered * 1000) if self.rendered else 0.0
+        }
+
+# Global job queue instance
+report_jobs = ReportJobQueue(
+    db_path=os.getenv("REPORT_JOBS_DB", "report_jobs.db"),
+    max_workers=int(os.getenv("REPORT_WORKERS", "0")) or None,
+    max_attempts=int(os.getenv("REPORT_MAX_ATTEMPTS", "3")),
+    retry_delay_seconds=float(os.getenv("REPORT_RETRY_DELAY_SECONDS", "2"))
+)
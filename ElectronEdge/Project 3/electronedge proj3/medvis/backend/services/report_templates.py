@@ -0,0 +1,127 @@
+import io
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, Optional
+
+from PIL import Image as PILImage
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer
+
+from services.storage import shard_key, storage_manager
+
+# Embedded upload thumbnails: 3 inch at 200 dpi is plenty for a printed report
+THUMBNAIL_MAX_PX = int(os.getenv("REPORT_THUMBNAIL_PX", "600"))
+THUMBNAIL_QUALITY = int(os.getenv("REPORT_THUMBNAIL_QUALITY", "80"))
+
+DISCLAIMER_HTML = """
+    <b>This report is generated by an AI system and is intended for informational purposes only.
+    It should not be used as a substitute for professional medical advice, diagnosis, or treatment.
+    Always seek the advice of qualified healthcare providers with any questions regarding medical conditions.
+    Never disregard professional medical advice or delay seeking it because of information from this report.</b>
+    """
+
+class PrelaidParagraph(Paragraph):
+    """Paragraph for static report text: markup is parsed once and line breaks are computed once per width"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._layouts = {}
+
+    def wrap(self, availWidth, availHeight):
+        layout = self._layouts.get(availWidth)
+        if layout is None:
+            size = super().wrap(availWidth, availHeight)
+            self._layouts[availWidth] = (size, self.blPara, self._wrapWidths, self.height)
+            return size
+        size, self.blPara, self._wrapWidths, self.height = layout
+        self.width = availWidth
+        return size
+
+@lru_cache(maxsize=1)
+def report_styles():
+    """Sample style sheet plus the report's custom styles, built once per process (styles are read-only)"""
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        spaceAfter=30,
+        textColor=colors.darkblue
+    ))
+    styles.add(ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=14,
+        spaceAfter=12,
+        textColor=colors.darkblue
+    ))
+    return styles
+
+# Flowables keep layout state while a document is built, so each thread gets its own set
+_static = threading.local()
+
+def static_flowables() -> Dict:
+    """Title, headings, disclaimer and spacing shared by every report rendered in this thread"""
+    flowables = getattr(_static, "flowables", None)
+    if flowables is None:
+        styles = report_styles()
+        flowables = {
+            "title": PrelaidParagraph("MEDICAL IMAGE ANALYSIS REPORT", styles['CustomTitle']),
+            "simple_title": PrelaidParagraph("MEDICAL IMAGE ANALYSIS REPORT", styles['Title']),
+            "quick_title": PrelaidParagraph("QUICK ANALYSIS REPORT", styles['Title']),
+            "image_heading": PrelaidParagraph("ANALYZED IMAGE:", styles['CustomHeading']),
+            "diagnosis_heading": PrelaidParagraph("DIAGNOSIS RESULTS:", styles['CustomHeading']),
+            "information_heading": PrelaidParagraph("MEDICAL INFORMATION:", styles['CustomHeading']),
+            "specialists_heading": PrelaidParagraph("SPECIALIST RECOMMENDATIONS:", styles['CustomHeading']),
+            "disclaimer_heading": PrelaidParagraph("IMPORTANT DISCLAIMER:", styles['CustomHeading']),
+            "disclaimer": PrelaidParagraph(DISCLAIMER_HTML, styles['Normal']),
+            "spacer": Spacer(1, 20)
+        }
+        _static.flowables = flowables
+    return flowables
+
+@lru_cache(maxsize=32)
+def _thumbnail_jpeg(image_path: str, mtime_ns: int, max_px: int, quality: int) -> bytes:
+    with PILImage.open(image_path) as image:
+        # draft() lets the JPEG decoder downscale by 1/2..1/8 while decoding
+        image.draft("RGB", (max_px, max_px))
+        image = image.convert("RGB")
+        image.thumbnail((max_px, max_px))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+        return buffer.getvalue()
+
+def _shared_thumbnail_jpeg(image_path: str) -> bytes:
+    """Thumbnail from the shared content store, rendering and storing it next to the upload on first use"""
+    store = storage_manager.content_store
+    filename = f"{shard_key(os.path.basename(image_path))}.thumb{THUMBNAIL_MAX_PX}q{THUMBNAIL_QUALITY}.jpg"
+    path = store.path_for(filename)
+    try:
+        with open(path, "rb") as cached:
+            return cached.read()
+    except FileNotFoundError:
+        pass
+    data = _thumbnail_jpeg(image_path, os.stat(image_path).st_mtime_ns, THUMBNAIL_MAX_PX, THUMBNAIL_QUALITY)
+    store.write_atomic(filename, data)
+    return data
+
+def thumbnail_flowable(image_path: str, width: float, height: float) -> Optional[Image]:
+    """Downscaled JPEG thumbnail of an upload as a ReportLab Image, or None if it can't be read"""
+    try:
+        if storage_manager.content_store is not None:
+            data = _shared_thumbnail_jpeg(image_path)
+        else:
+            data = _thumbnail_jpeg(image_path, os.stat(image_path).st_mtime_ns, THUMBNAIL_MAX_PX, THUMBNAIL_QUALITY)
+    except Exception as e:
+        print(f"Could not create report thumbnail: {e}")
+        return None
+    return Image(io.BytesIO(data), width=width, height=height)
+
+def build_document(filepath: str, story):
+    """Lay out and write a report with compressed page streams"""
+    doc = SimpleDocTemplate(filepath, pagesize=letter, pageCompression=1)
+    doc.build(story)
+    return filepath
@@ -0,0 +1,288 @@
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from services.executor import stage_executor
+
+_DIGEST = re.compile(r"[0-9a-f]{64}")
+TEMP_SUFFIXES = (".part", ".tmp")
+KEEP_FILES = {".gitkeep"}
+
+def shard_key(filename: str) -> str:
+    """The sha256 digest embedded in a content-addressed filename (or a digest of the name itself)"""
+    match = _DIGEST.search(filename)
+    return match.group(0) if match else hashlib.sha256(filename.encode("utf-8")).hexdigest()
+
+class StorageArea:
+    """A directory of content-addressed files, sharded by hash prefix, with retention limits
+
+    Files live at ``root/ab/cd/<name>``, where ``abcd`` is the start of the
+    digest in the name. No directory ever holds more than a few hundred
+    entries, which keeps static-file lookups and directory scans fast.
+
+    ``compact()`` enforces retention:
+    - Legacy flat files are moved into their shards.
+    - Abandoned temp files are removed.
+    - Files older than ``max_age_seconds`` are deleted.
+    - The oldest files are evicted until the area fits in ``max_bytes``.
+    - Empty shard directories are removed.
+
+    Files younger than ``min_age_seconds`` are never deleted, so an upload
+    can't vanish while a queued report still needs it. A limit of 0 means
+    no limit.
+    """
+
+    def __init__(self, name: str, root: str, url_prefix: str, max_age_seconds: float = 0,
+                 max_bytes: int = 0, min_age_seconds: float = 3600, shard_levels: int = 2):
+        self.name = name
+        self.root = root
+        self.url_prefix = url_prefix.rstrip("/")
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self.min_age_seconds = min_age_seconds
+        self.shard_levels = shard_levels
+
+        self.files = 0
+        self.bytes = 0
+        self.last_compaction = None
+
+    def shard_dir(self, filename: str) -> str:
+        key = shard_key(filename)
+        parts = [key[i * 2:i * 2 + 2] for i in range(self.shard_levels)]
+        return os.path.join(*parts) if parts else ""
+
+    def path_for(self, filename: str) -> str:
+        return os.path.join(self.root, self.shard_dir(filename), filename)
+
+    def url_for(self, filename: str) -> str:
+        return f"{self.url_prefix}/{self.shard_dir(filename).replace(os.sep, '/')}/{filename}"
+
+    def prepare(self, filename: str) -> str:
+        """Path for a file about to be written, with its shard directory created"""
+        path = self.path_for(filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def write_atomic(self, filename: str, data: bytes) -> str:
+        """Write once under ``filename``; existing content is kept and its age refreshed"""
+        path = self.prepare(filename)
+        if os.path.exists(path):
+            os.utime(path)
+            return path
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as buffer:
+                buffer.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    def _migrate_flat_files(self) -> int:
+        """Move files written before sharding (directly under root) into their shards"""
+        migrated = 0
+        if not os.path.isdir(self.root):
+            return migrated
+        for entry in os.scandir(self.root):
+            if entry.is_file() and entry.name not in KEEP_FILES and not entry.name.endswith(TEMP_SUFFIXES):
+                os.replace(entry.path, self.prepare(entry.name))
+                migrated += 1
+        return migrated
+
+    def _scan(self) -> List:
+        files = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename in KEEP_FILES:
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _remove_empty_dirs(self) -> int:
+        removed = 0
+        # dirnames is listed before the walk removes its children, so only files are checked
+        for dirpath, _, filenames in os.walk(self.root, topdown=False):
+            if dirpath != self.root and not filenames:
+                try:
+                    os.rmdir(dirpath)
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def compact(self) -> Dict:
+        """Apply retention to this area (blocking; run it on the io stage)"""
+        start = time.perf_counter()
+        now = time.time()
+        result = {"migrated": self._migrate_flat_files(), "temp_removed": 0, "expired": 0,
+                  "evicted": 0, "freed_bytes": 0}
+
+        kept = []
+        for mtime, size, path in self._scan():
+            age = now - mtime
+            deletable = age >= self.min_age_seconds
+            if deletable and path.endswith(TEMP_SUFFIXES):
+                result["temp_removed"] += 1
+            elif deletable and self.max_age_seconds and age > self.max_age_seconds:
+                result["expired"] += 1
+            else:
+                kept.append((mtime, size, path))
+                continue
+            self._remove(path, size, result)
+
+        files = len(kept)
+        total = sum(size for _, size, _ in kept)
+        if self.max_bytes and total > self.max_bytes:
+            # Oldest first; recently written files are protected by min_age_seconds
+            for mtime, size, path in sorted(kept):
+                if total <= self.max_bytes:
+                    break
+                if now - mtime < self.min_age_seconds:
+                    continue
+                if self._remove(path, size, result):
+                    result["evicted"] += 1
+                    files -= 1
+                    total -= size
+
+        result["empty_dirs_removed"] = self._remove_empty_dirs()
+        self.files = files
+        self.bytes = total
+        result["duration_ms"] = (time.perf_counter() - start) * 1000
+        result["completed_at"] = datetime.now().isoformat()
+        self.last_compaction = result
+        return result
+
+    def _remove(self, path: str, size: int, result: Dict) -> bool:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        result["freed_bytes"] += size
+        return True
+
+    def get_stats(self) -> Dict:
+        return {
+            "root": self.root,
+            "files": self.files,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "max_age_seconds": self.max_age_seconds,
+            "last_compaction": self.last_compaction
+        }
+
+class StorageManager:
+    """Owns the static storage areas and compacts them periodically in the background
+
+    With ``dedup`` enabled, uploads and the images embedded in reports share
+    one content-addressed area (``static/cas``): an upload is stored once,
+    and its report thumbnail is stored next to it and rendered only once
+    across all report workers.
+    """
+
+    def __init__(self, uploads: StorageArea, reports: StorageArea, dedup: bool = False,
+                 compaction_interval_seconds: float = 3600):
+        self.uploads = uploads
+        self.reports = reports
+        self.dedup = dedup
+        self.compaction_interval_seconds = compaction_interval_seconds
+        self._task = None
+        self._lock = None
+        self.compactions = 0
+
+    @property
+    def areas(self) -> Dict[str, StorageArea]:
+        return {area.name: area for area in (self.uploads, self.reports)}
+
+    @property
+    def content_store(self) -> Optional[StorageArea]:
+        """Shared content-addressed area for report images, or None when dedup is off"""
+        return self.uploads if self.dedup else None
+
+    def compact_all(self) -> Dict:
+        results = {}
+        for name, area in self.areas.items():
+            try:
+                results[name] = area.compact()
+            except Exception as e:
+                print(f"⚠️ Storage compaction failed for {name}: {e}")
+                results[name] = {"error": str(e)}
+        self.compactions += 1
+        return results
+
+    async def compact_now(self) -> Dict:
+        """Run one compaction pass on the io stage (serialised with the background task)"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            results = await stage_executor.run("io", self.compact_all)
+        freed = sum(result.get("freed_bytes", 0) for result in results.values())
+        print(f"🧹 Storage compaction freed {freed / 1024 / 1024:.1f} MB")
+        return results
+
+    async def _compaction_loop(self):
+        while True:
+            try:
+                await self.compact_now()
+            except Exception as e:
+                print(f"⚠️ Storage compaction error: {e}")
+            await asyncio.sleep(self.compaction_interval_seconds)
+
+    def start(self):
+        if self._task is None and self.compaction_interval_seconds > 0:
+            self._task = asyncio.get_running_loop().create_task(self._compaction_loop())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def get_stats(self) -> Dict:
+        return {
+            "dedup": self.dedup,
+            "compaction_interval_seconds": self.compaction_interval_seconds,
+            "compactions": self.compactions,
+            "areas": {name: area.get_stats() for name, area in self.areas.items()}
+        }
+
+def _env_days(name: str, default: str) -> float:
+    return float(os.getenv(name, default)) * 86400
+
+def _env_mb(name: str, default: str) -> int:
+    return int(float(os.getenv(name, default)) * 1024 * 1024)
+
+_dedup = os.getenv("STORAGE_DEDUP", "false").lower() in ("1", "true", "yes")
+_min_age = float(os.getenv("STORAGE_MIN_AGE_SECONDS", "3600"))
+
+# Global storage manager instance
+storage_manager = StorageManager(
+    uploads=StorageArea(
+        "uploads",
+        root="static/cas" if _dedup else "static/uploads",
+        url_prefix="/static/cas" if _dedup else "/static/uploads",
+        max_age_seconds=_env_days("STORAGE_UPLOADS_MAX_AGE_DAYS", "7"),
+        max_bytes=_env_mb("STORAGE_UPLOADS_MAX_MB", "2048"),
+        min_age_seconds=_min_age
+    ),
+    reports=StorageArea(
+        "reports",
+        root="static/reports",
+        url_prefix="/static/reports",
+        max_age_seconds=_env_days("STORAGE_REPORTS_MAX_AGE_DAYS", "30"),
+        max_bytes=_env_mb("STORAGE_REPORTS_MAX_MB", "2048"),
+        min_age_seconds=_min_age
+    ),
+    dedup=_dedup,
+    compaction_interval_seconds=float(os.getenv("STORAGE_COMPACTION_INTERVAL_SECONDS", "3600"))
+)
@@ -0,0 +1,63 @@
+import asyncio
+import hashlib
+import os
+from typing import Optional
+
+from services.executor import stage_executor
+from services.storage import StorageArea, storage_manager
+
+VALID_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
+
+def content_filename(content, original_filename: str = None) -> str:
+    """Content-addressed filename: sha256 of the bytes plus the original extension"""
+    digest = hashlib.sha256(content).hexdigest()
+    ext = os.path.splitext(original_filename or "")[1].lower()
+    if ext not in VALID_EXTENSIONS:
+        ext = ".jpg"
+    return f"{digest}{ext}"
+
+class UploadStore:
+    """Optional, asynchronous persistence of original uploads
+
+    Analysis runs directly on the in-memory bytes; writing the original to
+    disk happens in the background under a content-addressed name, so
+    identical uploads share one file and concurrent uploads that happen to
+    have the same client filename can no longer overwrite each other. Files
+    go to the storage manager's uploads area (sharded, with retention).
+    """
+
+    def __init__(self, area: StorageArea, persist: bool = True):
+        self.area = area
+        self.persist = persist
+        self._pending = set()
+
+    def save(self, content, original_filename: str = None) -> str:
+        """Write the upload atomically; identical content is only written once"""
+        return self.area.write_atomic(content_filename(content, original_filename), content)
+
+    def persist_in_background(self, content, original_filename: str = None) -> Optional[asyncio.Task]:
+        """Schedule the write on the io stage; returns the task, or None when persistence is disabled"""
+        if not self.persist:
+            return None
+
+        async def _persist():
+            try:
+                return await stage_executor.run("io", self.save, content, original_filename)
+            except Exception as e:
+                print(f"⚠️ Could not persist upload {original_filename}: {e}")
+                return None
+
+        task = asyncio.get_running_loop().create_task(_persist())
+        # Keep a reference so the task isn't garbage collected mid-write
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return task
+
+    def get_stats(self):
+        return {"persist": self.persist, "pending_writes": len(self._pending)}
+
+# Global upload store instance
+upload_store = UploadStore(
+    area=storage_manager.uploads,
+    persist=os.getenv("PERSIST_UPLOADS", "true").lower() in ("1", "true", "yes")
+)
@@ -0,0 +1,78 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict
+
+WARMUP_MODES = ("background", "blocking", "off")
+
+class StartupWarmup:
+    """Startup warm-up steps and the readiness state behind ``GET /ready``
+
+    Heavy singletons (the analyzer, its model) are built on first use, so
+    importing the app is fast. Warm-up builds them and runs a dummy batch
+    before real traffic arrives. The mode controls when that happens:
+
+        background - the server starts at once; /ready is 503 until warm-up ends
+        blocking   - startup waits for warm-up, so the first request is never cold
+        off        - nothing runs at startup; the first request pays instead
+
+    A failed step is logged and reported, but the app still becomes ready:
+    every singleton is rebuilt on demand and predictions have a fallback.
+    """
+
+    def __init__(self, mode: str = "background"):
+        if mode not in WARMUP_MODES:
+            raise ValueError(f"Unknown warm-up mode {mode!r}, expected one of {WARMUP_MODES}")
+        self.mode = mode
+        self.status = "pending"
+        self.error = None
+        self.timings_ms = {}
+        self._steps = []
+        self._task = None
+        self._started_at = time.perf_counter()
+
+    def add(self, name: str, fn: Callable[[], Awaitable]):
+        self._steps.append((name, fn))
+        return self
+
+    async def _run(self):
+        self.status = "warming"
+        for name, fn in self._steps:
+            start = time.perf_counter()
+            try:
+                await fn()
+            except Exception as e:
+                self.status = "failed"
+                self.error = f"{name}: {e}"
+                print(f"⚠️ Warm-up step {name} failed: {e}")
+                return
+            finally:
+                self.timings_ms[name] = (time.perf_counter() - start) * 1000
+        self.status = "ready"
+        print(f"🔥 Warm-up complete in {sum(self.timings_ms.values()):.0f} ms: "
+              + ", ".join(f"{name} {ms:.0f} ms" for name, ms in self.timings_ms.items()))
+
+    async def start(self):
+        if self.mode == "off":
+            self.status = "skipped"
+        elif self.mode == "blocking":
+            await self._run()
+        else:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    @property
+    def ready(self) -> bool:
+        return self.status in ("ready", "skipped", "failed")
+
+    def get_stats(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "mode": self.mode,
+            "status": self.status,
+            "error": self.error,
+            "steps_ms": self.timings_ms,
+            "uptime_seconds": time.perf_counter() - self._started_at
+        }
@@ -1,32 +1,40 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Depends
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 import os
-import torch
-import torch.nn as nn
-import torch.nn.functional as F
-from PIL import Image
-import torchvision.transforms as transforms
+import asyncio
+import time
 import numpy as np
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
 from datetime import datetime, timedelta
 import json
 import jwt
 from pydantic import BaseModel
+from typing import List, Optional
+from functools import lru_cache
 
 # Load environment variables FIRST
 load_dotenv()
 
 # Import database and services
-from database import user_db
-from services.llm_notes import generate_disease_explanation
+from database import async_user_db, HashingOverloaded, encode_cursor, decode_cursor
+from services.llm_client import llm_client
+from services.explanation_cache import explanation_cache, warm_confidences_from_env
 from services.specialist import find_specialists
-from ml.keras_model import keras_analyzer
+from services.batching import create_batcher_from_env
+from services.executor import stage_executor
+from services.uploads import upload_store
+from services.prediction_cache import prediction_cache
+from services.pipeline import TaskGraph, bounded_as_completed
+from services.report_jobs import report_jobs
+from services.storage import storage_manager
+from services.auth_tokens import TokenVerifier
+from services.batch_uploads import BatchUpload, is_zip_upload
+from services.warmup import StartupWarmup
+import ml.keras_model as keras_model
+from ml.image_context import ImageContext
 
 app = FastAPI(title="Medical Image Analysis API")
 
@@ -35,8 +43,28 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Batch prediction: images per request and images in flight per request
+BATCH_MAX_IMAGES = int(os.getenv("BATCH_MAX_IMAGES", "500"))
+BATCH_WINDOW = int(os.getenv("BATCH_WINDOW", "16"))
+
+# Admin user listing
+USERS_MAX_PAGE_SIZE = 1000
+USERS_STREAM_PAGE_SIZE = int(os.getenv("USERS_STREAM_PAGE_SIZE", "500"))
+
+# Accounts allowed on /admin/storage routes; empty keeps them disabled
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+
 security = HTTPBearer()
 
+# Verified-token cache and revocation index (logout, account deletion)
+token_verifier = TokenVerifier(
+    SECRET_KEY,
+    ALGORITHM,
+    max_token_age_seconds=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    max_entries=int(os.getenv("TOKEN_CACHE_SIZE", "10000")),
+    db_path=os.getenv("TOKEN_REVOCATIONS_DB", "token_revocations.db")
+)
+
 # Pydantic models for authentication
 class UserSignUp(BaseModel):
     full_name: str
@@ -103,63 +131,92 @@ async def get_logo_png():
 async def get_logo():
     return FileResponse("../frontend/logo.png", media_type="image/png")
 
-# Simple mock model (kept as fallback)
-class SimpleMockModel(nn.Module):
-    def __init__(self):
-        super(SimpleMockModel, self).__init__()
-        self.classifier = nn.Linear(224*224*3, 2)
-    
-    def forward(self, x):
-        x = x.view(x.size(0), -1)
-        return self.classifier(x)
+# Simple mock model (kept as fallback), built on first use so torch isn't imported at startup
+@lru_cache(maxsize=1)
+def get_fallback_model():
+    """(model, device) for the torch fallback model"""
+    import torch
+    from ml.mock_model import SimpleMockModel
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    return SimpleMockModel().to(device), device
+
+# Image preprocessing for the fallback model
+@lru_cache(maxsize=1)
+def get_transform():
+    import torchvision.transforms as transforms
+    return transforms.Compose([
+        transforms.Resize((224, 224)),
+        transforms.ToTensor(),
+    ])
+
+def predict_keras_batch(images):
+    # Resolved per batch: the analyzer is built on first use (or by the startup warm-up)
+    return keras_model.keras_analyzer.predict_batch(images)
+
+# Micro-batching queue in front of the Keras analyzer
+prediction_batcher = create_batcher_from_env(
+    predict_keras_batch, name="keras_predict", executor=stage_executor
+)
+
+async def get_analyzer():
+    """The Keras analyzer, built off the event loop if warm-up hasn't built it yet"""
+    analyzer = vars(keras_model).get("keras_analyzer")
+    if analyzer is None:
+        analyzer = await stage_executor.run("inference", keras_model.get_keras_analyzer)
+    return analyzer
 
-# Global model instance (fallback)
-fallback_model = SimpleMockModel()
-device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-fallback_model.to(device)
+def warm_up_model():
+    """Build the analyzer and push one full dummy batch through it (bypasses the prediction cache)"""
+    analyzer = keras_model.get_keras_analyzer()
+    dummy = np.random.RandomState(0).randint(0, 256, size=(224, 224, 3), dtype=np.uint8)
+    analyzer.predict_batch([ImageContext(dummy.copy(), source=f"warmup_{i}")
+                            for i in range(prediction_batcher.max_batch_size)])
 
-# Image preprocessing
-transform = transforms.Compose([
-    transforms.Resize((224, 224)),
-    transforms.ToTensor(),
-])
+startup_warmup = StartupWarmup(mode=os.getenv("STARTUP_WARMUP", "background").lower())
+startup_warmup.add("model", lambda: stage_executor.run("inference", warm_up_model))
 
 # Disease names - Updated for 3-class classification
 disease_names = {0: "Eczema", 1: "Melanocytic Nevi", 2: "Melanoma"}
 
+# Background explanation cache warm-up, started on startup
+explanation_warmup_task = None
+
 # Authentication helper functions
 def create_access_token(data: dict, expires_delta: timedelta = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return token_verifier.issue(data["sub"], expires_delta)
+
+async def verify_token_claims(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Claims of the bearer token; cached after the first verification, revocations always checked"""
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-        return email
+        return token_verifier.verify(credentials.credentials)
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
 
+async def verify_token(claims: dict = Depends(verify_token_claims)):
+    return claims["sub"]
+
+async def verify_admin(current_user: str = Depends(verify_token)):
+    """Token subject, if it is listed in ADMIN_EMAILS"""
+    if current_user.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+def decode_upload(content, filename):
+    """Decode upload bytes into a shared ImageContext and precompute its cache key"""
+    image_context = ImageContext.from_bytes(content, source=filename)
+    image_context.pixel_hash
+    return image_context
+
 def validate_image_simple(file):
     """Simple image validation"""
     valid_types = ['image/jpeg', 'image/jpg', 'image/png', 'image/bmp', 'image/webp']
     return file.content_type in valid_types and file.size <= 10 * 1024 * 1024
 
-def get_disease_explanation(disease_name, confidence):
+async def get_disease_explanation(disease_name, confidence):
     """Get disease explanation using LLM service with fallback"""
     try:
-        # Use the LLM service for dynamic explanations
-        explanation = generate_disease_explanation(disease_name, confidence)
-        print(f"✅ Generated explanation for {disease_name} using LLM service")
-        return explanation
+        # Cached per (disease, confidence bucket, provider, prompt version); misses use the hedged LLM client
+        return await explanation_cache.get(disease_name, confidence)
     except Exception as e:
         print(f"⚠️ LLM service error, using fallback: {e}")
         # Fallback to static explanations if LLM fails
@@ -367,42 +424,53 @@ def get_mock_specialists(disease, location=None):
         ]
         return specialists
 
-def generate_simple_pdf(prediction, explanation, specialists, image_path):
-    """Generate simple PDF report"""
-    os.makedirs("static/reports", exist_ok=True)
-    
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"medical_report_{timestamp}.pdf"
-    filepath = f"static/reports/{filename}"
+def enhanced_mock_prediction(image_context, filename):
+    """Enhanced mock prediction with basic image analysis (used when Keras ML fails)"""
+    image_array = image_context.rgb
     
-    doc = SimpleDocTemplate(filepath, pagesize=letter)
-    styles = getSampleStyleSheet()
-    story = []
+    # Basic color analysis for better mock predictions
+    red_channel = np.mean(image_array[:,:,0])
+    green_channel = np.mean(image_array[:,:,1])
+    blue_channel = np.mean(image_array[:,:,2])
     
-    # Title
-    story.append(Paragraph("MEDICAL IMAGE ANALYSIS REPORT", styles['Title']))
+    # Redness ratio (eczema tends to be redder)
+    redness_ratio = red_channel / (green_channel + blue_channel + 1e-6)
     
-    # Content
-    content = f"""
-    <b>Report Generated:</b> {datetime.now().strftime("%B %d, %Y at %I:%M %p")}<br/>
-    <b>Detected Condition:</b> {prediction['disease']}<br/>
-    <b>Confidence Level:</b> {prediction['confidence']:.1%}<br/>
-    <b>Analysis Method:</b> AI-Powered Image Classification<br/><br/>
+    # Determine prediction based on image characteristics for 3 classes
+    if redness_ratio > 1.2:  # High red = likely eczema
+        mock_probs = np.array([0.7, 0.2, 0.1])
+    elif redness_ratio < 0.8:  # Low red = possibly melanoma or nevi
+        mock_probs = np.array([0.1, 0.4, 0.5])
+    else:  # Moderate = could be any
+        mock_probs = np.array([0.4, 0.4, 0.2])
     
-    <b>Medical Information:</b><br/>
-    {explanation['description']}<br/><br/>
+    # Add some randomness but keep it realistic
+    # (local generator: reseeding the global NumPy state is not thread-safe)
+    noise = np.random.RandomState(hash(filename) % 2**32).normal(0, 0.08, 3)
+    mock_probs = mock_probs + noise
+    mock_probs = np.abs(mock_probs)  # Ensure positive
+    mock_probs = mock_probs / np.sum(mock_probs)  # Normalize
     
-    <b>Recommended Next Steps:</b><br/>
-    {explanation['next_steps']}<br/><br/>
-    
-    <b>IMPORTANT DISCLAIMER:</b><br/>
-    {explanation['disclaimer']}
-    """
+    predicted_class = np.argmax(mock_probs)
+    confidence = np.max(mock_probs)
     
-    story.append(Paragraph(content, styles['Normal']))
-    doc.build(story)
+    # Ensure reasonable confidence range
+    confidence = max(0.6, min(0.9, confidence))
     
-    return filepath
+    return {
+        "disease": disease_names[predicted_class],
+        "confidence": float(confidence),
+        "probabilities": {
+            "Eczema": float(mock_probs[0]),
+            "Melanocytic Nevi": float(mock_probs[1]),
+            "Melanoma": float(mock_probs[2])
+        },
+        "model_type": "enhanced_mock",
+        "color_analysis": {
+            "red_mean": float(red_channel),
+            "redness_ratio": float(redness_ratio)
+        }
+    }
 
 @app.on_event("startup")
 async def startup_event():
@@ -410,13 +478,46 @@ async def startup_event():
     print("🏥 Starting Medical Image Analysis API...")
     print("🧠 Trained Keras model for Eczema, Melanocytic Nevi, and Melanoma")
     print("🔍 Image analysis capabilities: color, texture, shape detection")
-    print("🚀 API server ready!")
+    print(f"🧵 Blocking stages run in a pool of {stage_executor.max_workers} workers: {stage_executor.stage_limits}")
+    if os.getenv("INFERENCE_BACKEND"):
+        print("⚠️ INFERENCE_BACKEND is ignored by the API, which always serves the Keras analyzer "
+              "(it applies to services/predictor.py and ml/real_model.py)")
+    
+    # Pre-generate explanations for every class in the background so first requests hit the cache
+    global explanation_warmup_task
+    explanation_warmup_task = asyncio.create_task(
+        explanation_cache.warm(disease_names.values(), warm_confidences_from_env())
+    )
+    await report_jobs.start()
+    storage_manager.start()
+    await startup_warmup.start()
+    print("🚀 API server ready!" if startup_warmup.ready else "🚀 API server started, warming up (see /ready)")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release worker threads and pooled connections on shutdown"""
+    if explanation_warmup_task is not None and not explanation_warmup_task.done():
+        explanation_warmup_task.cancel()
+    startup_warmup.stop()
+    await llm_client.aclose()
+    await report_jobs.stop()
+    storage_manager.stop()
+    stage_executor.shutdown(wait=False)
+    async_user_db.shutdown()
 
 @app.get("/")
 async def root():
     """Serve the frontend interface"""
     return FileResponse("../frontend/index.html")
 
+def raise_overloaded(error: HashingOverloaded):
+    """Shed an auth request while password hashing is saturated"""
+    raise HTTPException(
+        status_code=429,
+        detail="Too many sign-in attempts right now, please try again shortly",
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
 # Authentication endpoints
 @app.post("/auth/signup", response_model=Token)
 async def sign_up(user: UserSignUp):
@@ -432,12 +533,15 @@ async def sign_up(user: UserSignUp):
     if "@" not in user.email or "." not in user.email:
         raise HTTPException(status_code=400, detail="Please enter a valid email address")
     
-    success, message = user_db.create_user(
-        full_name=user.full_name,
-        city=user.city,
-        email=user.email,
-        password=user.password
-    )
+    try:
+        success, message = await async_user_db.create_user(
+            full_name=user.full_name,
+            city=user.city,
+            email=user.email,
+            password=user.password
+        )
+    except HashingOverloaded as e:
+        raise_overloaded(e)
     
     if not success:
         raise HTTPException(status_code=400, detail=message)
@@ -451,7 +555,10 @@ async def sign_up(user: UserSignUp):
 @app.post("/auth/signin", response_model=Token)
 async def sign_in(user: UserSignIn):
     """User login endpoint"""
-    success, message = user_db.verify_user(user.email, user.password)
+    try:
+        success, message = await async_user_db.verify_user(user.email, user.password)
+    except HashingOverloaded as e:
+        raise_overloaded(e)
     
     if not success:
         raise HTTPException(status_code=401, detail=message)
@@ -465,17 +572,93 @@ async def sign_in(user: UserSignIn):
 @app.get("/auth/me")
 async def get_current_user(current_user: str = Depends(verify_token)):
     """Get current user information"""
-    user_data = user_db.get_user(current_user)
+    user_data = await async_user_db.get_user(current_user)
     if not user_data:
         raise HTTPException(status_code=404, detail="User not found")
     
     return user_data
 
+@app.post("/auth/logout")
+async def logout(claims: dict = Depends(verify_token_claims)):
+    """Revoke the token used for this request"""
+    await stage_executor.run("io", token_verifier.revoke_token, claims)
+    return {"message": "Logged out"}
+
+@app.delete("/auth/me")
+async def delete_current_user(current_user: str = Depends(verify_token)):
+    """Delete the signed-in user's account and revoke all of their tokens"""
+    # Revoke first so no request can still authenticate as a deleted user
+    await stage_executor.run("io", token_verifier.revoke_subject, current_user)
+    success, message = await async_user_db.delete_user(current_user)
+    if not success:
+        raise HTTPException(status_code=404, detail=message)
+    return {"message": message}
+
+def parse_user_date(value: Optional[str], name: str) -> Optional[str]:
+    """ISO date or datetime query parameter in the users table's timestamp format"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}, expected an ISO date such as 2024-01-31")
+
 @app.get("/auth/users")
-async def get_all_users(current_user: str = Depends(verify_token)):
-    """Get all users (admin endpoint)"""
-    users = user_db.get_all_users()
-    return {"users": users, "total": len(users)}
+async def get_all_users(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    city: Optional[str] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    current_user: str = Depends(verify_token)
+):
+    """List users newest first, optionally filtered by city and signup date (admin endpoint)
+    
+    With ``limit``, returns one page as ``{"users": [...], "count": n,
+    "next_cursor": ...}``; pass ``next_cursor`` back as ``cursor`` for the
+    next page. Without it, every matching user is streamed as
+    ``{"users": [...], "total": n}``, one database page at a time.
+    ``created_from`` is inclusive and ``created_to`` exclusive.
+    """
+    filters = {
+        "city": city,
+        "created_from": parse_user_date(created_from, "created_from"),
+        "created_to": parse_user_date(created_to, "created_to")
+    }
+    
+    if limit is not None:
+        if not 1 <= limit <= USERS_MAX_PAGE_SIZE:
+            raise HTTPException(status_code=400, detail=f"limit must be between 1 and {USERS_MAX_PAGE_SIZE}")
+        try:
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        users, next_after = await async_user_db.list_users(limit, after, **filters)
+        return {
+            "users": users,
+            "count": len(users),
+            "next_cursor": encode_cursor(next_after) if next_after else None
+        }
+    
+    async def stream_users():
+        total = 0
+        yield '{"users": ['
+        async for user in async_user_db.iter_users(USERS_STREAM_PAGE_SIZE, **filters):
+            yield ("," if total else "") + json.dumps(user)
+            total += 1
+        yield f'], "total": {total}}}'
+    
+    return StreamingResponse(stream_users(), media_type="application/json")
+
+@app.get("/admin/storage")
+async def get_storage_status(current_user: str = Depends(verify_admin)):
+    """Storage usage, retention limits and last compaction per area (admin endpoint)"""
+    return storage_manager.get_stats()
+
+@app.post("/admin/storage/compact")
+async def compact_storage(current_user: str = Depends(verify_admin)):
+    """Apply storage retention now instead of waiting for the background task (admin endpoint)"""
+    return await storage_manager.compact_now()
 
 @app.get("/health")
 async def health_check():
@@ -494,6 +677,71 @@ async def health_check():
         "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the startup warm-up has finished (unlike /health, which is liveness)"""
+    stats = startup_warmup.get_stats()
+    return JSONResponse(stats, status_code=200 if startup_warmup.ready else 503)
+
+@app.get("/metrics")
+async def metrics():
+    """Runtime metrics for tuning throughput against latency"""
+    return {
+        "batching": prediction_batcher.get_stats(),
+        "executor": stage_executor.get_stats(),
+        "prediction_cache": prediction_cache.get_stats(),
+        "llm": llm_client.get_stats(),
+        "database": async_user_db.get_stats(),
+        "tokens": token_verifier.get_stats(),
+        "warmup": startup_warmup.get_stats(),
+        "explanation_cache": explanation_cache.get_stats(),
+        "uploads": upload_store.get_stats(),
+        "reports": {**(await report_jobs.get_stats()), "background_stages": TaskGraph.background_count()},
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/reports/{report_id}")
+async def get_report_status(report_id: str):
+    """Poll a background report: waiting, pending, running, ready (with download_url) or failed"""
+    status = await report_jobs.status(report_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return status
+
+async def predict_image(image_context, filename):
+    """Disease prediction for a decoded upload: cache, then the batched Keras model, then the feature-based fallback"""
+    # Use real ML analysis
+    print(f"🔍 Analyzing image: {filename}")
+    
+    try:
+        # Real ML prediction using trained Keras model (identical pixels hit the cache)
+        pixel_hash = image_context.pixel_hash
+        model_version = (await get_analyzer()).model_version
+        ml_result = await prediction_cache.get(pixel_hash, model_version)
+        if ml_result is None:
+            ml_result = await prediction_batcher.submit(image_context)
+            await prediction_cache.put(pixel_hash, model_version, ml_result)
+        else:
+            print(f"⚡ Prediction cache hit for {filename}")
+        
+        prediction_result = {
+            "disease": disease_names[ml_result['predicted_class']],
+            "confidence": ml_result['confidence'],
+            "probabilities": ml_result['probabilities'],
+            "model_type": ml_result['model_type'],
+            "features": ml_result['features'],
+            "feature_insights": ml_result['feature_insights']
+        }
+        
+        print(f"✅ Keras ML analysis complete: {prediction_result['disease']} ({prediction_result['confidence']:.2%})")
+        return prediction_result
+        
+    except Exception as ml_error:
+        print(f"⚠️ Keras ML failed, using enhanced mock: {ml_error}")
+        
+        # Enhanced mock prediction with basic image analysis
+        return await stage_executor.run("analysis", enhanced_mock_prediction, image_context, filename)
+
 @app.post("/predict")
 async def predict_disease(file: UploadFile = File(...), location: str = None):
     """Analyze medical image and return diagnosis"""
@@ -502,94 +750,52 @@ async def predict_disease(file: UploadFile = File(...), location: str = None):
     if not validate_image_simple(file):
         raise HTTPException(status_code=400, detail="Invalid image format or size")
     
-    # Save uploaded file
-    upload_path = f"static/uploads/{file.filename}"
-    os.makedirs("static/uploads", exist_ok=True)
-    
-    with open(upload_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+    content = await file.read()
     
+    # Decode the upload once (zero-copy view of the bytes); every analyzer and fallback shares this context
     try:
-        # Use real ML analysis
-        print(f"🔍 Analyzing image: {file.filename}")
-        
-        try:
-            # Real ML prediction using trained Keras model
-            ml_result = keras_analyzer.predict_with_features(upload_path)
-            
-            prediction_result = {
-                "disease": disease_names[ml_result['predicted_class']],
-                "confidence": ml_result['confidence'],
-                "probabilities": ml_result['probabilities'],
-                "model_type": ml_result['model_type'],
-                "features": ml_result['features'],
-                "feature_insights": ml_result['feature_insights']
-            }
-            
-            print(f"✅ Keras ML analysis complete: {prediction_result['disease']} ({prediction_result['confidence']:.2%})")
-            
-        except Exception as ml_error:
-            print(f"⚠️ Keras ML failed, using enhanced mock: {ml_error}")
-            
-            # Enhanced mock prediction with basic image analysis
-            image = Image.open(upload_path).convert('RGB')
-            image_array = np.array(image)
-            
-            # Basic color analysis for better mock predictions
-            red_channel = np.mean(image_array[:,:,0])
-            green_channel = np.mean(image_array[:,:,1])
-            blue_channel = np.mean(image_array[:,:,2])
-            
-            # Redness ratio (eczema tends to be redder)
-            redness_ratio = red_channel / (green_channel + blue_channel + 1e-6)
-            
-            # Determine prediction based on image characteristics for 3 classes
-            if redness_ratio > 1.2:  # High red = likely eczema
-                mock_probs = np.array([0.7, 0.2, 0.1])
-            elif redness_ratio < 0.8:  # Low red = possibly melanoma or nevi
-                mock_probs = np.array([0.1, 0.4, 0.5])
-            else:  # Moderate = could be any
-                mock_probs = np.array([0.4, 0.4, 0.2])
-            
-            # Add some randomness but keep it realistic
-            np.random.seed(hash(file.filename) % 2**32)
-            noise = np.random.normal(0, 0.08, 3)
-            mock_probs = mock_probs + noise
-            mock_probs = np.abs(mock_probs)  # Ensure positive
-            mock_probs = mock_probs / np.sum(mock_probs)  # Normalize
-            
-            predicted_class = np.argmax(mock_probs)
-            confidence = np.max(mock_probs)
-            
-            # Ensure reasonable confidence range
-            confidence = max(0.6, min(0.9, confidence))
-            
-            prediction_result = {
-                "disease": disease_names[predicted_class],
-                "confidence": float(confidence),
-                "probabilities": {
-                    "Eczema": float(mock_probs[0]),
-                    "Melanocytic Nevi": float(mock_probs[1]),
-                    "Melanoma": float(mock_probs[2])
-                },
-                "model_type": "enhanced_mock",
-                "color_analysis": {
-                    "red_mean": float(red_channel),
-                    "redness_ratio": float(redness_ratio)
-                }
-            }
-        
-        # Generate explanation
-        explanation = get_disease_explanation(prediction_result['disease'], prediction_result['confidence'])
-        
+        image_context = await stage_executor.run("analysis", decode_upload, memoryview(content), file.filename)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Could not decode image")
+    
+    # Analysis runs on the in-memory bytes; persisting the original is optional and asynchronous,
+    # and only happens for uploads that decoded
+    persist_task = upload_store.persist_in_background(content, file.filename)
+    
+    async def run_prediction():
+        return await predict_image(image_context, file.filename)
+    
+    async def run_explanation(prediction):
+        return await get_disease_explanation(prediction['disease'], prediction['confidence'])
+    
+    async def run_specialists(prediction):
         # Find specialists if location provided
-        specialists = []
-        if location:
-            specialists = get_mock_specialists(prediction_result['disease'], location)
+        return get_mock_specialists(prediction['disease'], location) if location else []
+    
+    async def run_upload():
+        return (await asyncio.shield(persist_task)) if persist_task is not None else None
+    
+    async def run_report(prediction, explanation, specialists, upload_path):
+        await report_jobs.submit(report_id, prediction, explanation, specialists, upload_path)
+    
+    # Explanation and specialists run concurrently once the prediction is in; the
+    # PDF is queued for the report worker pool and polled through GET /reports/{id}
+    graph = TaskGraph("predict")
+    graph.add("prediction", run_prediction)
+    graph.add("explanation", run_explanation, deps=["prediction"])
+    graph.add("specialists", run_specialists, deps=["prediction"])
+    graph.add("upload_path", run_upload)
+    graph.add("report", run_report, deps=["prediction", "explanation", "specialists", "upload_path"], background=True)
+    
+    try:
+        report_id = await report_jobs.reserve("simple")
+        graph.start()
+        report_jobs.abandon_on_failure(report_id, graph.task("report"))
         
-        # Generate PDF report
-        report_path = generate_simple_pdf(prediction_result, explanation, specialists, upload_path)
+        results = await graph.gather("prediction", "explanation", "specialists")
+        prediction_result = results["prediction"]
+        explanation = results["explanation"]
+        specialists = results["specialists"]
         
         # Format response to match frontend expectations
         return {
@@ -632,13 +838,80 @@ async def predict_disease(file: UploadFile = File(...), location: str = None):
             "probabilities": prediction_result['probabilities'],
             "explanation": explanation,
             "specialists": specialists,
-            "report_url": f"/static/reports/{os.path.basename(report_path)}",
+            "report_id": report_id,
+            "report_url": f"/reports/{report_id}",
             "model_type": prediction_result.get('model_type', 'real_ml')
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
+async def analyze_batch_item(batch: BatchUpload, item):
+    """One NDJSON result for a batch image; failures are reported per image instead of failing the batch"""
+    result = {"index": item.index, "filename": item.filename}
+    try:
+        content = await stage_executor.run("io", batch.read, item)
+        image_context = await stage_executor.run("analysis", decode_upload, memoryview(content), item.filename)
+        prediction = await predict_image(image_context, item.filename)
+    except Exception as e:
+        result["error"] = str(e) or "Could not analyze image"
+        return result
+    result.update({
+        "disease": prediction['disease'],
+        "confidence": prediction['confidence'],
+        "probabilities": prediction['probabilities'],
+        "model_type": prediction.get('model_type', 'real_ml')
+    })
+    return result
+
+@app.post("/predict/batch")
+async def predict_batch(files: List[UploadFile] = File(...)):
+    """Analyze many images (image files and/or zip archives) and stream one NDJSON line per image
+    
+    Lines arrive in completion order, each tagged with the image's index in
+    the upload. At most BATCH_WINDOW images are read, decoded and predicted
+    at once; decoding runs in parallel on the analysis stage and concurrent
+    predictions are grouped into model batches by the micro-batcher. A final
+    ``{"summary": ...}`` line closes the stream.
+    """
+    batch = BatchUpload(max_images=BATCH_MAX_IMAGES)
+    try:
+        for upload in files:
+            if is_zip_upload(upload.filename, upload.content_type):
+                await stage_executor.run("io", batch.add_zip, upload.filename, upload.file)
+            else:
+                await stage_executor.run("io", batch.add_image, upload.filename, upload.file)
+    except ValueError as e:
+        batch.close()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        batch.close()
+        raise
+    
+    if not batch.items:
+        batch.close()
+        raise HTTPException(status_code=400, detail="No images found in upload")
+    
+    async def stream_results():
+        start = time.perf_counter()
+        failed = 0
+        try:
+            async for result in bounded_as_completed(
+                batch.items, lambda item: analyze_batch_item(batch, item), BATCH_WINDOW
+            ):
+                failed += "error" in result
+                yield json.dumps(result) + "\n"
+            yield json.dumps({"summary": {
+                "images": len(batch.items),
+                "failed": failed,
+                "elapsed_ms": (time.perf_counter() - start) * 1000
+            }}) + "\n"
+        finally:
+            batch.close()
+    
+    print(f"📦 Batch prediction: {len(batch.items)} images, window {BATCH_WINDOW}")
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
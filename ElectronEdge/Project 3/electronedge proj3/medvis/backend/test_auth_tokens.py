@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test script for access token revocation
+
+Runs against a throwaway revocation database: tokens are verified first so
+their claims sit in the verifier's LRU, then revoked by jti (logout) and by
+subject (account deletion), and a second verifier on the same database
+stands in for a server restart.
+"""
+
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from services.auth_tokens import TokenRevoked, TokenVerifier
+
+SECRET = "test-secret-for-token-revocation-checks"
+
+def assert_revoked(verifier, token, label):
+    try:
+        verifier.verify(token)
+        raise AssertionError(f"{label} should have been rejected")
+    except TokenRevoked:
+        pass
+
+def check_revoke_cached_token(verifier):
+    logged_out = verifier.issue("alice@example.com")
+    other_session = verifier.issue("alice@example.com")
+    claims = verifier.verify(logged_out)
+    verifier.verify(other_session)
+    verifier.verify(logged_out)
+    assert verifier.hits == 1 and logged_out in verifier._verified
+
+    verifier.revoke_token(claims)
+    assert logged_out in verifier._verified, "the decoded claims are still cached"
+    assert_revoked(verifier, logged_out, "logged-out token")
+    assert verifier.verify(other_session)["sub"] == "alice@example.com"
+    print("✅ A token revoked by jti is rejected even while its claims are cached")
+    return logged_out, other_session
+
+def check_revoke_subject(verifier):
+    first = verifier.issue("bob@example.com")
+    second = verifier.issue("bob@example.com", expires_delta=timedelta(minutes=5))
+    verifier.verify(first)
+
+    verifier.revoke_subject("bob@example.com")
+    assert_revoked(verifier, first, "cached token of a deleted account")
+    assert_revoked(verifier, second, "uncached token of a deleted account")
+
+    # Subject revocations compare whole-second iat values
+    time.sleep(1.1)
+    fresh = verifier.issue("bob@example.com")
+    assert verifier.verify(fresh)["sub"] == "bob@example.com"
+    print("✅ Revoking a subject rejects its earlier tokens and accepts new ones")
+    return first
+
+def check_restart(db_path, logged_out, other_session, deleted_account_token):
+    restarted = TokenVerifier(SECRET, db_path=db_path)
+    assert restarted.get_stats()["revoked_tokens"] == 1 and restarted.get_stats()["revoked_subjects"] == 1
+    assert_revoked(restarted, logged_out, "logged-out token after restart")
+    assert_revoked(restarted, deleted_account_token, "deleted account's token after restart")
+    assert restarted.verify(other_session)["sub"] == "alice@example.com"
+    print("✅ Revocations survive a restart through the SQLite table")
+
+def test_auth_tokens():
+    db_path = os.path.join(tempfile.mkdtemp(), "token_revocations.db")
+    verifier = TokenVerifier(SECRET, db_path=db_path)
+    logged_out, other_session = check_revoke_cached_token(verifier)
+    deleted_account_token = check_revoke_subject(verifier)
+    check_restart(db_path, logged_out, other_session, deleted_account_token)
+
+if __name__ == "__main__":
+    print("🔐 Token Verifier - Revocation Test")
+    print("=" * 50)
+    test_auth_tokens()
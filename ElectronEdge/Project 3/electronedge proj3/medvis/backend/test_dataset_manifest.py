@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test script for the incremental dataset manifest
+
+Builds a throwaway class-folder dataset of small random images, then checks
+that scan() only reports what changed on disk, cache_pending() only decodes
+new or changed images, and split() puts each class in val at val_fraction.
+"""
+
+import os
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from ml.dataset_manifest import DatasetManifest
+
+CLASS_NAMES = ["eczema", "basal cell", "rare"]
+CLASS_SIZES = {"eczema": 20, "basal cell": 7, "rare": 2}
+IMAGE_SIZE = (16, 16)
+
+def write_image(path, seed):
+    pixels = np.random.RandomState(seed).randint(0, 256, (24, 24, 3), dtype=np.uint8)
+    Image.fromarray(pixels).save(path)
+
+def make_dataset():
+    data_dir = tempfile.mkdtemp()
+    seed = 0
+    for class_name, count in CLASS_SIZES.items():
+        os.makedirs(os.path.join(data_dir, class_name))
+        for i in range(count):
+            write_image(os.path.join(data_dir, class_name, f"img_{i:03d}.png"), seed)
+            seed += 1
+    return data_dir
+
+def check_scan(data_dir, manifest):
+    total = sum(CLASS_SIZES.values())
+    assert manifest.scan() == {"new": total, "changed": 0, "unchanged": 0, "removed": 0}
+    assert manifest.cache_pending() == total
+    assert manifest.scan() == {"new": 0, "changed": 0, "unchanged": total, "removed": 0}
+
+    eczema = os.path.join(data_dir, "eczema")
+    touched = os.path.join(eczema, "img_000.png")
+    later = time.time() + 10
+    os.utime(touched, (later, later))
+    write_image(os.path.join(eczema, "img_001.png"), 1000)
+    write_image(os.path.join(eczema, "img_new.png"), 1001)
+    os.remove(os.path.join(eczema, "img_002.png"))
+
+    counts = manifest.scan()
+    assert counts == {"new": 1, "changed": 1, "unchanged": total - 2, "removed": 1}, counts
+    print("✅ scan() reports new, changed, unchanged and removed files; a touched file is unchanged")
+
+def check_cache_pending(manifest):
+    assert manifest.cache_pending() == 2, "only the changed and the new image need decoding"
+    assert manifest.cache_pending() == 0
+    assert len(manifest.entries()) == sum(CLASS_SIZES.values())
+    print("✅ cache_pending() only decodes new or changed images")
+
+def check_split(manifest):
+    train, val = manifest.split(val_fraction=0.2)
+    assert len(train) + len(val) == len(manifest.entries())
+    for label, (class_name, count) in enumerate(CLASS_SIZES.items()):
+        class_val = sum(1 for entry in val if entry[2] == label)
+        expected = max(round(count * 0.2), 1)
+        assert class_val == expected, f"{class_name}: {class_val} in val, expected {expected}"
+    assert manifest.split(val_fraction=0.2) == (train, val), "the split must be deterministic"
+    assert manifest.split(val_fraction=0.2, salt="fold-2") != (train, val)
+    print("✅ split() puts round(n * val_fraction) of each class in val, at least one per class")
+    return val
+
+def check_split_after_growth(data_dir, manifest, val):
+    for i in range(5):
+        write_image(os.path.join(data_dir, "eczema", f"extra_{i}.png"), 2000 + i)
+    manifest.update()
+    _, grown_val = manifest.split(val_fraction=0.2)
+    untouched = [entry for entry in val if entry[2] != 0]
+    assert untouched == [entry for entry in grown_val if entry[2] != 0]
+    assert sum(1 for entry in grown_val if entry[2] == 0) == 5
+    print("✅ Growing one class leaves the other classes' splits alone")
+
+def test_dataset_manifest():
+    data_dir = make_dataset()
+    manifest = DatasetManifest(data_dir, CLASS_NAMES, image_size=IMAGE_SIZE, workers=2)
+    check_scan(data_dir, manifest)
+    check_cache_pending(manifest)
+    val = check_split(manifest)
+    check_split_after_growth(data_dir, manifest, val)
+
+if __name__ == "__main__":
+    print("🗂️ Dataset Manifest - Incremental Scan and Split Test")
+    print("=" * 50)
+    test_dataset_manifest()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test script for the async LLM client against a local stub HTTP server
+
+Runs without API keys or network access: a stub server on localhost plays
+both OpenAI and Anthropic, with configurable per-provider delays and
+failures, to exercise connection pooling, hedging and loser cancellation.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from services.llm_client import AsyncLLMClient
+
+STUB_EXPLANATION = {
+    "name": "Stub Condition",
+    "description": "Returned by the local stub server.",
+    "symptoms": [], "causes": [], "treatment": [],
+    "urgency": "low", "next_steps": "None", "disclaimer": "Test only",
+    "dos": [], "donts": []
+}
+
+class StubState:
+    delays = {"openai": 0.0, "anthropic": 0.0}
+    failing = set()
+    requests = {"openai": 0, "anthropic": 0}
+    connections = set()
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        provider = "openai" if self.path.endswith("/chat/completions") else "anthropic"
+        StubState.requests[provider] += 1
+        StubState.connections.add(self.client_address)
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(StubState.delays[provider])
+
+        if provider in StubState.failing:
+            body = b'{"error": "stub failure"}'
+            self.send_response(500)
+        else:
+            text = "```json" + json.dumps({**STUB_EXPLANATION, "provider": provider}) + "```"
+            if provider == "openai":
+                payload = {"choices": [{"message": {"content": text}}]}
+            else:
+                payload = {"content": [{"text": text}]}
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(200)
+
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def start_stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def make_client(server, hedge_delay_ms=2000):
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    return AsyncLLMClient(
+        openai_api_key="sk-test", anthropic_api_key="sk-ant-test",
+        openai_base_url=base_url, anthropic_base_url=base_url,
+        timeout=5.0, hedge_delay_ms=hedge_delay_ms
+    )
+
+def reset_stub(delays=None, failing=()):
+    StubState.delays = {"openai": 0.0, "anthropic": 0.0, **(delays or {})}
+    StubState.failing = set(failing)
+    StubState.requests = {"openai": 0, "anthropic": 0}
+    StubState.connections = set()
+
+async def check_primary_wins(server):
+    reset_stub()
+    client = make_client(server, hedge_delay_ms=2000)
+    explanation, provider = await client.generate("Eczema", 0.8)
+    await client.aclose()
+    assert provider == "openai" and explanation["provider"] == "openai"
+    assert StubState.requests["anthropic"] == 0, "fast primary must not trigger a hedge"
+    print("✅ Fast primary answers without hedging")
+
+async def check_hedge_on_slow_primary(server):
+    reset_stub(delays={"openai": 1.0})
+    client = make_client(server, hedge_delay_ms=100)
+    start = time.perf_counter()
+    explanation, provider = await client.generate("Eczema", 0.8)
+    elapsed = time.perf_counter() - start
+    await client.aclose()
+    assert provider == "anthropic", provider
+    assert elapsed < 0.9, f"hedged request took {elapsed:.2f}s"
+    assert client.stats["hedges_launched"] == 1 and client.stats["cancelled"] == 1
+    print(f"✅ Slow primary hedged to secondary in {elapsed * 1000:.0f} ms, loser cancelled")
+
+async def check_failover(server):
+    reset_stub(failing={"openai"})
+    client = make_client(server, hedge_delay_ms=5000)
+    start = time.perf_counter()
+    _, provider = await client.generate("Eczema", 0.8)
+    elapsed = time.perf_counter() - start
+    await client.aclose()
+    assert provider == "anthropic" and elapsed < 1.0
+    print("✅ Failed primary fails over immediately")
+
+async def check_connection_reuse(server):
+    reset_stub()
+    client = make_client(server)
+    for _ in range(5):
+        await client.generate("Eczema", 0.8)
+    await client.aclose()
+    assert len(StubState.connections) == 1, StubState.connections
+    print("✅ Sequential requests reuse one pooled connection")
+
+async def check_all_fail(server):
+    reset_stub(failing={"openai", "anthropic"})
+    client = make_client(server)
+    try:
+        await client.generate("Eczema", 0.8)
+        raise AssertionError("expected every provider to fail")
+    except RuntimeError:
+        pass
+    finally:
+        await client.aclose()
+    print("✅ All providers failing raises for the caller's fallback")
+
+def test_llm_client():
+    server = start_stub_server()
+    try:
+        for check in (check_primary_wins, check_hedge_on_slow_primary, check_failover,
+                      check_connection_reuse, check_all_fail):
+            asyncio.run(check(server))
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    print("🤖 Async LLM Client - Stub Server Test")
+    print("=" * 50)
+    test_llm_client()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test script for storage retention
+
+Runs compact() on throwaway storage areas whose file ages are set with
+os.utime: flat files are migrated into shards, abandoned temp files and
+expired files are deleted, the oldest files are evicted first to fit the
+size limit, and nothing younger than min_age_seconds is ever removed.
+"""
+
+import os
+import tempfile
+import time
+
+from services.storage import StorageArea
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+def make_area(**limits):
+    return StorageArea("test", tempfile.mkdtemp(), "/static/test", **limits)
+
+def write(area, filename, size=100, age=0):
+    path = area.write_atomic(filename, b"x" * size)
+    set_age(path, age)
+    return path
+
+def set_age(path, age):
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+
+def digest_name(i, suffix=".jpg"):
+    return f"{i:02x}" * 32 + suffix
+
+def check_migration():
+    area = make_area()
+    flat = os.path.join(area.root, digest_name(1))
+    with open(flat, "wb") as f:
+        f.write(b"legacy")
+    open(os.path.join(area.root, ".gitkeep"), "w").close()
+
+    result = area.compact()
+    assert result["migrated"] == 1, result
+    assert not os.path.exists(flat) and os.path.exists(area.path_for(digest_name(1)))
+    assert os.path.exists(os.path.join(area.root, ".gitkeep"))
+    assert area.files == 1
+    print("✅ Flat files move into their shards and .gitkeep stays put")
+
+def check_temp_cleanup():
+    area = make_area(min_age_seconds=HOUR)
+    shard = os.path.dirname(area.prepare(digest_name(2)))
+    abandoned = os.path.join(shard, "abandoned.part")
+    in_progress = os.path.join(shard, "in_progress.tmp")
+    for path in (abandoned, in_progress):
+        with open(path, "wb") as f:
+            f.write(b"partial")
+    set_age(abandoned, 2 * HOUR)
+
+    result = area.compact()
+    assert result["temp_removed"] == 1 and result["migrated"] == 0, result
+    assert not os.path.exists(abandoned) and os.path.exists(in_progress)
+    print("✅ Abandoned temp files are removed, ones still being written are kept")
+
+def check_expiry():
+    area = make_area(max_age_seconds=7 * DAY, min_age_seconds=HOUR)
+    expired = write(area, digest_name(3), age=8 * DAY)
+    kept = write(area, digest_name(4), age=6 * DAY)
+
+    result = area.compact()
+    assert result["expired"] == 1 and result["freed_bytes"] == 100, result
+    assert not os.path.exists(expired) and os.path.exists(kept)
+    assert result["empty_dirs_removed"] == 2, "the expired file's shard directories should go too"
+    print("✅ Files past max_age are deleted along with their empty shards")
+
+def check_eviction_order():
+    area = make_area(max_bytes=250, min_age_seconds=HOUR)
+    oldest = write(area, digest_name(5), age=5 * DAY)
+    older = write(area, digest_name(6), age=4 * DAY)
+    newer = write(area, digest_name(7), age=3 * DAY)
+    newest = write(area, digest_name(8), age=2 * DAY)
+
+    result = area.compact()
+    assert result["evicted"] == 2 and result["freed_bytes"] == 200, result
+    assert not os.path.exists(oldest) and not os.path.exists(older)
+    assert os.path.exists(newer) and os.path.exists(newest)
+    assert area.files == 2 and area.bytes == 200
+    print("✅ The oldest files are evicted first until the area fits max_bytes")
+
+def check_min_age_protection():
+    area = make_area(max_age_seconds=1, max_bytes=150, min_age_seconds=HOUR)
+    old = write(area, digest_name(9), age=2 * DAY)
+    recent = [write(area, digest_name(10 + i), age=60) for i in range(3)]
+
+    result = area.compact()
+    assert result["expired"] == 1 and result["evicted"] == 0, result
+    assert not os.path.exists(old)
+    assert all(os.path.exists(path) for path in recent), "files younger than min_age must survive"
+    assert area.bytes == 300, "the area may stay over max_bytes rather than delete recent files"
+    print("✅ Files younger than min_age_seconds survive both expiry and eviction")
+
+def test_storage():
+    check_migration()
+    check_temp_cleanup()
+    check_expiry()
+    check_eviction_order()
+    check_min_age_protection()
+
+if __name__ == "__main__":
+    print("🗄️ Storage Area - Retention Test")
+    print("=" * 50)
+    test_storage()
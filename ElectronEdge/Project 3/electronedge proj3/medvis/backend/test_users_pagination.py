@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test script for keyset pagination of the admin user listing
+
+Runs against a throwaway SQLite database: pages are walked with the same
+encode_cursor/decode_cursor round trip /auth/users uses, including users
+that share a created_at timestamp, a city filter, and malformed cursors.
+"""
+
+import os
+import tempfile
+
+# database and simple_app open their SQLite files on import; keep them off the tracked users.db
+TEST_DIR = tempfile.mkdtemp()
+for env_var, filename in (("USERS_DB", "users.db"), ("TOKEN_REVOCATIONS_DB", "token_revocations.db"),
+                          ("REPORT_JOBS_DB", "report_jobs.db"), ("EXPLANATION_CACHE_DB", "explanation_cache.db")):
+    os.environ[env_var] = os.path.join(TEST_DIR, filename)
+
+from database import UserDatabase, decode_cursor, encode_cursor
+
+SHARED_CREATED_AT = "2024-05-01 12:00:00"
+
+def make_db():
+    db = UserDatabase(db_path=os.path.join(tempfile.mkdtemp(), "users.db"))
+    conn = db.pool.connection()
+    for i in range(7):
+        city = "Lagos" if i % 2 else "Accra"
+        db.insert_user(f"User {i}", city, f"user{i}@example.com", "not-a-real-hash")
+    # Most users share one timestamp, so only the id can order them
+    conn.execute("UPDATE users SET created_at = ? WHERE id > 2", (SHARED_CREATED_AT,))
+    conn.execute("UPDATE users SET created_at = '2024-04-01 08:00:00' WHERE id <= 2")
+    conn.commit()
+    return db
+
+def walk_pages(db, limit, **filters):
+    """Every page, passing the cursor through its encoded form like a client would"""
+    pages, after = [], None
+    while True:
+        users, next_after = db.list_users(limit, after, **filters)
+        pages.append(users)
+        if next_after is None:
+            return pages
+        after = decode_cursor(encode_cursor(next_after))
+
+def check_equal_timestamps(db):
+    expected = db.list_users(100)[0]
+    for limit in (1, 2, 3):
+        pages = walk_pages(db, limit)
+        listed = [user for page in pages for user in page]
+        assert [u["id"] for u in listed] == [u["id"] for u in expected], f"limit {limit}: {listed}"
+        assert all(len(page) == limit for page in pages[:-1]) and 0 < len(pages[-1]) <= limit
+    keys = [(u["created_at"], u["id"]) for u in expected]
+    assert keys == sorted(keys, reverse=True) and len(set(keys)) == len(keys)
+    assert sum(1 for u in expected if u["created_at"] == SHARED_CREATED_AT) == 5
+    print("✅ Page boundaries inside a run of equal created_at values skip and repeat nobody")
+
+def check_city_filter(db):
+    expected = [u["id"] for u in db.list_users(100)[0] if u["city"] == "Lagos"]
+    pages = walk_pages(db, 2, city="Lagos")
+    listed = [user for page in pages for user in page]
+    assert [u["id"] for u in listed] == expected, listed
+    assert all(u["city"] == "Lagos" for u in listed)
+    assert len(walk_pages(db, 3, city="Lagos")) == 1, "a full last page must not be followed by an empty one"
+    print("✅ City filter holds across cursor pages")
+
+def check_malformed_cursor():
+    for cursor in ("not base64!", encode_cursor(["2024-01-01"]), encode_cursor(["2024-01-01", "x"]), "e30="):
+        try:
+            decode_cursor(cursor)
+            raise AssertionError(f"expected {cursor!r} to be rejected")
+        except ValueError:
+            pass
+
+    from fastapi.testclient import TestClient
+    from simple_app import app, verify_token
+
+    app.dependency_overrides[verify_token] = lambda: "admin@example.com"
+    try:
+        client = TestClient(app)
+        response = client.get("/auth/users", params={"limit": 2, "cursor": "not base64!"})
+        page = client.get("/auth/users", params={"limit": 2}).json()
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 400, (response.status_code, response.text)
+    assert response.json()["detail"] == "Invalid cursor"
+    assert page == {"users": [], "count": 0, "next_cursor": None}, page
+    print("✅ Malformed cursors are rejected with 400")
+
+def test_users_pagination():
+    db = make_db()
+    try:
+        check_equal_timestamps(db)
+        check_city_filter(db)
+    finally:
+        db.pool.close_all()
+    check_malformed_cursor()
+
+if __name__ == "__main__":
+    print("📄 User Listing - Keyset Pagination Test")
+    print("=" * 50)
+    test_users_pagination()